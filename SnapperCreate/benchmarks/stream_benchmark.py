@@ -0,0 +1,149 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Compares the stream parsing of the original SensorStream, which read each frame a few bytes at a time and
+# concatenated strings, with StreamParser decoding in place.  Both parse the same recording of a 15ms stream with
+# a byte corrupted every CORRUPT_EVERY bytes, so the cost of resynchronising is included.
+#
+# Run from the SnapperCreate directory:  python -m benchmarks.stream_benchmark
+import random
+import struct
+import sys
+import timeit
+
+from rbCreate import sensors
+from rbCreate.stream_parser import STREAM_HEADER
+from rbCreate.stream_parser import StreamParser
+
+# Everything odometry and the safety checks need
+PACKET_IDS = [sensors.BUMPS_WHEEL_DROPS, sensors.DISTANCE, sensors.ANGLE, sensors.OI_MODE,
+              sensors.LEFT_ENCODER_COUNTS, sensors.RIGHT_ENCODER_COUNTS, sensors.VOLTAGE, sensors.CURRENT]
+FRAMES = 2000
+CORRUPT_EVERY = 997
+READ_SIZE = 64  # Bytes per read from the port
+
+
+def recording(frames=FRAMES, corrupt_every=CORRUPT_EVERY):
+    """
+    :return: str of stream frames with counting packet values and some corrupted bytes
+    """
+    data = bytearray()
+    for index in range(frames):
+        body = bytearray()
+        for packet_id in PACKET_IDS:
+            packet = sensors.PACKETS[packet_id]
+            body.append(packet_id)
+            body.extend(struct.pack(">" + packet.format, index % (1 << (8 * packet.size - 1))))
+        frame = bytearray([STREAM_HEADER, len(body)]) + body
+        frame.append(sensors.checksum(frame))
+        data.extend(frame)
+    generator = random.Random(1)
+    for offset in range(0, len(data), corrupt_every):
+        data[offset] = generator.randint(0, 255)
+    return bytes(data)
+
+
+class Port(object):
+    """
+    Serves a recording in reads of at most READ_SIZE bytes, like a serial port
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    @property
+    def in_waiting(self):
+        return len(self.data) - self.position
+
+    def read(self, size=1):
+        size = min(size, READ_SIZE)
+        data = self.data[self.position:self.position + size]
+        self.position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def legacy_parse(port):
+    """
+    The parsing loop of the original SensorStream
+    :return: Number of frames decoded
+    """
+    frames = 0
+    while port.in_waiting:
+        header = port.read(1)
+        if ord(header) != STREAM_HEADER:
+            continue
+        length = port.read(1)
+        if not length:
+            break
+        body = ""
+        while len(body) < ord(length) + 1 and port.in_waiting:
+            body += port.read(ord(length) + 1 - len(body))
+        frame = bytearray(header + length + body)
+        if len(body) < ord(length) + 1 or sensors.checksum(frame[:-1]) != frame[-1]:
+            continue
+        values = {}
+        offset = 0
+        while offset < ord(length):
+            packet = sensors.PACKETS.get(ord(body[offset]))
+            if packet is None:
+                break
+            values[ord(body[offset])] = struct.unpack(">" + packet.format,
+                                                      body[offset + 1:offset + 1 + packet.size])[0]
+            offset += 1 + packet.size
+        else:
+            frames += 1
+    return frames
+
+
+def parser_parse(port):
+    """
+    :return: Number of frames decoded
+    """
+    parser = StreamParser(PACKET_IDS)
+    frames = 0
+    while port.in_waiting:
+        parser.fill(port)
+        for values in parser.decode():
+            dict(zip(PACKET_IDS, values))  # As SensorStream stores them
+            frames += 1
+    return frames
+
+
+def main():
+    data = recording()
+    print "{0} frames of {1} packets, {2} bytes, a byte corrupted every {3}".format(
+        FRAMES, len(PACKET_IDS), len(data), CORRUPT_EVERY)
+    baseline = None
+    for name, parse in (("legacy string reads", legacy_parse), ("StreamParser", parser_parse)):
+        frames = parse(Port(data))
+        seconds = min(timeit.repeat(lambda: parse(Port(data)), number=1, repeat=5))
+        packets_per_second = frames * len(PACKET_IDS) / seconds
+        baseline = baseline or packets_per_second
+        print "{0:<22} {1:5} frames decoded {2:12.0f} packets/s {3:8.1f}x".format(
+            name, frames, packets_per_second, packets_per_second / baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
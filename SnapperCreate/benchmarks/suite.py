@@ -0,0 +1,481 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Headless benchmarks of the servo and serial hot paths, run against the simulated hardware so nothing waits on a
+# real clock.  Results are written to stdout as JSON; the human readable report goes to stderr.
+#
+# Run from the SnapperCreate directory:
+#     python -m benchmarks.suite > baseline.json
+#     python -m benchmarks.suite --baseline baseline.json
+# With a baseline, every metric is compared against it and the exit status is 1 if any has regressed.  Timings may
+# drift by --tolerance before they count as a regression; counts, such as transactions per step, must not get worse
+# at all.  Worst case latencies are too noisy to compare, so they are only reported.  Some benchmarks also check that
+# the code still behaves correctly, and the exit status is 1 if a check fails.
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import timeit
+
+import numpy
+
+from benchmarks.stream_benchmark import PACKET_IDS
+from benchmarks.stream_benchmark import Port
+from benchmarks.stream_benchmark import parser_parse
+from benchmarks.stream_benchmark import recording
+from project_driver import build_wall
+from project_driver import front_floor_position
+from rbSnapper import Joints
+from rbSnapper.calibration import Calibration
+from recording import LogReader
+from recording import TrafficLog
+from recording import log
+from recording import replay
+from simulation import Simulation
+from state_bus import StatePublisher
+from state_bus import StateReader
+
+DEFAULT_TOLERANCE = 0.25  # Fractional change in a timing allowed before it counts as a regression
+# Longest an emergency stop may take to reach the port: two Create command periods.  The stop itself only waits for
+# the write in progress, well under a millisecond, but on a single busy core the threads' scheduling adds up to
+# about 20ms
+STOP_LATENCY_LIMIT = 0.03
+STOP_SAMPLES = 40  # Stops timed in each run of the emergency stop benchmark
+QUEUED_AHEAD = 4  # Commands waiting in the command writer before each emergency stop is timed
+WRITER_PACE = 0.005  # Seconds each sender waits between commands queued in the command writer
+
+# The moves of a pick up and stow cycle from project_driver
+STOWED = {Joints.WAIST: 0, Joints.SHOULDER: -80, Joints.ELBOW: -65, Joints.WRIST: -30, Joints.GRIPPER: 40}
+FLOOR = dict(front_floor_position, **{Joints.GRIPPER: 99})
+
+
+class Quiet(object):
+    """
+    Discards everything printed inside the block, so the drivers' progress messages don't swamp the report
+    """
+
+    def __enter__(self):
+        self._stdout = sys.stdout
+        self._devnull = open(os.devnull, "w")
+        sys.stdout = self._devnull
+
+    def __exit__(self, *exc_info):
+        sys.stdout = self._stdout
+        self._devnull.close()
+
+
+def metric(value, unit, better, exact=False, compared=True):
+    """
+    :param better: "higher" or "lower"
+    :param exact: True for counts that are deterministic, which may not regress at all
+    :param compared: False for values too noisy to compare between runs, such as the worst of many latencies.  They
+    are reported but never count as a regression
+    """
+    return {"value": value, "unit": unit, "better": better, "exact": exact, "compared": compared}
+
+
+def best_of(repeat, func):
+    """
+    :return: (shortest wall time, result of the fastest call) over repeat calls of func
+    """
+    best = None
+    for _ in range(repeat):
+        started = timeit.default_timer()
+        result = func()
+        elapsed = timeit.default_timer() - started
+        if best is None or elapsed < best[0]:
+            best = (elapsed, result)
+    return best
+
+
+def bench_set_joints(repeat, cycles=5):
+    """
+    Frame rate and bus usage of Snapper.set_joints through the real PCA9685 driver
+    """
+    simulation = Simulation()
+    with Quiet():
+        arm = simulation.arm()
+        arm.set_joints(STOWED).wait()  # Every run starts from the pose it ends in
+
+    def run():
+        transactions = arm.pwm.getTransactionCount()
+        frames = 0
+        with Quiet():
+            for _ in range(cycles):
+                for pose in (FLOOR, STOWED):
+                    frames += arm.set_joints(pose).wait() and arm.last_move_statistics.frames
+        return frames, arm.pwm.getTransactionCount() - transactions
+
+    elapsed, (frames, transactions) = best_of(repeat, run)
+    return {
+        "set_joints.frames_per_second": metric(frames / elapsed, "frames/s", "higher"),
+        "set_joints.i2c_transactions_per_step": metric(float(transactions) / frames, "transactions/step", "lower",
+                                                       exact=True),
+    }
+
+
+def bench_joint_conversion(repeat, number=20000):
+    """
+    Cost of converting joint values to PWM ticks, the job of the original _interpolate_arm
+    """
+    calibration = Calibration(cache_dir=None)
+    values = [(channel, value) for channel in range(4) for value in range(-90, 91)]
+    calls = [values[index % len(values)] for index in range(number)]
+
+    def run():
+        ticks = calibration.ticks
+        for channel, value in calls:
+            ticks(channel, value)
+
+    elapsed, _ = best_of(repeat, run)
+    # A chunk of a streamed trajectory, as Trajectory.chunks converts it
+    block = (numpy.arange(256 * 5, dtype=numpy.int64) % 181 - 90).reshape(256, 5)
+    blocks = 1000
+    block_elapsed, _ = best_of(repeat, lambda: [calibration.ticks_array(block) for _ in range(blocks)])
+    return {
+        "joint_conversion.ticks_per_call_us": metric(elapsed / number * 1e6, "us/call", "lower"),
+        "joint_conversion.ticks_array_per_value_us": metric(block_elapsed / blocks / block.size * 1e6, "us/value",
+                                                            "lower"),
+    }
+
+
+def bench_drive_direct(repeat, number=5000):
+    """
+    Serial traffic and cost of Create.drive_direct
+    """
+    simulation = Simulation()
+    robot = simulation.robot()
+    robot.set_safe_mode()
+    port = simulation.create
+
+    def run():
+        writes = port.writes
+        written = port.bytes_written
+        for index in range(number):
+            speed = index % 500
+            robot.drive_direct(speed, -speed)
+        return port.writes - writes, port.bytes_written - written
+
+    elapsed, (writes, written) = best_of(repeat, run)
+    return {
+        "drive_direct.us_per_call": metric(elapsed / number * 1e6, "us/call", "lower"),
+        "drive_direct.bytes_per_call": metric(float(written) / number, "bytes/call", "lower", exact=True),
+        "drive_direct.syscalls_per_call": metric(float(writes) / number, "writes/call", "lower", exact=True),
+    }
+
+
+def bench_mode_commands(repeat, number=2000):
+    """
+    Serial traffic of the start and safe mode commands, which have no parameters
+    """
+    simulation = Simulation()
+    robot = simulation.robot()
+    port = simulation.create
+
+    def run():
+        writes = port.writes
+        written = port.bytes_written
+        for _ in range(number):
+            robot.start()
+            robot.set_safe_mode()
+        return port.writes - writes, port.bytes_written - written
+
+    elapsed, (writes, written) = best_of(repeat, run)
+    return {
+        "mode_commands.us_per_pair": metric(elapsed / number * 1e6, "us/pair", "lower"),
+        "mode_commands.bytes_per_pair": metric(float(written) / number, "bytes/pair", "lower", exact=True),
+        "mode_commands.syscalls_per_pair": metric(float(writes) / number, "writes/pair", "lower", exact=True),
+    }
+
+
+def bench_state_bus(repeat, number=20000):
+    """
+    Publishing the arm pose to the shared state record, and taking a consistent snapshot of it
+    """
+    path = os.path.join(tempfile.mkdtemp(), "state")
+    publisher = StatePublisher(path)
+    reader = StateReader(path)
+    positions = [10, 20, 30, 40, 50]
+
+    def publish():
+        for _ in range(number):
+            publisher.publish_arm(positions)
+
+    def read():
+        for _ in range(number):
+            reader.read()
+
+    published = best_of(repeat, publish)[0]
+    read_time = best_of(repeat, read)[0]
+    reader.close()
+    publisher.close()
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    return {
+        "state_bus.us_per_publish": metric(published / number * 1e6, "us/publish", "lower"),
+        "state_bus.us_per_read": metric(read_time / number * 1e6, "us/read", "lower"),
+    }
+
+
+def flooded(robot, senders, send, stops, before=None):
+    """
+    Time robot.emergency_stop, or another stop, while sender threads keep calling send
+    :param send: Called as send(robot) in a loop on each sender thread
+    :param stops: Dictionary of name to stop function.  Each is timed in turn, every 2ms
+    :param before: Called just before each stop is timed
+    :return: Dictionary of name to list of latencies, in seconds
+    """
+    running = [True]
+
+    def flood():
+        while running[0]:
+            send(robot)
+
+    threads = [threading.Thread(target=flood, name="Flood{0}".format(index)) for index in range(senders)]
+    for flooder in threads:
+        flooder.daemon = True
+        flooder.start()
+    latencies = {}
+    try:
+        for name, stop in sorted(stops.items()):
+            latencies[name] = []
+            for _ in range(STOP_SAMPLES):
+                time.sleep(0.002)
+                if before is not None:
+                    before()
+                started = timeit.default_timer()
+                stop()
+                latencies[name].append(timeit.default_timer() - started)
+    finally:
+        running[0] = False
+        for flooder in threads:
+            flooder.join()
+    return latencies
+
+
+def bench_emergency_stop(repeat, senders=4):
+    """
+    Latency of Create.emergency_stop, and of stop_motion for comparison, while other threads keep the port saturated
+    with drive commands.  Then the emergency stop again, with those threads queueing drive and mode commands in the
+    command writer, and each stop sent once at least QUEUED_AHEAD commands are waiting.  Writes take as long as they
+    would on the wire, so the port really is busy.  Fails if the worst emergency stop in either case takes longer than
+    STOP_LATENCY_LIMIT.
+    """
+    simulation = Simulation()
+    simulation.create.wire_time = True
+    robot = simulation.robot()
+    robot.set_safe_mode()
+    speeds = [0]
+
+    def drive(robot):
+        speeds[0] = (speeds[0] + 1) % 500
+        robot.drive_direct(speeds[0], speeds[0])
+
+    def drive_and_mode(robot):
+        # A mode command can't be replaced, so every drive after one is queued too
+        drive(robot)
+        robot.set_safe_mode()
+        time.sleep(WRITER_PACE)
+
+    direct = {"emergency": [], "normal": []}
+    for _ in range(repeat):
+        for name, latencies in flooded(robot, senders, drive, {"emergency": robot.emergency_stop,
+                                                                "normal": robot.stop_motion}).items():
+            direct[name].extend(latencies)
+
+    depths = []
+    writer = robot.start_writer()
+    try:
+        def queue_ahead():
+            while writer.depth < QUEUED_AHEAD:
+                time.sleep(0.0005)
+            depths.append(writer.depth)
+
+        queued = []
+        for _ in range(repeat):
+            queued.extend(flooded(robot, senders, drive_and_mode, {"emergency": robot.emergency_stop},
+                                  queue_ahead)["emergency"])
+    finally:
+        robot.stop_writer()
+
+    worst = max(max(direct["emergency"]), max(queued))
+    if worst > STOP_LATENCY_LIMIT:
+        raise RuntimeError("An emergency stop took {0:.1f}ms, over the {1:.0f}ms limit".format(
+            worst * 1e3, STOP_LATENCY_LIMIT * 1e3))
+    return {
+        # The worst latency depends on how the threads happen to be scheduled, so only STOP_LATENCY_LIMIT bounds it
+        "emergency_stop.max_latency_ms": metric(max(direct["emergency"]) * 1e3, "ms", "lower", compared=False),
+        "emergency_stop.mean_latency_ms": metric(numpy.mean(direct["emergency"]) * 1e3, "ms", "lower"),
+        "emergency_stop.median_latency_ms": metric(numpy.median(direct["emergency"]) * 1e3, "ms", "lower"),
+        "emergency_stop.queued_max_latency_ms": metric(max(queued) * 1e3, "ms", "lower", compared=False),
+        "emergency_stop.queued_median_latency_ms": metric(numpy.median(queued) * 1e3, "ms", "lower"),
+        "emergency_stop.queued_mean_depth": metric(float(numpy.mean(depths)), "commands", "higher"),
+        "stop_motion.max_latency_ms": metric(max(direct["normal"]) * 1e3, "ms", "lower", compared=False),
+        "stop_motion.mean_latency_ms": metric(numpy.mean(direct["normal"]) * 1e3, "ms", "lower"),
+        "stop_motion.median_latency_ms": metric(numpy.median(direct["normal"]) * 1e3, "ms", "lower"),
+    }
+
+
+def bench_stream_parser(repeat):
+    """
+    Sensor stream decoding throughput, including resynchronising after corrupted bytes
+    """
+    data = recording()
+    elapsed, frames = best_of(repeat, lambda: parser_parse(Port(data)))
+    return {
+        "stream_parser.packets_per_second": metric(frames * len(PACKET_IDS) / elapsed, "packets/s", "higher"),
+        "stream_parser.frames_recovered": metric(float(frames), "frames", "higher", exact=True),
+    }
+
+
+def bench_recording(repeat, distance=300):
+    """
+    Recording a closed loop drive, which needs the sensor stream, and replaying it.  Fails if the stream is missing
+    from the log or the replayed robot does not end where the recorded one did.
+    """
+    path = os.path.join(tempfile.mkdtemp(), "traffic.log")
+
+    def run():
+        simulation = Simulation()
+        traffic = TrafficLog(path, simulation.clock)
+        with Quiet():
+            robot = simulation.robot(record=traffic)
+            robot.set_safe_mode()
+            robot.drive_distance(distance)
+            robot.disconnect()
+        traffic.close()
+        return simulation.create.pose()
+
+    elapsed, recorded = best_of(repeat, run)
+    reader = LogReader(path)
+    reads = sum(1 for _ in reader.frames(kinds=(log.SERIAL_READ,)))
+    simulation = Simulation(start=reader.start_time)
+    replay(reader, dict((name, simulation.create) for name in reader.channels.values()), simulation.clock)
+    reader.close()
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    if not reads:
+        raise RuntimeError("The recording holds none of the sensor stream")
+    replayed = simulation.create.pose()
+    if any(abs(a - b) > 1e-6 for a, b in zip(recorded, replayed)):
+        raise RuntimeError("The replay ended at {0}, not {1} as recorded".format(replayed, recorded))
+    return {
+        "recording.seconds": metric(elapsed, "s", "lower"),
+    }
+
+
+def bench_build_wall(repeat):
+    """
+    End to end time of project_driver.build_wall, from constructing the robot and arm to the final stow
+    """
+
+    def run():
+        simulation = Simulation()
+        with Quiet():
+            robot = simulation.robot()
+            robot.set_safe_mode()
+            arm = simulation.arm()
+            build_wall(robot, arm)
+            robot.disconnect()  # Stops the sensor stream's reader thread
+        return simulation.clock.time()
+
+    elapsed, simulated = best_of(repeat, run)
+    return {
+        "build_wall.seconds": metric(elapsed, "s", "lower"),
+        "build_wall.simulated_seconds": metric(simulated, "s", "lower", exact=True),
+    }
+
+
+BENCHMARKS = [bench_set_joints, bench_joint_conversion, bench_drive_direct, bench_mode_commands, bench_emergency_stop,
+              bench_state_bus, bench_stream_parser, bench_recording, bench_build_wall]
+
+
+def run_all(repeat):
+    results = {}
+    for benchmark in BENCHMARKS:
+        results.update(benchmark(repeat))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Report each metric against the baseline
+    :return: List of the names of the metrics that regressed
+    """
+    regressions = []
+    for name in sorted(results):
+        current = results[name]
+        previous = baseline.get(name)
+        if previous is None:
+            sys.stderr.write("{0:<45} {1:>14.4f} {2:<18} (new)\n".format(name, current["value"], current["unit"]))
+            continue
+        if not current.get("compared", True):
+            sys.stderr.write("{0:<45} {1:>14.4f} {2:<18} (not compared, was {3:.4f})\n".format(
+                name, current["value"], current["unit"], previous["value"]))
+            continue
+        change = (current["value"] - previous["value"]) / previous["value"] if previous["value"] else 0.0
+        allowed = 1e-9 if current["exact"] else tolerance
+        worse = change > allowed if current["better"] == "lower" else change < -allowed
+        if worse:
+            regressions.append(name)
+        sys.stderr.write("{0:<45} {1:>14.4f} {2:<18} {3:+7.1%} vs {4:.4f}{5}\n".format(
+            name, current["value"], current["unit"], change, previous["value"], "  REGRESSION" if worse else ""))
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-b", "--baseline", help="JSON results from an earlier run to compare against")
+    ap.add_argument("-r", "--repeat", type=int, default=3, help="Runs of each benchmark; the fastest is reported")
+    ap.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                    help="Fractional change in a timing allowed before it counts as a regression")
+    args = ap.parse_args()
+
+    try:
+        results = run_all(args.repeat)
+    except RuntimeError as err:
+        sys.stderr.write("Check failed: {0}\n".format(err))
+        return 1
+    json.dump({
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.time(),
+        "results": results,
+    }, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write("\n")
+
+    if args.baseline is None:
+        for name in sorted(results):
+            sys.stderr.write("{0:<45} {1:>14.4f} {2}\n".format(name, results[name]["value"], results[name]["unit"]))
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        sys.stderr.write("{0} metric(s) regressed: {1}\n".format(len(regressions), ", ".join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Compares the per-step list building of the original Snapper.set_joints with the vectorised Trajectory engine.
+# Only trajectory generation is timed; no PWM writes or sleeps are involved.
+#
+# Run from the SnapperCreate directory:  python -m benchmarks.trajectory_benchmark
+import sys
+import timeit
+
+from numpy import interp
+
+from rbSnapper.calibration import Calibration
+from rbSnapper.trajectory import Trajectory
+
+PULSE_LENGTH = 1000000.0 / 50.0 / 4096
+
+# The stow to front_floor_position move from project_driver, plus a gripper change
+START = [0, -80, -65, -30, 40]
+TARGET = [0, 80, 20, 0, 99]
+
+
+def _legacy_interpolate_arm(degrees):
+    degrees = max(-90, min(90, degrees))
+    return int(interp(degrees, [-90, 90], [600, 2400]) / PULSE_LENGTH)
+
+
+def _legacy_interpolate_gripper(percentage):
+    percentage = max(0, min(100, percentage))
+    return int(interp(percentage, [0, 100], [750, 2400]) / PULSE_LENGTH)
+
+
+def legacy_trajectory(start, target):
+    """
+    The trajectory generation from the original set_joints: one interp call per joint per step to build the
+    joint values, list reversal for descending joints, then one interp call per joint per step to convert to ticks.
+    """
+    steps = [1 if t > s else -1 for s, t in zip(start, target)]
+    max_steps = max(len(range(s, t, step)) for s, t, step in zip(start, target, steps))
+    orders = [[s, t] if step == 1 else [t, s] for s, t, step in zip(start, target, steps)]
+
+    ranges = [[] for _ in start]
+    for i in range(max_steps):
+        for joint, order in enumerate(orders):
+            ranges[joint].append(int(interp(i, [0, max_steps], order)))
+    for joint, step in enumerate(steps):
+        if step == -1:
+            ranges[joint].reverse()
+
+    rows = []
+    for i in range(max_steps):
+        row = [_legacy_interpolate_arm(ranges[joint][i]) for joint in range(4)]
+        row.append(_legacy_interpolate_gripper(ranges[4][i]))
+        rows.append(row)
+    return rows
+
+
+def vectorised_trajectory(calibration, start, target):
+    trajectory = Trajectory(calibration, start, target)
+    return trajectory.values(), trajectory.ticks()
+
+
+def streamed_trajectory(calibration, start, target):
+    return list(Trajectory(calibration, start, target).rows())
+
+
+def main():
+    calibration = Calibration(cache_dir=None)
+    number = 200
+
+    results = [
+        ("legacy set_joints lists", lambda: legacy_trajectory(START, TARGET)),
+        ("vectorised Trajectory", lambda: vectorised_trajectory(calibration, START, TARGET)),
+        ("streamed Trajectory.rows", lambda: streamed_trajectory(calibration, START, TARGET)),
+    ]
+
+    steps = len(Trajectory(calibration, START, TARGET))
+    print "Move of {0} steps across {1} joints, best of 3 x {2} runs".format(steps, len(START), number)
+    baseline = None
+    for name, func in results:
+        seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+        baseline = baseline or seconds
+        print "{0:<28} {1:10.1f} us/move {2:10.2f} us/step {3:8.1f}x".format(
+            name, seconds * 1e6, seconds * 1e6 / steps, baseline / seconds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+import argparse
+import atexit
+import math
+import sys
+import time
+
+from rbCreate import Fleet
+from rbCreate import sensors
+from rbCreate.odometry import WHEEL_BASE
+from simulation import Simulation
+
+
+def close_fleet(fleet):
+    """
+    Ensure every Create is stopped and disconnected when the script exits, so none of them is left in Safe mode
+    """
+    if fleet is not None:
+        fleet.stop()
+        fleet.disconnect()
+
+
+def square(robot, speed, side):
+    """
+    Drive a square, timed rather than measured
+    :param speed: Wheel speed in mm/s
+    :param side: Length of each side in mm
+    """
+    robot.set_safe_mode()
+    try:
+        reply = yield robot.query(sensors.VOLTAGE)
+        print "{0}: battery at {1}mV".format(robot.port, reply.voltage)
+    except RuntimeError as err:
+        print "{0}: {1}".format(robot.port, err)
+
+    quarter_turn = math.pi / 2 * WHEEL_BASE / 2.0 / speed
+    for _ in range(4):
+        robot.drive_direct(right_speed=speed, left_speed=speed)
+        yield float(side) / speed
+        robot.drive_direct(right_speed=speed, left_speed=-speed)
+        yield quarter_turn
+    robot.stop_motion()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-c", "--config", help="JSON config file listing the serial ports, e.g. {\"ports\": [...]}")
+    ap.add_argument("-t", "--test", type=int, help="Run this many robots on mocked serial connections")
+    ap.add_argument("--simulate", type=int, help="Run this many simulated robots on a virtual clock")
+    ap.add_argument("-d", "--dock", action="store_true", help="Send every robot back to its dock when done")
+    args = vars(ap.parse_args())
+
+    simulation = None
+    try:
+        if args["simulate"]:
+            simulation = Simulation()
+            fleet = simulation.fleet(args["simulate"])
+        elif args["test"]:
+            fleet = Fleet(["mock{0}".format(index) for index in range(args["test"])])
+            fleet.connect(test=True)
+        elif args["config"]:
+            fleet = Fleet.from_config(args["config"])
+            fleet.connect()
+        else:
+            print "You must specify the config file, or a number of test or simulated robots"
+            return -1
+        atexit.register(close_fleet, fleet)
+
+        started = time.time()
+        try:
+            fleet.run([lambda robot, index=index: square(robot, 100 + 50 * index, 300) for index in range(len(fleet))])
+        except KeyboardInterrupt:
+            print "Stopping every robot"
+            fleet.stop()
+            return -1
+        if args["dock"]:
+            fleet.loop.run_until_complete(fleet.return_to_dock())
+        print "{0} robots finished in {1:.2f}s".format(len(fleet), time.time() - started)
+        if simulation is not None:
+            for index, robot in enumerate(simulation.robots):
+                x, y, heading = robot.pose()
+                print "Robot {0} finished at x={1:.1f}mm y={2:.1f}mm heading={3:.1f} degrees".format(
+                    index, x, y, heading)
+    except RuntimeError as err:
+        print "A RuntimeError occurred while communicating with the fleet: {0}".format(err)
+        return -1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
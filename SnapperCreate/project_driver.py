@@ -20,11 +20,17 @@ import argparse
 import atexit
 import json
 import sys
-from time import sleep
+import time
 
 from rbCreate import Create
 from rbSnapper import Snapper
 from rbSnapper import Joints
+from recording import LogReader
+from recording import TrafficLog
+from recording import replay
+from simulation import Simulation
+from state_bus import StatePublisher
+from state_bus.bus import DEFAULT_PATH as STATE_PATH
 
 # This configuration places the gripper on the floor 4 inches in front of the Create
 front_floor_position = {
@@ -46,6 +52,8 @@ gripper = {
     'open': 99
 }
 
+arm_joints = (Joints.WAIST, Joints.SHOULDER, Joints.ELBOW, Joints.WRIST)
+
 
 def close_connection(robot, arm):
     """
@@ -60,65 +68,76 @@ def close_connection(robot, arm):
         robot.disconnect()
 
     if arm is not None:
-        arm.stow()
+        arm.stow().wait()
+        arm.shutdown()
 
 
 def pick_up_brick(arm):
-    position = front_floor_position
+    """
+    Grab the brick in front of the Create and start stowing the arm
+    :return: MotionHandle for the stow, so the Create can start driving while the arm is still moving
+    """
+    position = dict(front_floor_position)
     position[Joints.GRIPPER] = gripper['open']
-    arm.set_joints(position)
-    sleep(2)
-    arm.set_gripper(gripper['closed'])
-    arm.stow()
+    arm.set_joints(position).wait()
+    arm.clock.sleep(2)
+    arm.set_gripper(gripper['closed']).wait()
+    return arm.stow()
 
 
-def put_down_brick(arm):
-    position = front_floor_position
-    position[Joints.GRIPPER] = gripper['closed']
-    arm.set_joints(front_floor_position)
-    sleep(1)
-    arm.set_gripper(gripper['open'])
-    sleep(1)
-    arm.stow()
+def put_down_brick(arm, reach=0):
+    """
+    Place the held brick in front of the Create and start stowing the arm
+    :param reach: Distance, in mm, beyond the front floor position to place the brick.  Negative values place it
+                  closer to the Create
+    :return: MotionHandle for the stow, so the Create can start driving while the arm is still moving
+    """
+    x, y, z, pitch = arm.kinematics.forward(*[front_floor_position[joint] for joint in arm_joints])
+    arm.move_to(x + reach, y, z).wait()
+    arm.clock.sleep(1)
+    arm.set_gripper(gripper['open']).wait()
+    arm.clock.sleep(1)
+    return arm.stow()
 
 
 def build_wall(create, arm):
     """
     This is the main method that is called to drive the create between the source and target locations
     :param create: The instance of the Create that will be controlled
-    :param arm: The instance of the Snapper arm
+    :param arm: The instance of the Snapper arm, created with async_motion so it can stow while the Create drives
     :return: None
     """
-
     # We assume that we start right in front of the first brick
-    forward_speed = 100  # The speed with which to drive forward
-    forward_drive_duration = 2  # The amount of time to drive in a straight line
-    iteration_delta = 0.3  # The amount to increase the forward drive time per iteration
-    iteration_buffer = 0.0  # The total amount of time to add to the base forward drive time
+    iterations = 3  # The number of bricks to move
+    forward_speed = 100  # The speed with which to drive forward (mm/s)
+    forward_distance = 200  # The distance from the pile to where the first brick is placed (mm)
+    pickup_delta = 30  # The extra distance to drive back each iteration, to reach the next brick to pick up (mm)
+    # How much farther from the pile each brick is placed than the last (mm).  The Create also starts each trip
+    # pickup_delta farther back, so placed bricks end up brick_spacing - pickup_delta apart
+    brick_spacing = 60
     rotation_speed = 124  # The speed with which to rotate in place (mm/s)
-    rotation_duration = 3.18  # The amount of time to spin
-    
-    for _ in range(3):
-        pick_up_brick(arm)
-
-        create.drive_direct(rotation_speed, -rotation_speed)
-        sleep(rotation_duration)
 
-        create.drive_direct(forward_speed, forward_speed)
-        sleep(forward_drive_duration + iteration_buffer)
+    # Rather than driving farther for each brick, the Create always drives out to where the farthest brick goes and
+    # the arm reaches back toward the pile to place the others
+    reach_span = brick_spacing * (iterations - 1)
+    placement_distance = forward_distance + reach_span
 
-        create.stop_motion()
-        put_down_brick(arm)
+    # Every drive and turn stops on feedback from the wheel encoders, so each leg ends as soon as the Create is in
+    # position
+    stowing = None
+    for iteration in range(iterations):
+        # The arm finishes stowing while the Create turns; its next move is queued behind the stow
+        pick_up_brick(arm)
 
-        create.drive_direct(-rotation_speed, rotation_speed)
-        sleep(rotation_duration)
+        create.turn_angle(180, rotation_speed)
+        create.drive_distance(placement_distance, forward_speed)
+        stowing = put_down_brick(arm, iteration * brick_spacing - reach_span)
 
-        create.drive_direct(forward_speed, forward_speed)
-        iteration_buffer += iteration_delta
-        sleep(forward_drive_duration + iteration_buffer)
+        create.turn_angle(-180, rotation_speed)
+        create.drive_distance(placement_distance + pickup_delta, forward_speed)
 
-        create.stop_motion()
-        iteration_buffer += iteration_delta
+    if stowing is not None:
+        stowing.wait()
 
 
 def main():
@@ -126,8 +145,22 @@ def main():
     ap.add_argument("-c", "--config", help="the path to the JSON formatted config file specifying the serial port to use")
     ap.add_argument("-s", "--serial", help="the serial port to use")
     ap.add_argument("-t", "--test", help="Use a mocked serial connection to debug or test locally")
+    ap.add_argument("-b", "--baud", type=int,
+                    help="switch the Create to this baud rate once connected, falling back to 19200 if unreliable")
+    ap.add_argument("--simulate", action="store_true",
+                    help="Run against the simulated Create and arm on a virtual clock, then print what they did")
+    ap.add_argument("-r", "--record", help="record all serial and I2C traffic in this binary log file")
+    ap.add_argument("--replay", help="replay a traffic log into the simulated Create and arm, then print what they did")
+    ap.add_argument("-p", "--publish-state", nargs="?", const=STATE_PATH,
+                    help="publish the live arm and Create state for other processes, in {0} by default".format(
+                        STATE_PATH))
     args = vars(ap.parse_args())
 
+    if args["replay"]:
+        return replay_log(args["replay"])
+    if args["simulate"]:
+        return simulate(args["record"], args["publish_state"])
+
     if not (args["config"] or args["serial"]) and not args["test"]:
         print "You must specify either the config file or the serial port to use"
         return -1
@@ -149,11 +182,20 @@ def main():
 
     # Initialize the Create robot and arm
     try:
+        traffic = TrafficLog(args["record"]) if args["record"] else None
+        if traffic is not None:
+            atexit.register(traffic.close)  # Registered first, so it runs after the connections are closed
+
         robot = Create(port)
-        robot.connect(test)
+        robot.connect(test, baudrate=args["baud"], record=traffic)
         robot.set_safe_mode()
 
-        arm = Snapper()
+        arm = Snapper(async_motion=True, record=traffic)
+
+        if args["publish_state"]:
+            publisher = StatePublisher(args["publish_state"])
+            publisher.attach_create(robot)
+            publisher.attach_arm(arm)
 
         atexit.register(close_connection, robot, arm)
 
@@ -165,5 +207,69 @@ def main():
 
     return 0
 
+
+def simulate(record=None, publish_state=None):
+    """
+    Build the wall in simulation, which takes as long as the computation rather than as long as the robot would
+    :param record: Path of a traffic log to record the run in, or None
+    :param publish_state: Path to publish the live state in, timestamped on the virtual clock, or None
+    :return: 0
+    """
+    simulation = Simulation()
+    started = time.time()
+    traffic = TrafficLog(record, simulation.clock) if record else None
+
+    robot = simulation.robot(record=traffic)
+    robot.set_safe_mode()
+    arm = simulation.arm(record=traffic)
+    publisher = None
+    if publish_state:
+        publisher = StatePublisher(publish_state, simulation.clock)
+        publisher.attach_create(robot)
+        publisher.attach_arm(arm)
+    build_wall(robot, arm)
+    close_connection(robot, arm)
+    if traffic is not None:
+        traffic.close()
+        print "Recorded {0} frames, {1} bytes, in {2}".format(traffic.frames, traffic.bytes_logged, record)
+    if publisher is not None:
+        publisher.close()
+        print "Published the state {0} times in {1}".format(publisher.publishes, publish_state)
+
+    print_simulation(simulation, started)
+    return 0
+
+
+def replay_log(path):
+    """
+    Feed a recorded run into the simulated Create and arm, to see what the real ones did
+    :return: 0, or 1 if the arm's replies differed from the recording
+    """
+    reader = LogReader(path)
+    if reader.start_time is None:
+        print "{0} holds no traffic".format(path)
+        return 0
+    simulation = Simulation(start=reader.start_time)
+    started = time.time()
+    devices = {}
+    for name in reader.channels.values():
+        devices[name] = simulation.pca9685 if name == "i2c" else simulation.create
+    statistics = replay(reader, devices, simulation.clock)
+    reader.close()
+
+    print "Replayed {0} frames spanning {1:.2f}s, {2} arm reads differed from the recording".format(
+        statistics.frames, reader.end_time - reader.start_time, statistics.mismatches)
+    print_simulation(simulation, started)
+    return 1 if statistics.mismatches else 0
+
+
+def print_simulation(simulation, started):
+    timeline = simulation.timeline
+    x, y, heading = simulation.create.pose()
+    print "Simulated {0:.2f}s in {1:.3f}s: {2} timeline events, {3} PWM changes, {4} Create commands".format(
+        simulation.clock.time(), time.time() - started, len(timeline), len(timeline.select("pca9685", "pwm")),
+        len(timeline.select("create")))
+    print "Create finished at x={0:.1f}mm y={1:.1f}mm heading={2:.1f} degrees".format(x, y, heading)
+
 if __name__ == "__main__":
     sys.exit(main())
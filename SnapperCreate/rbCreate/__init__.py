@@ -1,5 +1,7 @@
+from async_create import AsyncCreate
 from create import Create
+from event_loop import EventLoop
+from fleet import Fleet
 from options import DriveDirection
 from options import SpecialRadii
 from options import TurnDirection
-
@@ -0,0 +1,395 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# The Create on an EventLoop, for controllers that run several devices from one thread.
+#
+# AsyncCreate has the same commands as Create, but nothing blocks.  Commands are appended to an output buffer that
+# is written whenever the port can take it, and received bytes are handled when the loop sees them arrive: stream
+# frames go to the AsyncSensorStream, and anything else is the reply to a query.  A real port is opened
+# non-blocking and watched by file descriptor; the mock and simulated ports, and wrappers without a file
+# descriptor, are polled.
+import errno
+import os
+import struct
+import time
+from collections import deque
+
+import serial
+
+import commands
+import sensors
+from create import Create
+from create import READ_TIMEOUT
+from event_loop import Future
+from stream import DEFAULT_CAPACITY
+from stream import SampleRing
+from stream import SensorSample
+from stream_parser import StreamParser
+from testing.mock_serial import MockSerial
+
+READ_SIZE = 1024  # Most bytes taken from the port at a time
+
+
+class AsyncSensorStream(object):
+    """
+    Sensor stream frames parsed as they arrive on the loop.  Iterating the stream gives a Future for each sample in
+    turn, which a task yields to wait for it:
+
+        for pending in robot.start_stream([sensors.VOLTAGE]):
+            sample = yield pending
+            if sample is None:
+                break  # The stream was stopped
+    """
+
+    def __init__(self, packet_ids, clock, capacity=DEFAULT_CAPACITY):
+        self.parser = StreamParser(packet_ids)
+        self.packet_ids = list(self.parser.packet_ids)
+        self.clock = clock
+        self.ring = SampleRing(capacity)
+        self.closed = False
+        self._unread = deque(maxlen=capacity)  # Samples not yet taken by the iterator; the oldest are dropped
+        self._waiting = deque()  # Futures handed out for samples that have not arrived
+        self._listeners = []
+
+    @property
+    def frames(self):
+        return self.parser.frames
+
+    @property
+    def bad_frames(self):
+        return self.parser.bad_frames
+
+    @property
+    def bytes_discarded(self):
+        return self.parser.bytes_discarded
+
+    def subscribe(self, listener):
+        """
+        Call listener(sample) with every new SensorSample.  Odometry.attach works on this stream too.
+        """
+        self._listeners = self._listeners + [listener]
+
+    def unsubscribe(self, listener):
+        self._listeners = [existing for existing in self._listeners if existing != listener]
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        """
+        :return: Future for the next sample not yet taken, which finishes with None if the stream is stopped first
+        """
+        future = Future()
+        if self._unread:
+            future.set_result(self._unread.popleft())
+        elif self.closed:
+            raise StopIteration
+        else:
+            self._waiting.append(future)
+        return future
+
+    def latest(self):
+        return self.ring.latest()
+
+    def window(self, seconds, now=None):
+        return self.ring.window(seconds, now)
+
+    def feed(self, data):
+        """
+        Parse received bytes and hand out the samples they complete
+        """
+        self.parser.feed(data)
+        now = self.clock.time()
+        for values in self.parser.decode():
+            sample = SensorSample(now, dict(zip(self.packet_ids, values)))
+            self.ring.append(sample)
+            for listener in self._listeners:
+                listener(sample)
+            if self._waiting:
+                self._waiting.popleft().set_result(sample)
+            else:
+                self._unread.append(sample)
+
+    def close(self):
+        self.closed = True
+        while self._waiting:
+            self._waiting.popleft().set_result(None)
+
+
+class AsyncCreate(Create):
+    """
+    A Create driven from an EventLoop.  Commands return straight away; query returns a Future and start_stream an
+    AsyncSensorStream.  The closed loop moves, command writer and baud negotiation need the blocking Create.
+    """
+
+    def __init__(self, port, loop):
+        """
+        :param port: The serial port that the Create is connected to
+        :param loop: The EventLoop that runs the port.  Its clock times the Create too
+        """
+        Create.__init__(self, port, clock=loop.clock)
+        self.loop = loop
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._fd = None  # File descriptor of a real port, None for a polled one
+        self._output = bytearray()  # Bytes waiting to be written
+        self._drained = []  # Futures waiting for the output to be written
+        self._replies = deque()  # (PacketGroup, Future, Timer) for each query awaiting its reply
+        self._reply = bytearray()  # Bytes received towards the oldest query's reply
+
+    # region Connection
+    def connect(self, test=False, connection=None, record=None):
+        """
+        Open the port without blocking reads or writes, start watching it on the loop and send Start
+        :param test: If true, use a MockSerial
+        :param connection: An already open serial-like object to use instead of opening the port
+        :param record: recording.TrafficLog to record the port's traffic in.  A recorded port is polled
+        """
+        if self.connected is True:
+            return True
+        if connection is not None:
+            self.connection = connection
+        elif test:
+            self.connection = MockSerial(port=self.port, parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE,
+                                         bytesize=serial.EIGHTBITS, baudrate=commands.BAUDRATE_CONNECTION_DEFAULT)
+        else:
+            try:
+                self.connection = serial.Serial(port=self.port, parity=serial.PARITY_NONE,
+                                                stopbits=serial.STOPBITS_ONE, bytesize=serial.EIGHTBITS,
+                                                baudrate=commands.BAUDRATE_CONNECTION_DEFAULT, timeout=0)
+            except serial.SerialException as msg:
+                print msg
+                raise RuntimeError("Must select valid serial port")
+        if record is not None:
+            self.connection = record.serial(self.connection, str(self.port))
+
+        if isinstance(self.connection, MockSerial) or not hasattr(self.connection, "fileno"):
+            self.loop.add_poller(self._on_readable)
+        else:
+            self._fd = self.connection.fileno()
+            self.loop.add_reader(self._fd, self._on_readable)
+        self.connected = True
+        self.start()
+        return self.connection.is_open
+
+    def disconnect(self):
+        """
+        Send Passive mode, write whatever is still buffered and close the port
+        """
+        if self.connected is not True:
+            return
+        self.stop_stream()
+        self._send(commands.MODE_PASSIVE)
+        if self._fd is not None:
+            self.loop.remove_reader(self._fd)
+            self.loop.remove_writer(self._fd)
+        else:
+            self.loop.remove_poller(self._on_readable)
+        if self._output and self.connection is not None:
+            self.connection.write(bytes(self._output))  # The last write may block, as the loop no longer runs it
+            del self._output[:]
+        self._finish_drain()
+        while self._replies:
+            self._fail_reply(RuntimeError("Disconnected from the Create 2"))
+        self.connected = False
+        if self.connection is not None:
+            self.connection.close()
+        self._publish_state()
+
+    def drain(self):
+        """
+        :return: Future that finishes once every command given so far has been written
+        """
+        future = Future()
+        if self._output:
+            self._drained.append(future)
+        else:
+            future.set_result(None)
+        return future
+
+    # endregion
+
+    # region Sensors
+    def query(self, *packet_ids):
+        """
+        Read a group of sensors with Query List
+        :return: Future that finishes with a SensorRecord, or fails if the reply does not arrive within READ_TIMEOUT
+        """
+        if self.connected is not True:
+            raise RuntimeError("You must call connect before sending commands to to Create 2")
+        if self.stream is not None:
+            raise RuntimeError("Stop the sensor stream before querying, as the stream's frames share the port")
+        group = sensors.packet_group(packet_ids)
+        future = Future()
+        if not self._replies:
+            del self._reply[:]  # Anything left over is not the reply
+        self._send_command_raw(group.request)
+        timer = self.loop.call_later(READ_TIMEOUT, self._query_timed_out, future)
+        self._replies.append((group, future, timer))
+        return future
+
+    def start_stream(self, packet_ids, capacity=DEFAULT_CAPACITY):
+        """
+        Ask the Create to stream the given packets every 15ms
+        :return: AsyncSensorStream
+        """
+        if self.connected is not True:
+            raise RuntimeError("You must call connect before sending commands to to Create 2")
+        self.stop_stream()
+        self.stream = AsyncSensorStream(packet_ids, self.clock, capacity)
+        packet_ids = self.stream.packet_ids
+        self._send_command_raw(struct.pack(">BB{0}B".format(len(packet_ids)), int(commands.STREAM),
+                                           len(packet_ids), *packet_ids))
+        return self.stream
+
+    def stop_stream(self):
+        """
+        Pause the stream and end iteration over it
+        """
+        if self.stream is None:
+            return
+        self.pause_stream()
+        self.stream.close()
+        self.stream = None
+        self.odometry = None
+        self._publish_state()
+
+    def start_odometry(self):
+        raise RuntimeError("Attach an Odometry to the AsyncSensorStream instead")
+
+    def negotiate_baudrate(self, baudrate):
+        raise RuntimeError("Baud negotiation needs the blocking Create")
+
+    def start_writer(self, flush_interval=None):
+        raise RuntimeError("AsyncCreate already writes from the event loop")
+
+    def drive_distance(self, distance, speed=200, wait=True):
+        raise RuntimeError("Closed loop moves need the blocking Create")
+
+    def turn_angle(self, angle, speed=100, wait=True):
+        raise RuntimeError("Closed loop moves need the blocking Create")
+
+    # endregion
+
+    def emergency_stop(self):
+        """
+        Send the stop ahead of any further commands.  Nothing else writes to the port, so it only waits behind the
+        commands already buffered.
+        :return: Real seconds from the call to the stop being handed to the port
+        """
+        started = time.time()
+        self._send_command_raw(commands.STOP_MOTION_BYTES)
+        latency = time.time() - started
+        self.emergency_stops += 1
+        self.last_stop_latency = latency
+        self.max_stop_latency = max(self.max_stop_latency, latency)
+        self._commanded(0, 0)
+        return latency
+
+    # region Private Methods
+    def _send_command_raw(self, cmd, kind=None):
+        """
+        :return: True if the command was buffered for the port, False if there is no connection
+        """
+        if self.connection is None:
+            print "Not Connected"
+            return False
+        self._output.extend(cmd)
+        self._on_writable()
+        return True
+
+    def _on_writable(self):
+        try:
+            if self._fd is None:
+                self.connection.write(bytes(self._output))
+                written = len(self._output)
+            else:
+                written = os.write(self._fd, bytes(self._output))
+        except OSError as err:
+            if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self._lose_connection()
+                return
+            written = 0
+        except serial.SerialException:
+            self._lose_connection()
+            return
+        self.bytes_sent += written
+        del self._output[:written]
+        if self._output:
+            self.loop.add_writer(self._fd, self._on_writable)
+        else:
+            if self._fd is not None:
+                self.loop.remove_writer(self._fd)
+            self._finish_drain()
+
+    def _on_readable(self):
+        try:
+            if self._fd is None:
+                waiting = self.connection.in_waiting
+                data = self.connection.read(min(waiting, READ_SIZE)) if waiting else b""
+            else:
+                data = os.read(self._fd, READ_SIZE)
+        except OSError as err:
+            if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self._lose_connection()
+            return
+        except serial.SerialException:
+            self._lose_connection()
+            return
+        if not data:
+            return
+        self.bytes_received += len(data)
+        if self.stream is not None:
+            self.stream.feed(data)
+        elif self._replies:
+            self._reply.extend(data)
+            while self._replies and len(self._reply) >= self._replies[0][0].size:
+                group, future, timer = self._replies.popleft()
+                timer.cancel()
+                reply = bytes(self._reply[:group.size])
+                del self._reply[:group.size]
+                future.set_result(group.decode(reply))
+
+    def _query_timed_out(self, future):
+        if self._replies and self._replies[0][1] is future:
+            self._fail_reply(RuntimeError("Timed out waiting for the Create 2 to send sensor data"))
+
+    def _fail_reply(self, error):
+        group, future, timer = self._replies.popleft()
+        timer.cancel()
+        del self._reply[:]
+        future.set_exception(error)
+
+    def _finish_drain(self):
+        drained = self._drained
+        self._drained = []
+        for future in drained:
+            future.set_result(None)
+
+    def _lose_connection(self):
+        print "Lost Connection"
+        if self._fd is not None:
+            self.loop.remove_reader(self._fd)
+            self.loop.remove_writer(self._fd)
+        else:
+            self.loop.remove_poller(self._on_readable)
+        self.connection = None
+        while self._replies:
+            self._fail_reply(RuntimeError("Lost the connection to the Create 2"))
+
+    # endregion
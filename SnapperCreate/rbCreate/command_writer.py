@@ -0,0 +1,196 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Sends Create commands from a background thread, so callers never block on the serial port.
+#
+# Commands wait in a queue until the writer thread sends everything queued in a single write.  A command given a
+# kind, such as MOTION, replaces a queued command of the same kind instead of waiting behind it, as long as no
+# command without a kind has been queued since.  Only the newest wheel speeds are sent, while mode and lifecycle
+# commands, which have no kind, always go out in the order they were given.
+import threading
+import time
+
+import serial
+
+MOTION = "motion"  # DRIVE and DRIVE_DIRECT, which each replace the wheel speeds set by the last
+DEFAULT_FLUSH_INTERVAL = 0.015  # The Create acts on commands every 15ms, so writing more often gains nothing
+
+
+class CommandWriter(object):
+    """
+    A queue of commands for the Create, written to the port by a background thread
+    """
+
+    def __init__(self, connection, lock, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        """
+        :param connection: The open serial port
+        :param lock: Lock held around every write, shared with anything else using the port
+        :param flush_interval: Minimum time between writes, in seconds.  Commands given in the meantime are coalesced
+                               and sent together
+        """
+        self.connection = connection
+        self.lock = lock
+        self.flush_interval = flush_interval
+        self.error = None  # The exception that stopped the thread, if any
+        self.queued = 0  # Commands given to put
+        self.coalesced = 0  # Commands replaced by a newer command of the same kind before being sent
+        self.discarded = 0  # Commands dropped by discard before being sent
+        self.sent = 0  # Commands written to the port
+        self.flushes = 0  # Writes to the port
+        self.max_depth = 0  # Most commands waiting at once
+        self.max_latency = 0.0  # Longest time a sent command waited in the queue, in seconds
+        self._total_latency = 0.0
+        self._queue = []  # [data, kind, time queued] for each waiting command, oldest first
+        self._in_flight = 0  # Commands taken from the queue and not yet written
+        self._changed = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    @property
+    def depth(self):
+        """
+        Number of commands waiting to be sent
+        """
+        return len(self._queue)
+
+    @property
+    def mean_latency(self):
+        """
+        Mean time a sent command waited in the queue, in seconds
+        """
+        return self._total_latency / self.sent if self.sent else 0.0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="CreateWriter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Send whatever is still queued, then stop the writer thread and wait for it to exit
+        """
+        with self._changed:
+            self._running = False
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def put(self, data, kind=None):
+        """
+        Queue a command
+        :param data: The command's bytes
+        :param kind: Commands of the same kind supersede each other.  None for commands that must all be sent
+        """
+        with self._changed:
+            if self.error is not None:
+                raise RuntimeError("Lost the connection to the Create 2")
+            if not self._running:
+                raise RuntimeError("The command writer has been stopped")
+            self.queued += 1
+            now = time.time()
+            queue = self._queue
+            if kind is not None:
+                for item in reversed(queue):
+                    if item[1] is None:
+                        break
+                    if item[1] == kind:
+                        item[0] = data  # Keeps its place and the time it was first queued
+                        self.coalesced += 1
+                        return
+            queue.append([data, kind, now])
+            self.max_depth = max(self.max_depth, len(queue))
+            self._changed.notify_all()
+
+    def discard(self, kind):
+        """
+        Drop every queued command of a kind
+        :return: The number of commands dropped
+        """
+        with self._changed:
+            kept = [item for item in self._queue if item[1] != kind]
+            dropped = len(self._queue) - len(kept)
+            self._queue = kept
+            self.discarded += dropped
+            self._changed.notify_all()
+            return dropped
+
+    def flush(self, timeout=None):
+        """
+        Block until every queued command has been written
+        :param timeout: Maximum time to wait, in seconds.  None waits indefinitely
+        :return: True if the queue was emptied, False if the timeout expired or the thread stopped first
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._changed:
+            while (self._queue or self._in_flight) and self._thread is not None and self.error is None:
+                if deadline is None:
+                    self._changed.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+            return not (self._queue or self._in_flight)
+
+    def _run(self):
+        last_write = None
+        while True:
+            with self._changed:
+                while not self._queue and self._running:
+                    self._changed.wait()
+                if not self._queue:
+                    return
+            if self.flush_interval and last_write is not None:
+                delay = last_write + self.flush_interval - time.time()
+                if delay > 0:
+                    time.sleep(delay)  # Let more commands arrive, and coalesce, before the next write
+
+            try:
+                # The batch is taken with the port held, so a caller that discards commands and then takes the port,
+                # like an emergency stop, knows none of them will be written after it
+                with self.lock:
+                    with self._changed:
+                        batch = self._queue
+                        self._queue = []
+                        self._in_flight = len(batch)
+                    if batch:
+                        self.connection.write("".join(item[0] for item in batch))
+            except serial.SerialException as err:
+                with self._changed:
+                    self.error = err
+                    self._running = False
+                    self._in_flight = 0
+                    self._changed.notify_all()
+                return
+            last_write = time.time()
+
+            if not batch:
+                continue  # Everything was discarded while the thread waited
+            with self._changed:
+                for item in batch:
+                    latency = last_write - item[2]
+                    self._total_latency += latency
+                    self.max_latency = max(self.max_latency, latency)
+                self.sent += len(batch)
+                self.flushes += 1
+                self._in_flight = 0
+                self._changed.notify_all()
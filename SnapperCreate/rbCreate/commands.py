@@ -17,6 +17,7 @@
     SOFTWARE.
 """
 # This file contains the constants that will be used to send and receive commands from the Connect 2
+import struct
 
 # States
 STATE_START = '128'  # [Passive, Save, Full]
@@ -45,6 +46,23 @@ BAUD_115200 = '11'
 
 BAUDRATE_CONNECTION_DEFAULT = 115200  # Default startup baudrate
 BAUDRATE_CONNECTION_SLOW = 19200  # For slower connections
+BAUD_SETTLE = 0.1  # Seconds to wait after a Baud command before talking at the new rate
+
+# Baud code for each rate the Create supports
+BAUD_CODES = {
+    300: BAUD_300,
+    600: BAUD_600,
+    1200: BAUD_1200,
+    2400: BAUD_2400,
+    4800: BAUD_4800,
+    9600: BAUD_9600,
+    14400: BAUD_14400,
+    19200: BAUD_19200,
+    28800: BAUD_28800,
+    38400: BAUD_38400,
+    57600: BAUD_57600,
+    115200: BAUD_115200,
+}
 
 # Built in Routines
 RETURN_TO_DOCK = '143'  # Seek the home base and begin charging, setting mode to Passive
@@ -52,3 +70,31 @@ RETURN_TO_DOCK = '143'  # Seek the home base and begin charging, setting mode to
 # Actuator commands
 DRIVE = '137'
 DRIVE_DIRECT = '145'
+
+# Sensors
+QUERY_LIST = '149'  # + number of packets + packet IDs.  The Create replies once with the packets' values
+STREAM = '148'  # + number of packets + packet IDs.  The Create then sends the packets every 15ms
+PAUSE_RESUME_STREAM = '150'  # + 0 to pause or 1 to resume
+
+
+# Binary encoding.  Commands without parameters are encoded once here, and commands with parameters are packed by a
+# precompiled Struct, so every command goes out in a single write of exactly its own bytes.
+def encode(command):
+    """
+    :param command: A command written as space separated decimal strings, such as BAUD + ' ' + BAUD_57600
+    :return: The bytes to write to the Create
+    """
+    values = [int(value) for value in command.split()]
+    return struct.pack(">{0}B".format(len(values)), *values)
+
+
+ENCODED = dict((command, encode(command)) for command in (STATE_START, STATE_RESET, STATE_STOP, MODE_SAFE, MODE_FULL,
+                                                        RETURN_TO_DOCK))
+PAUSE_STREAM_BYTES = encode(PAUSE_RESUME_STREAM + ' 0')
+RESUME_STREAM_BYTES = encode(PAUSE_RESUME_STREAM + ' 1')
+
+DRIVE_OPCODE = int(DRIVE)
+DRIVE_DIRECT_OPCODE = int(DRIVE_DIRECT)
+DRIVE_STRUCT = struct.Struct(">Bhh")  # Opcode, velocity (mm/s), radius (mm)
+DRIVE_DIRECT_STRUCT = struct.Struct(">Bhh")  # Opcode, right velocity (mm/s), left velocity (mm/s)
+STOP_MOTION_BYTES = DRIVE_DIRECT_STRUCT.pack(DRIVE_DIRECT_OPCODE, 0, 0)
@@ -19,14 +19,28 @@
 
 import struct
 import thread
+import threading
+import time
 
 import serial
 import serial.tools.list_ports
 
+import command_writer
 import commands
+import moves
+import sensors
+import stream
+from odometry import Odometry
+from odometry import wheel_speeds
 from options import *
 from testing.mock_serial import MockSerial
 
+READ_TIMEOUT = 0.1  # Seconds a read waits for data, so the sensor thread can notice when it is stopped
+# A reply to the link check query is only believed if it reports one of the modes the Create can be in once started,
+# and a battery voltage it could really have, in mV.  A garbled reply is very unlikely to pass both.
+LINK_CHECK_MODES = (1, 2, 3)
+LINK_CHECK_VOLTAGE = (8000, 20000)
+
 
 class Create:
     """
@@ -39,7 +53,7 @@ class Create:
     """
 
     # region Construction and Initialization
-    def __init__(self, port):
+    def __init__(self, port, clock=None):
         """
         Construct a new instance of the Create robot.
 
@@ -47,20 +61,44 @@ class Create:
             port (String):  The serial port that the Create is connected to. On Windows this should be of the
                             form 'COMX', while on Unix based platforms it should be the full path descriptor.
                             The path descriptor can be found by running 'ls /dev/tty.*'
+            clock:          Object providing time() and sleep(seconds), used by anything that times the Create's
+                            motion.  Defaults to the time module; pass a simulation.VirtualClock to run without
+                            waiting.
         """
         if port is None:
             raise RuntimeError("Must provide the identifier of the serial port used to communicate with the Create 2")
         self.port = port
+        self.clock = clock if clock is not None else time
         self.connected = False
         self.connection = None
+        self.mocked = False  # True on a MockSerial connection, which never sends any sensor data
         self.portLock = thread.allocate_lock()
-
-    def connect(self, test=False):
+        self._stop_clear = threading.Event()  # Cleared while an emergency stop is under way
+        self._stop_clear.set()
+        self.emergency_stops = 0
+        self.last_stop_latency = None  # Real seconds from calling emergency_stop to the stop being written
+        self.max_stop_latency = 0.0
+        self.stream = None  # The SensorStream, while sensor streaming is on
+        self.writer = None  # The CommandWriter, while commands are sent from a background thread
+        self.odometry = None  # The Odometry following the stream, once start_odometry has been called
+        self._move = None  # MoveController of the latest drive_distance or turn_angle
+        self.command_latency = moves.COMMAND_LATENCY  # Allowed for when drive_distance and turn_angle stop the robot
+        self.deceleration = moves.DECELERATION
+        self.stream_thread = True  # Read the sensor stream on a background thread, rather than as moves wait on it
+        self.right_speed = 0  # Wheel speeds last commanded, in mm/s
+        self.left_speed = 0
+        self.state_bus = None  # state_bus.StatePublisher the drive state is published to, once attached
+
+    def connect(self, test=False, connection=None, baudrate=None, record=None):
         """
         Open the connection to the iRobot Create 2 and put in Safe mode.
 
         :param test: If true, the connection will be faked.  This allows running the code in testing and debugging without actually
                         plugging into the Connect 2
+        :param connection: An already open serial-like object to use instead of opening the port, such as a
+                           simulation.SimulatedCreate
+        :param baudrate: Rate to switch to once connected, with negotiate_baudrate.  None stays at the default rate
+        :param record: recording.TrafficLog to record everything sent and received on the port in
         :return: None
         """
         if self.connected is True:
@@ -68,7 +106,10 @@ class Create:
 
         with self.portLock:
             try:
-                if test:
+                if connection is not None:
+                    self.connection = connection
+                elif test:
+                    self.mocked = True
                     self.connection = MockSerial(
                         port=self.port,
                         parity=serial.PARITY_NONE,
@@ -82,15 +123,20 @@ class Create:
                         stopbits=serial.STOPBITS_ONE,
                         bytesize=serial.EIGHTBITS,
                         baudrate=commands.BAUDRATE_CONNECTION_DEFAULT,
+                        timeout=READ_TIMEOUT,
                     )
             except serial.SerialException as msg:
                 print msg
                 print "Please choose from the list below: "
                 print [port.device for port in serial.tools.list_ports.comports()]
                 raise RuntimeError("Must select valid serial port")
+            if record is not None:
+                self.connection = record.serial(self.connection, str(self.port))
 
         self.connected = True
         self.start()
+        if baudrate is not None and not test:
+            self.negotiate_baudrate(baudrate)
         return self.connection.is_open
 
     def disconnect(self):
@@ -101,8 +147,38 @@ class Create:
         if self.connected is not True:
             return
 
+        self.stop_stream()
         self._send(commands.MODE_PASSIVE)
+        self.stop_writer()
+        if self.connection.baudrate != commands.BAUDRATE_CONNECTION_DEFAULT:
+            # The Create keeps its rate until it is power cycled, so leave it where the next connect expects it
+            self._switch_baudrate(commands.BAUDRATE_CONNECTION_DEFAULT)
         self.connection.close()
+        self._publish_state()
+
+    def negotiate_baudrate(self, baudrate):
+        """
+        Switch the Create and the port to a new baud rate, and check the link with a sensor round trip.  If the link
+        does not work at the new rate, fall back to BAUDRATE_CONNECTION_SLOW.
+        :param baudrate: One of the rates in commands.BAUD_CODES
+        :return: The baud rate in use
+        """
+        if baudrate not in commands.BAUD_CODES:
+            raise RuntimeError("The Create 2 does not support {0} baud".format(baudrate))
+        if self.stream is not None:
+            raise RuntimeError("Stop the sensor stream before changing the baud rate")
+        previous = self.connection.baudrate
+        if baudrate == previous or self._switch_baudrate(baudrate):
+            if self._link_works():
+                return baudrate
+
+        # The Create may have switched or may still be at the old rate, so try asking it to slow down at both
+        slow = commands.BAUDRATE_CONNECTION_SLOW
+        for rate in (baudrate, previous):
+            self._set_port_baudrate(rate)
+            if self._switch_baudrate(slow) and self._link_works():
+                return slow
+        raise RuntimeError("The Create 2 did not respond at {0} or {1} baud".format(baudrate, slow))
 
     # endregion
 
@@ -166,6 +242,129 @@ class Create:
 
     # endregion
 
+    # region Sensors
+    def query(self, *packet_ids):
+        """
+        Read a group of sensors in a single round trip, using Query List.  Distance and angle, which report the
+        change since they were last read, are reset by the query.
+        :param packet_ids: IDs of the packets to read, from the sensors module
+        :return: SensorRecord namedtuple with a field per packet, named as in sensors.PACKETS
+        """
+        if self.connected is not True:
+            raise RuntimeError("You must call connect before sending commands to to Create 2")
+        if self.stream is not None:
+            raise RuntimeError("Stop the sensor stream before querying, as the stream's frames share the port")
+        group = sensors.packet_group(packet_ids)
+        if self.writer is not None:
+            self.writer.flush()  # The reply must not be mixed up with commands still waiting to go out
+        try:
+            with self.portLock:
+                waiting = self.connection.in_waiting
+                if waiting:
+                    self.connection.read(waiting)  # Discard anything left over, so it isn't taken for the reply
+                self.connection.write(group.request)
+                data = self.connection.read(group.size)
+        except serial.SerialException:
+            self.connection = None
+            raise RuntimeError("Lost the connection to the Create 2")
+        if len(data) < group.size:
+            raise RuntimeError("Timed out waiting for the Create 2 to send sensor data")
+        return group.decode(data)
+
+    def start_stream(self, packet_ids, capacity=stream.DEFAULT_CAPACITY):
+        """
+        Ask the Create to send the given sensor packets every 15ms, and start a background thread that parses them,
+        unless stream_thread has been turned off.  Replaces any stream already running.
+        :param packet_ids: IDs of the packets to stream, from the sensors module
+        :param capacity: Number of samples of history to keep
+        :return: The SensorStream, which holds the latest sample and the recent history
+        """
+        if self.connected is not True:
+            raise RuntimeError("You must call connect before sending commands to to Create 2")
+        self.stop_stream()
+        self.stream = stream.SensorStream(self.connection, packet_ids, self.clock, capacity, self.stream_thread)
+        packet_ids = self.stream.packet_ids
+        self._send_command_raw(struct.pack(">BB{0}B".format(len(packet_ids)), int(commands.STREAM),
+                                           len(packet_ids), *packet_ids))
+        self.stream.start()
+        return self.stream
+
+    def pause_stream(self):
+        """
+        Stop the Create sending stream frames, keeping the history received so far
+        """
+        self._send_command_raw(commands.PAUSE_STREAM_BYTES)
+
+    def resume_stream(self):
+        """
+        Restart a paused stream with the same packets
+        """
+        self._send_command_raw(commands.RESUME_STREAM_BYTES)
+
+    def stop_stream(self):
+        """
+        Pause the stream and stop the thread reading it
+        """
+        if self.stream is None:
+            return
+        if self._move is not None:
+            self._move.cancel()
+        self.pause_stream()
+        self.stream.stop()
+        self.stream = None
+        self.odometry = None
+        self._publish_state()
+
+    def start_odometry(self):
+        """
+        Track the Create's pose from its wheel encoders.  Restarts the sensor stream with the encoder packets added if
+        it does not already include them, and waits for the first reading.
+        :return: The Odometry, also kept in self.odometry
+        """
+        if self.odometry is not None:
+            return self.odometry
+        packet_ids = list(self.stream.packet_ids) if self.stream is not None else []
+        missing = [packet_id for packet_id in Odometry.ENCODER_PACKETS if packet_id not in packet_ids]
+        if missing or self.stream is None:
+            self.start_stream(packet_ids + missing)
+        odometry = Odometry()
+        odometry.attach(self.stream)
+        if self.state_bus is not None:
+            self.stream.subscribe(self._publish_state)  # After the odometry, so each pose is published as it changes
+        while odometry.pose() is None:
+            if not moves.step(self.stream, self.clock):
+                raise RuntimeError("Timed out waiting for the Create 2 to stream its encoders")
+        self.odometry = odometry
+        return odometry
+
+    # endregion
+
+    # region Command Writer
+    def start_writer(self, flush_interval=command_writer.DEFAULT_FLUSH_INTERVAL):
+        """
+        Send commands from a background thread, so commands return without waiting for the port.  A drive command
+        replaces any drive command still waiting to be sent, so only the newest wheel speeds go out.
+        :param flush_interval: Minimum time between writes, in seconds
+        :return: The CommandWriter, which counts the commands queued, coalesced and sent
+        """
+        if self.connected is not True:
+            raise RuntimeError("You must call connect before sending commands to to Create 2")
+        self.stop_writer()
+        self.writer = command_writer.CommandWriter(self.connection, self.portLock, flush_interval)
+        self.writer.start()
+        return self.writer
+
+    def stop_writer(self):
+        """
+        Send any commands still waiting, then go back to writing each command as it is given
+        """
+        if self.writer is None:
+            return
+        self.writer.stop()
+        self.writer = None
+
+    # endregion
+
     # region Actuation
     def drive_direct(self, right_speed=0, left_speed=0):
         """
@@ -177,9 +376,9 @@ class Create:
         right_speed = self._clamp(right_speed, -500, 500)
         left_speed = self._clamp(left_speed, -500, 500)
 
-        command = int(commands.DRIVE_DIRECT)
-        cmd = struct.pack(">Bhh", command, right_speed, left_speed)
-        self._send_command_raw(cmd)
+        if self._send_command_raw(commands.DRIVE_DIRECT_STRUCT.pack(commands.DRIVE_DIRECT_OPCODE, right_speed,
+                                                                    left_speed), command_writer.MOTION):
+            self._commanded(right_speed, left_speed)
 
     def drive(self, direction=DriveDirection.Standstill, speed=0, turn_direction=TurnDirection.Straight,
               turn_radius=SpecialRadii.straight()):
@@ -200,9 +399,9 @@ class Create:
         if turn_direction == TurnDirection.Right:
             turn_radius *= -1
 
-        command = int(commands.DRIVE)
-        cmd = struct.pack(">Bhh", command, speed, turn_radius)
-        self._send_command_raw(cmd)
+        if self._send_command_raw(commands.DRIVE_STRUCT.pack(commands.DRIVE_OPCODE, speed, turn_radius),
+                                  command_writer.MOTION):
+            self._commanded(*wheel_speeds(speed, turn_radius))
 
     def drive_straight_forward(self, speed=0):
         """
@@ -230,6 +429,79 @@ class Create:
         self.drive(direction=DriveDirection.Standstill, speed=0, turn_direction=TurnDirection.Straight,
                    turn_radius=SpecialRadii.straight())
 
+    def emergency_stop(self):
+        """
+        Stop the Create as quickly as possible.  Drive commands waiting in the command writer are dropped, and drive
+        commands from other threads give way, so the stop only waits for a write already in progress.  Any
+        drive_distance or turn_angle in progress is cancelled.
+        :return: Real seconds from the call to the stop being written
+        """
+        started = time.time()
+        if self.connected is not True or self.connection is None:
+            raise RuntimeError("You must call connect before sending commands to to Create 2")
+        self._stop_clear.clear()
+        try:
+            with self.portLock:
+                if self.writer is not None:
+                    self.writer.discard(command_writer.MOTION)  # The writer only takes commands with the port held
+                self.connection.write(commands.STOP_MOTION_BYTES)
+                self.connection.flush()
+        except serial.SerialException:
+            self.connection = None
+            raise RuntimeError("Lost the connection to the Create 2")
+        finally:
+            self._stop_clear.set()
+        latency = time.time() - started
+        self.emergency_stops += 1
+        self.last_stop_latency = latency
+        self.max_stop_latency = max(self.max_stop_latency, latency)
+        if self._move is not None:
+            self._move.cancel()
+        self._commanded(0, 0)
+        return latency
+
+    def drive_distance(self, distance, speed=200, wait=True):
+        """
+        Drive straight for a set distance, stopping on feedback from the wheel encoders.  Cancels any move in
+        progress.
+        :param distance: (mm) Positive drives forward, negative in reverse
+        :param speed: (mm/s) Wheel speed.  Clamped to [1, 500]
+        :param wait: If true, block until the robot has stopped
+        :return: moves.MoveHandle, whose result is the distance actually travelled
+        """
+        return self._closed_loop_move(moves.DRIVE, distance, speed, wait)
+
+    def turn_angle(self, angle, speed=100, wait=True):
+        """
+        Turn in place through a set angle, stopping on feedback from the wheel encoders.  Cancels any move in
+        progress.
+        :param angle: (degrees) Positive turns counterclockwise, to the left
+        :param speed: (mm/s) Wheel speed.  Clamped to [1, 500]
+        :param wait: If true, block until the robot has stopped
+        :return: moves.MoveHandle, whose result is the angle actually turned
+        """
+        return self._closed_loop_move(moves.TURN, angle, speed, wait)
+
+    def _closed_loop_move(self, kind, target, speed, wait):
+        if self.connected is not True:
+            raise RuntimeError("You must call connect before sending commands to to Create 2")
+        if self._move is not None:
+            self._move.cancel()
+        if self.mocked:
+            # There are no encoders to follow, so drive for as long as the move should take
+            self._move = moves.TimedMove(self, kind, target, self._clamp(speed, 1, 500), self.clock)
+            if wait:
+                self._move.wait()
+            return self._move
+        odometry = self.start_odometry()
+        self._move = moves.MoveController(self, odometry, kind, target, self._clamp(speed, 1, 500),
+                                          self.command_latency, self.deceleration)
+        self._move.begin(self.stream)
+        handle = moves.MoveHandle(self._move, self.stream, self.clock)
+        if wait:
+            handle.wait()
+        return handle
+
     # endregion
 
     # region Private Methods
@@ -242,27 +514,88 @@ class Create:
         """
         if self.connected is not True:
             raise RuntimeError("You must call connect before sending commands to to Create 2")
-        cmd = command
         if parambytes is not None:
-            cmd += ' ' + parambytes
-        self._send_command_ascii(cmd)
+            command += ' ' + parambytes
+        data = commands.ENCODED.get(command)
+        if data is None:
+            data = commands.encode(command)
+        self._send_command_raw(data)
 
-    def _send_command_ascii(self, command):
-        cmd = ""
-        for v in command.split():
-            cmd += chr(int(v))
-            self._send_command_raw(cmd)
+    def _switch_baudrate(self, baudrate):
+        """
+        Send a Baud command, wait for the Create to change rate and then change the port to match
+        :return: False if the port could not be set to the rate
+        """
+        if self.writer is not None:
+            self.writer.flush()
+        try:
+            with self.portLock:
+                self.connection.write(commands.encode(commands.BAUD + ' ' + commands.BAUD_CODES[baudrate]))
+                self.connection.flush()
+        except serial.SerialException:
+            self.connection = None
+            raise RuntimeError("Lost the connection to the Create 2")
+        self.clock.sleep(commands.BAUD_SETTLE)
+        return self._set_port_baudrate(baudrate)
 
-    def _send_command_raw(self, cmd):
+    def _set_port_baudrate(self, baudrate):
+        """
+        :return: False if the port does not support the rate
+        """
+        try:
+            with self.portLock:
+                self.connection.baudrate = baudrate
+        except (ValueError, serial.SerialException):
+            return False
+        return True
+
+    def _link_works(self):
+        """
+        :return: True if a sensor query gets a sensible reply
+        """
+        try:
+            reply = self.query(sensors.OI_MODE, sensors.VOLTAGE)
+        except RuntimeError:
+            return False
+        return reply.oi_mode in LINK_CHECK_MODES and LINK_CHECK_VOLTAGE[0] <= reply.voltage <= LINK_CHECK_VOLTAGE[1]
+
+    def _send_command_raw(self, cmd, kind=None):
+        """
+        :param kind: Passed on to the CommandWriter, when there is one, so newer commands of the same kind replace
+                     this one if it is still waiting
+        :return: True if the command was written or queued, False if it was dropped
+        """
+        if kind is not None and not self._stop_clear.is_set():
+            # An emergency stop is under way, and this would undo it.  Wait for it to finish, rather than competing
+            # for the port, and drop the command
+            self._stop_clear.wait()
+            return False
+        if self.writer is not None:
+            self.writer.put(cmd, kind)
+            return True
         try:
             if self.connection is not None:
                 with self.portLock:
+                    if kind is not None and not self._stop_clear.is_set():
+                        return False
                     self.connection.write(cmd)
+                return True
             else:
                 print "Not Connected"
         except serial.SerialException:
             print "Lost Connection"
             self.connection = None
+        return False
+
+    def _commanded(self, right_speed, left_speed):
+        self.right_speed = right_speed
+        self.left_speed = left_speed
+        self._publish_state()
+
+    def _publish_state(self, sample=None):
+        # Also subscribed to the stream while odometry runs, which passes the sample
+        if self.state_bus is not None:
+            self.state_bus.publish_create(self)
 
     def _clamp(self, value, range_low, range_high):
         """
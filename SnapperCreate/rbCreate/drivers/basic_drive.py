@@ -16,7 +16,6 @@
     TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
     SOFTWARE.
 """
-from time import sleep
 from rbCreate import DriveDirection
 from rbCreate import TurnDirection
 from rbCreate import SpecialRadii
@@ -34,19 +33,19 @@ class BasicDrive:
 
         self.create.drive(direction=DriveDirection.Forward, speed=100, turn_direction=TurnDirection.Left, turn_radius=SpecialRadii.straight())
 
-        sleep(1)
+        self.create.clock.sleep(1)
 
         self.create.drive(direction=DriveDirection.Forward, speed=200, turn_direction=TurnDirection.Left, turn_radius=500)
-        sleep(2)
+        self.create.clock.sleep(2)
 
         self.create.drive(direction=DriveDirection.Forward, speed=300, turn_direction=TurnDirection.Right, turn_radius=500)
-        sleep(1)
+        self.create.clock.sleep(1)
 
         self.create.drive(direction=DriveDirection.Forward, speed=200, turn_direction=TurnDirection.Straight, turn_radius=SpecialRadii.straight())
-        sleep(2)
+        self.create.clock.sleep(2)
 
         self.create.drive(direction=DriveDirection.Forward, speed=200, turn_direction=TurnDirection.Left, turn_radius=0)
-        sleep(5)
+        self.create.clock.sleep(5)
 
         print "End basic test drive routine"
         return
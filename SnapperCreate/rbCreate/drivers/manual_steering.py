@@ -16,33 +16,106 @@
     TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
     SOFTWARE.
 """
-from time import sleep
+# Keyboard steering.  Key presses only change the target wheel speeds.  A control tick at a fixed rate ramps the
+# commanded speeds towards the targets within an acceleration limit and sends at most one drive command per tick, so
+# holding a key down cannot flood the port and the wheels never jump between speeds.  Between ticks the loop blocks in
+# select on stdin, so it uses almost no CPU while waiting.
 import curses
 import atexit
-from rbCreate import SpecialRadii
+import os
+import select
+import sys
+import time
+
+TICK_PERIOD = 0.02  # Seconds between control ticks.  The Create reads commands every 15ms
+ACCELERATION = 1000.0  # Fastest change in wheel speed, in mm/s per second
+
+
+class SteeringControl(object):
+    """
+    Target and commanded wheel speeds, and the acceleration limited ramp between them
+    """
+
+    def __init__(self, max_speed=500, acceleration=ACCELERATION, period=TICK_PERIOD):
+        """
+        :param max_speed: Largest wheel speed a key can ask for, in mm/s
+        :param acceleration: Fastest change in commanded wheel speed, in mm/s per second
+        :param period: Time between ticks, in seconds
+        """
+        self.max_speed = max_speed
+        self.step = acceleration * period  # Largest change in a wheel's speed in one tick
+        self.target_right = 0
+        self.target_left = 0
+        self.right = 0  # Wheel speeds last sent to the Create
+        self.left = 0
+        self.ticks = 0
+        self.commands = 0  # Drive commands sent
+        self.latencies = []  # Seconds from each input that changed the targets to the first command acting on it
+        self._input_time = None
+
+    def change(self, right_delta, left_delta, now):
+        """
+        Move the target speeds, within max_speed
+        :param now: Time the input arrived, for measuring latency
+        """
+        right = max(-self.max_speed, min(self.max_speed, self.target_right + right_delta))
+        left = max(-self.max_speed, min(self.max_speed, self.target_left + left_delta))
+        self._retarget(right, left, now)
+
+    def stopped(self, now, latency=None):
+        """
+        Record that the wheels were stopped outside the ramp
+        :param latency: Seconds from the input to the stop being sent
+        """
+        self.target_right = self.target_left = self.right = self.left = 0
+        self._input_time = None
+        if latency is not None:
+            self.latencies.append(latency)
+
+    def tick(self, now):
+        """
+        Ramp the commanded speeds one tick towards the targets
+        :return: (right, left) speeds to send, or None if they have not changed
+        """
+        self.ticks += 1
+        right = self._ramp(self.right, self.target_right)
+        left = self._ramp(self.left, self.target_left)
+        if (right, left) == (self.right, self.left):
+            return None
+        self.right = right
+        self.left = left
+        self.commands += 1
+        if self._input_time is not None:
+            self.latencies.append(now - self._input_time)
+            self._input_time = None
+        return right, left
+
+    def _retarget(self, right, left, now):
+        if (right, left) == (self.target_right, self.target_left):
+            return
+        self.target_right = right
+        self.target_left = left
+        if self._input_time is None:
+            self._input_time = now
+
+    def _ramp(self, current, target):
+        if abs(target - current) <= self.step:
+            return target
+        return int(round(current + (self.step if target > current else -self.step)))
+
 
 class ManualSteering:
 
     _MAX_SPEED = 500
-    _MAX_RADUIS = 2000
-
-    _turn_radius = SpecialRadii.straight()
-    _turn_radius_delta = 5
-
-    _current_direction_key = -1
-    _current_turn_key = -1
+    _speed_delta = 100  # The amount to change the speed each time a keypress is detected
+    _turn_speed = 20  # Gradual turn speed
 
     def __init__(self, create):
         self.create = create
-
-        self._left_speed = 0  # The current speed of the left wheel [-500, 500]
-        self._right_speed = 0  # The current speed of the right wheel [-500, 500]
-        self._speed_delta = 100  # The amount to change the speed each time a keypress is detected
-
-        self._turn_speed = 20  # Gradual turn speed
+        self.control = SteeringControl(self._MAX_SPEED)
 
         self.stdscr = curses.initscr()
-        self.stdscr.nodelay(1)
+        self.stdscr.nodelay(1)  # getch only drains keys that select has already seen, so it never needs to block
         self.stdscr.keypad(1)
 
         curses.cbreak()
@@ -56,86 +129,71 @@ class ManualSteering:
         self.create.set_safe_mode()
         self.stdscr.addstr(0, 0, "Enter W, A, S, D: ")
 
+        started = time.time()
+        cpu_started = sum(os.times()[:2])
+        next_tick = started + TICK_PERIOD
+        running = True
+        while running:
+            timeout = max(next_tick - time.time(), 0.0)
+            readable, _, _ = select.select([sys.stdin], [], [], timeout)
+            if readable:
+                running = self._read_keys()
+
+            now = time.time()
+            if now >= next_tick:
+                speeds = self.control.tick(now)
+                if speeds is not None:
+                    self.create.drive_direct(right_speed=speeds[0], left_speed=speeds[1])
+                # Skip ticks that were missed rather than sending a burst of them to catch up
+                next_tick += TICK_PERIOD * max(int((now - next_tick) / TICK_PERIOD) + 1, 1)
+
+        elapsed = time.time() - started
+        cpu = sum(os.times()[:2]) - cpu_started
+        control = self.control
+        print "End Manual steering routine"
+        print "{0} ticks in {1:.1f}s, {2} drive commands sent, CPU {3:.1f}%".format(
+            control.ticks, elapsed, control.commands, 100.0 * cpu / elapsed if elapsed > 0 else 0.0)
+        if control.latencies:
+            print "Input to wheel command latency: mean {0:.1f}ms, max {1:.1f}ms".format(
+                1000.0 * sum(control.latencies) / len(control.latencies), 1000.0 * max(control.latencies))
+
+    def _read_keys(self):
+        """
+        Handle every key waiting on stdin
+        :return: False once q has been pressed
+        """
         while True:
             c = self.stdscr.getch()
+            if c == curses.ERR:  # No more keys are waiting
+                return True
 
-            if c == curses.ERR:  # No key is pressed
-                continue
-
+            now = time.time()
             self.stdscr.addch(0, 18, c)
-            self.stdscr.refresh()
-            display_string = ""
+            half_turn = int(self._turn_speed / 2)
             if c == ord('q'):
                 self.stdscr.addstr(0, 18, "Quitting...")
                 self.stdscr.clrtoeol()
                 self.stdscr.refresh()
-
-                break
+                return False
             elif c == ord('x'):
-                self.stdscr.addstr(0, 18, "Stopping...")
-                self.stdscr.clrtoeol()
-                self.stdscr.refresh()
-                self.create.drive_straight_forward(0)
-                self._left_speed = 0
-                self._right_speed = 0
-
-                self.create.stop_motion()
+                # Stopping skips the ramp
+                self.control.stopped(now, self.create.emergency_stop())
                 self.stdscr.addstr(0, 18, "Stopped...")
-                self.stdscr.clrtoeol()
-                self.stdscr.refresh()
             elif c == ord('w'):
-                if self._left_speed < self._MAX_SPEED:
-                    self._left_speed += self._speed_delta
-                if self._right_speed < self._MAX_SPEED:
-                    self._right_speed += self._speed_delta
-
-                if self._left_speed == 0 and self._right_speed == 0:
-                    self.create.stop_motion()
-                else:
-                    self.create.drive_direct(right_speed=self._right_speed, left_speed=self._left_speed)
-
-                display_string = "Left wheel moving at {0} mm/s.  Right wheel moving at {1} mm/s".format(self._left_speed, self._right_speed)
-                self.stdscr.addstr(0, 18, display_string)
-                self.stdscr.clrtoeol()
-                self.stdscr.refresh()
+                self.control.change(self._speed_delta, self._speed_delta, now)
             elif c == ord('a'):
-                if self._right_speed < self._MAX_SPEED:
-                    self._right_speed += int(self._turn_speed / 2)
-                    self._left_speed -= int(self._turn_speed / 2)
-                    self.create.drive_direct(right_speed=self._right_speed, left_speed=self._left_speed)
-
-                display_string = "Left wheel moving at {0} mm/s.  Right wheel moving at {1} mm/s".format(self._left_speed, self._right_speed)
-                self.stdscr.addstr(0, 18, display_string)
-                self.stdscr.clrtoeol()
-                self.stdscr.refresh()
+                self.control.change(half_turn, -half_turn, now)
             elif c == ord('s'):
-                if self._left_speed > -self._MAX_SPEED:
-                    self._left_speed -= self._speed_delta
-                if self._right_speed > -self._MAX_SPEED:
-                    self._right_speed -= self._speed_delta
-
-                if self._right_speed == 0 and self._left_speed == 0:
-                    self.create.stop_motion()
-                else:
-                    self.create.drive_direct(right_speed=self._right_speed, left_speed=self._left_speed)
-
-                display_string = "Left wheel moving at {0} mm/s.  Right wheel moving at {1} mm/s".format(self._left_speed, self._right_speed)
-                self.stdscr.addstr(0, 18, display_string)
-                self.stdscr.clrtoeol()
-                self.stdscr.refresh()
+                self.control.change(-self._speed_delta, -self._speed_delta, now)
             elif c == ord('d'):
-                if self._left_speed < self._MAX_SPEED:
-                    self._right_speed -= int(self._turn_speed / 2)
-                    self._left_speed += int(self._turn_speed / 2)
-                    self.create.drive_direct(right_speed=self._right_speed, left_speed=self._left_speed)
+                self.control.change(-half_turn, half_turn, now)
 
-                display_string = "Left wheel moving at {0} mm/s.  Right wheel moving at {1} mm/s".format(self._left_speed, self._right_speed)
+            if c in (ord('w'), ord('a'), ord('s'), ord('d')):
+                display_string = "Left wheel target {0} mm/s.  Right wheel target {1} mm/s".format(
+                    self.control.target_left, self.control.target_right)
                 self.stdscr.addstr(0, 18, display_string)
-                self.stdscr.clrtoeol()
-                self.stdscr.refresh()
-
-        sleep(3)
-        print "End Manual steering routine"
+            self.stdscr.clrtoeol()
+            self.stdscr.refresh()
 
     def cleanup(self, stdscr):
         curses.nocbreak()
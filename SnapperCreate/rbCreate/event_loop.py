@@ -0,0 +1,332 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# A single threaded event loop for driving serial devices without a thread per device.
+#
+# Python 2 has no asyncio, so tasks are plain generators.  A task yields what it is waiting for:
+#
+#     yield 0.5              sleep for half a second
+#     yield future           wait for a Future; the generator is sent its result, or has its exception thrown in
+#     yield None             let other work run before continuing
+#
+# and finishes with raise Return(value), or by falling off the end.  Ports with a file descriptor are watched with
+# select.  Ports without one, such as the mock and simulated ports, are polled every POLL_INTERVAL instead.
+#
+# Timers run on the loop's clock.  With a simulation.VirtualClock the loop sleeps on the clock while it waits, so the
+# simulated robots move, and every device must be polled rather than selected.
+import heapq
+import itertools
+import select
+import time
+from collections import deque
+
+POLL_INTERVAL = 0.005  # Longest time, in seconds, between polls of ports without a file descriptor
+
+
+class Return(Exception):
+    """
+    Raised by a task to finish with a value
+    """
+
+    def __init__(self, value=None):
+        super(Return, self).__init__(value)
+        self.value = value
+
+
+class Future(object):
+    """
+    The result of an operation that finishes later
+    """
+
+    def __init__(self):
+        self._done = False
+        self._result = None
+        self._error = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        """
+        :return: The result, or raises the operation's exception
+        """
+        if not self._done:
+            raise RuntimeError("The operation has not finished")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def exception(self):
+        return self._error
+
+    def add_done_callback(self, callback):
+        """
+        Call callback(future) once the future is done, straight away if it already is
+        """
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def set_result(self, result):
+        self._finish(result, None)
+
+    def set_exception(self, error):
+        self._finish(None, error)
+
+    def _finish(self, result, error):
+        if self._done:
+            raise RuntimeError("The operation has already finished")
+        self._done = True
+        self._result = result
+        self._error = error
+        callbacks = self._callbacks
+        self._callbacks = []
+        for callback in callbacks:
+            callback(self)
+
+
+class Task(Future):
+    """
+    Runs a generator on the loop.  The task's result is the value the generator finishes with.
+    """
+
+    def __init__(self, loop, generator):
+        super(Task, self).__init__()
+        self.loop = loop
+        self._generator = generator
+        self._timer = None
+        self._cancelled = False
+        loop.call_soon(self._step, None, None)
+
+    def cancel(self):
+        """
+        Stop the task where it is waiting
+        :return: False if the task had already finished
+        """
+        if self.done():
+            return False
+        self._cancelled = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self._generator.close()
+        self.set_exception(RuntimeError("The task was cancelled"))
+        return True
+
+    def cancelled(self):
+        return self._cancelled
+
+    def _step(self, value, error):
+        if self.done():
+            return
+        self._timer = None
+        try:
+            if error is not None:
+                waiting_for = self._generator.throw(error)
+            else:
+                waiting_for = self._generator.send(value)
+        except StopIteration:
+            self.set_result(None)
+        except Return as finished:
+            self.set_result(finished.value)
+        except Exception as err:
+            self.set_exception(err)
+        else:
+            if isinstance(waiting_for, Future):
+                waiting_for.add_done_callback(self._wake)
+            elif waiting_for is None:
+                self.loop.call_soon(self._step, None, None)
+            else:
+                self._timer = self.loop.call_later(waiting_for, self._step, None, None)
+
+    def _wake(self, future):
+        # Resumed from the loop rather than from inside whatever finished the future
+        self.loop.call_soon(self._step, future._result, future._error)
+
+
+def gather(futures):
+    """
+    :return: A Future that finishes once every one of futures has, with the list of their results.  If any of them
+             failed it fails with the first of their exceptions, in the order given.
+    """
+    futures = list(futures)
+    gathered = Future()
+    remaining = [len(futures)]
+
+    def finished(_):
+        remaining[0] -= 1
+        if remaining[0] > 0:
+            return
+        for future in futures:
+            if future.exception() is not None:
+                gathered.set_exception(future.exception())
+                return
+        gathered.set_result([future.result() for future in futures])
+
+    if not futures:
+        gathered.set_result([])
+    for future in futures:
+        future.add_done_callback(finished)
+    return gathered
+
+
+class Timer(object):
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class EventLoop(object):
+    """
+    Runs callbacks, timers and generator tasks on the calling thread
+    """
+
+    def __init__(self, clock=None):
+        """
+        :param clock: Object providing time() and sleep(seconds).  Defaults to the time module
+        """
+        self.clock = clock if clock is not None else time
+        self.iterations = 0  # Passes round the loop
+        self._ready = deque()
+        self._timers = []  # Heap of (when, sequence, Timer)
+        self._sequence = itertools.count()
+        self._readers = {}  # File descriptor to callback
+        self._writers = {}
+        self._pollers = []
+        self._stopping = False
+
+    def time(self):
+        return self.clock.time()
+
+    def call_soon(self, callback, *args):
+        self._ready.append((callback, args))
+
+    def call_later(self, delay, callback, *args):
+        """
+        :return: Timer, which can be cancelled
+        """
+        timer = Timer(self.clock.time() + delay, callback, args)
+        heapq.heappush(self._timers, (timer.when, next(self._sequence), timer))
+        return timer
+
+    def add_reader(self, fd, callback):
+        """
+        Call callback() whenever fd has data to read
+        """
+        self._readers[fd] = callback
+
+    def remove_reader(self, fd):
+        self._readers.pop(fd, None)
+
+    def add_writer(self, fd, callback):
+        """
+        Call callback() whenever fd can take more data
+        """
+        self._writers[fd] = callback
+
+    def remove_writer(self, fd):
+        self._writers.pop(fd, None)
+
+    def add_poller(self, callback):
+        """
+        Call callback() on every pass round the loop, and at least every POLL_INTERVAL.  For ports without a file
+        descriptor.
+        """
+        self._pollers = self._pollers + [callback]
+
+    def remove_poller(self, callback):
+        self._pollers = [poller for poller in self._pollers if poller != callback]
+
+    def spawn(self, generator):
+        """
+        Start running a generator as a task
+        :return: The Task
+        """
+        return Task(self, generator)
+
+    def sleep(self, seconds):
+        """
+        :return: A Future that finishes after seconds, for waiting on from a task
+        """
+        future = Future()
+        self.call_later(seconds, future.set_result, None)
+        return future
+
+    def stop(self):
+        """
+        Make run_forever return after the current pass
+        """
+        self._stopping = True
+
+    def run_forever(self):
+        self._stopping = False
+        while not self._stopping:
+            self._run_once()
+
+    def run_until_complete(self, future):
+        """
+        Run the loop until a Future, or a generator started as a task, has finished
+        :return: Its result
+        """
+        if not isinstance(future, Future):
+            future = self.spawn(future)
+        while not future.done():
+            self._run_once()
+        return future.result()
+
+    def _run_once(self):
+        self.iterations += 1
+        timeout = None
+        if self._ready:
+            timeout = 0.0
+        elif self._timers:
+            timeout = max(self._timers[0][0] - self.clock.time(), 0.0)
+        if self._pollers:
+            timeout = POLL_INTERVAL if timeout is None else min(timeout, POLL_INTERVAL)
+
+        if self._readers or self._writers:
+            readable, writable, _ = select.select(list(self._readers), list(self._writers), [], timeout)
+            for fd in readable:
+                callback = self._readers.get(fd)
+                if callback is not None:
+                    callback()
+            for fd in writable:
+                callback = self._writers.get(fd)
+                if callback is not None:
+                    callback()
+        elif timeout is None:
+            raise RuntimeError("The event loop has nothing to wait for")
+        elif timeout > 0:
+            self.clock.sleep(timeout)
+
+        for poller in self._pollers:
+            poller()
+        now = self.clock.time()
+        while self._timers and self._timers[0][0] <= now:
+            timer = heapq.heappop(self._timers)[2]
+            if not timer.cancelled:
+                self._ready.append((timer.callback, timer.args))
+        for _ in range(len(self._ready)):
+            callback, args = self._ready.popleft()
+            callback(*args)
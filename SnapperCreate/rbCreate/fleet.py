@@ -0,0 +1,143 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Several Creates run from one process.  Every robot is an AsyncCreate on a shared EventLoop, so one thread waits on
+# all the serial ports at once and the per-robot routines run side by side as generator tasks.  Stop and dock act on
+# the whole fleet: they cancel the running routines and then command every robot.
+import json
+
+from async_create import AsyncCreate
+from event_loop import EventLoop
+from event_loop import gather
+
+
+class Fleet(object):
+    """
+    A group of Creates sharing one EventLoop
+    """
+
+    def __init__(self, ports, loop=None):
+        """
+        :param ports: The serial port of each Create
+        :param loop: EventLoop to run on.  Defaults to a new one on the real clock
+        """
+        self.loop = loop if loop is not None else EventLoop()
+        self.robots = [AsyncCreate(port, self.loop) for port in ports]
+        self.tasks = []
+
+    @classmethod
+    def from_config(cls, path, loop=None):
+        """
+        :param path: JSON file with a "ports" list, e.g. {"ports": ["/dev/ttyUSB0", "/dev/ttyUSB1"]}
+        """
+        try:
+            with open(path) as config:
+                ports = json.load(config)["ports"]
+        except (IOError, ValueError, KeyError) as err:
+            raise RuntimeError("Could not read the fleet's ports from {0}: {1}".format(path, err))
+        return cls(ports, loop)
+
+    def __len__(self):
+        return len(self.robots)
+
+    def connect(self, test=False, connections=None, record=None):
+        """
+        Connect every robot.  If any of them fails, the ones already connected are disconnected again.
+        :param test: If true, use a MockSerial for every robot
+        :param connections: Already open serial-like objects to use, one per robot
+        :param record: recording.TrafficLog to record every robot's traffic in, each on a channel named for its port
+        """
+        if connections is not None and len(connections) != len(self.robots):
+            raise RuntimeError("Need one connection for each of the {0} robots".format(len(self.robots)))
+        try:
+            for index, robot in enumerate(self.robots):
+                robot.connect(test, connections[index] if connections is not None else None, record)
+        except RuntimeError:
+            self.disconnect()
+            raise
+
+    def disconnect(self):
+        """
+        Cancel the routines and disconnect every robot
+        """
+        self.cancel()
+        for robot in self.robots:
+            robot.disconnect()
+
+    def start(self, routine, *args):
+        """
+        Start a routine on every robot
+        :param routine: Generator function called as routine(robot, *args), or a list of them, one per robot
+        :return: List of Tasks, one per robot
+        """
+        routines = routine if isinstance(routine, (list, tuple)) else [routine] * len(self.robots)
+        if len(routines) != len(self.robots):
+            raise RuntimeError("Need one routine for each of the {0} robots".format(len(self.robots)))
+        tasks = []
+        for robot, run in zip(self.robots, routines):
+            task = self.loop.spawn(run(robot, *args))
+            task.add_done_callback(self._stop_if_failed(robot))
+            tasks.append(task)
+        self.tasks.extend(tasks)
+        return tasks
+
+    def run(self, routine, *args):
+        """
+        Run a routine on every robot and wait for all of them to finish
+        :return: List of the routines' results, one per robot.  Raises the first robot's error if any failed, once
+                 all have finished.
+        """
+        return self.loop.run_until_complete(gather(self.start(routine, *args)))
+
+    def cancel(self):
+        """
+        Cancel every routine still running.  The robots carry on with their last commands.
+        """
+        tasks = self.tasks
+        self.tasks = []
+        for task in tasks:
+            task.cancel()
+
+    def stop(self):
+        """
+        Cancel the routines and stop every robot's wheels
+        :return: List of each robot's emergency stop latency, in seconds
+        """
+        self.cancel()
+        return [robot.emergency_stop() for robot in self.robots if robot.connected is True]
+
+    def return_to_dock(self):
+        """
+        Cancel the routines, stop any sensor streams and send every robot to seek its dock
+        :return: Future that finishes once every robot has been sent the command
+        """
+        self.cancel()
+        drained = []
+        for robot in self.robots:
+            if robot.connected is True:
+                robot.stop_stream()
+                robot.return_to_dock()
+                drained.append(robot.drain())
+        return gather(drained)
+
+    def _stop_if_failed(self, robot):
+        def finished(task):
+            # A failed routine could leave its robot driving, but the rest of the fleet carries on
+            if task.exception() is not None and not task.cancelled() and robot.connected is True:
+                robot.emergency_stop()
+        return finished
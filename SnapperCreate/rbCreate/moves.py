@@ -0,0 +1,299 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Closed loop moves of a set distance or angle, driven by the wheel encoders.
+#
+# A MoveController follows the odometry on the sensor stream's reader thread, so it sees every frame as soon as it
+# is parsed.  Progress is measured in millimetres of wheel travel: along the starting heading for a drive, and round
+# the turning circle of the wheels for a turn.  The robot cannot stop instantly, so the stop command is sent early,
+# once the remaining travel is no more than the robot would cover while the command reaches it plus while it
+# decelerates.  Frames only arrive every 15ms, so the stop is sent at the frame nearest that point rather than the
+# last one before it.  The move finishes when the encoders stop changing.
+import math
+import threading
+
+from odometry import WHEEL_BASE
+from stream import STREAM_PERIOD
+
+COMMAND_LATENCY = 0.02  # Seconds from a frame being measured to a command sent in reply taking effect
+DECELERATION = 1000.0  # Rate at which the wheels slow down after a stop command, in mm/s^2
+FEEDBACK_TIMEOUT = 0.5  # Real seconds to wait for a stream frame before giving up on the move
+SETTLE_TIMEOUT = 1.0  # Seconds allowed on top of twice the nominal move time before giving up on the move
+SETTLE_FRAMES = 2  # Consecutive frames without encoder movement that show the robot has stopped
+
+DRIVE = "drive"
+TURN = "turn"
+
+
+def step(stream, clock):
+    """
+    Let one stream period pass and wait for the reader thread to handle its frame.  With a VirtualClock this is what
+    moves the simulated robot.
+    :return: False if no frame arrived within FEEDBACK_TIMEOUT
+    """
+    frames = stream.frames
+    clock.sleep(STREAM_PERIOD)
+    return stream.wait_for_frames(frames + 1, FEEDBACK_TIMEOUT)
+
+
+def stopping_distance(rate, latency=COMMAND_LATENCY, deceleration=DECELERATION):
+    """
+    :param rate: Current speed, in mm/s
+    :return: The travel, in mm, between deciding to stop and the robot coming to rest
+    """
+    return rate * latency + rate * rate / (2.0 * deceleration)
+
+
+class MoveHandle(object):
+    """
+    Tracks a closed loop move.  Returned by Create.drive_distance and Create.turn_angle.
+    """
+
+    def __init__(self, controller, stream, clock):
+        self._controller = controller
+        self._stream = stream
+        self._clock = clock
+
+    @property
+    def result(self):
+        """
+        Distance travelled in mm, or angle turned in degrees, once the move has finished
+        """
+        return self._controller.result
+
+    @property
+    def error(self):
+        return self._controller.error
+
+    def wait(self, timeout=None):
+        """
+        Block until the robot has stopped in position.  The clock is stepped a stream period at a time, so a
+        simulated robot moves while this waits.
+        :param timeout: Maximum time to wait, in clock seconds.  None waits until the move finishes or fails
+        :return: True if the move finished, False if the timeout expired first
+        """
+        controller = self._controller
+        deadline = None if timeout is None else self._clock.time() + timeout
+        while not controller.done():
+            if deadline is not None and self._clock.time() >= deadline:
+                return False
+            if not step(self._stream, self._clock):
+                controller.fail(RuntimeError("Lost the sensor stream from the Create 2 during a move"))
+        if controller.error is not None:
+            raise controller.error
+        return True
+
+    def done(self):
+        """
+        :return: True once the move has finished, including moves that failed or were cancelled
+        """
+        return self._controller.done()
+
+    def cancel(self):
+        """
+        Stop the robot where it is
+        :return: False if the move had already finished, else True
+        """
+        return self._controller.cancel()
+
+    def cancelled(self):
+        return self._controller.cancelled
+
+
+class TimedMove(object):
+    """
+    Stands in for a closed loop move on a mocked connection, which never sends the encoder readings a MoveController
+    needs.  The wheels turn for as long as the move would take at its speed, then stop.  Has the same interface as
+    MoveHandle, and its result is the distance or angle the move would have covered in the time it ran.
+    """
+
+    def __init__(self, create, kind, target, speed, clock, wheel_base=WHEEL_BASE):
+        self.create = create
+        self.kind = kind
+        self.target = target
+        self.result = None
+        self.error = None
+        self._clock = clock
+        self._cancelled = False
+        travel = math.radians(abs(target)) * wheel_base / 2.0 if kind == TURN else float(abs(target))
+        self._duration = travel / speed
+        self._start = clock.time()
+        wheel = int(round(math.copysign(speed, target)))
+        if kind == TURN:
+            create.drive_direct(wheel, -wheel)
+        else:
+            create.drive_direct(wheel, wheel)
+
+    def wait(self, timeout=None):
+        """
+        Sleep on the clock until the move's time is up, then stop the robot
+        :param timeout: Maximum time to wait, in clock seconds.  None waits until the move finishes
+        :return: True if the move finished, False if the timeout expired first
+        """
+        if self.done():
+            return True
+        remaining = self._start + self._duration - self._clock.time()
+        if timeout is not None and timeout < remaining:
+            self._clock.sleep(timeout)
+            return False
+        self._clock.sleep(max(remaining, 0.0))
+        self._stop()
+        return True
+
+    def done(self):
+        return self.result is not None
+
+    def cancel(self):
+        if self.done():
+            return False
+        self._cancelled = True
+        self._stop()
+        return True
+
+    def cancelled(self):
+        return self._cancelled
+
+    def _stop(self):
+        self.create.stop_motion()
+        fraction = min((self._clock.time() - self._start) / self._duration, 1.0) if self._duration else 1.0
+        self.result = self.target * fraction
+
+
+class MoveController(object):
+    """
+    Stops the robot once it has travelled a set distance or turned a set angle.  Attach it to the sensor stream after
+    the Odometry it reads, so each frame updates the pose first.
+    """
+
+    def __init__(self, create, odometry, kind, target, speed, latency=COMMAND_LATENCY, deceleration=DECELERATION):
+        """
+        :param create: The Create being moved
+        :param odometry: Odometry attached to the Create's sensor stream
+        :param kind: DRIVE for a distance in mm, or TURN for an angle in degrees, counterclockwise positive
+        :param target: Signed distance or angle of the move
+        :param speed: Wheel speed of the move, in mm/s
+        :param latency: Seconds from a frame being measured to the stop command taking effect
+        :param deceleration: Rate at which the wheels slow down after the stop command, in mm/s^2
+        """
+        self.create = create
+        self.odometry = odometry
+        self.kind = kind
+        self.target = target
+        self.speed = abs(speed)
+        self.latency = latency
+        self.deceleration = deceleration
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.stopped_at = None  # Progress, in mm, when the stop command was sent
+        self._direction = 1.0 if target >= 0 else -1.0
+        if kind == TURN:
+            self._travel = math.radians(abs(target)) * odometry.wheel_base / 2.0
+        else:
+            self._travel = float(abs(target))
+        self._stream = None
+        self._start = None
+        self._deadline = None
+        self._progress = 0.0
+        self._still = 0  # Consecutive frames without encoder movement since the stop
+        self._stopping = False
+        self._finished = threading.Event()
+        self._lock = threading.Lock()  # Guards the move's state between the reader thread and cancel
+
+    def begin(self, stream):
+        """
+        Take the current pose as the start, subscribe to the stream and set the wheels turning
+        """
+        self._start = self.odometry.pose()
+        self._deadline = self._start.time + 2.0 * self._travel / self.speed + SETTLE_TIMEOUT
+        self._stream = stream
+        stream.subscribe(self.on_sample)
+        with self._lock:
+            if self._travel <= 0:
+                self._finish()
+                return
+            wheel = int(round(self._direction * self.speed))
+            if self.kind == TURN:
+                self.create.drive_direct(wheel, -wheel)
+            else:
+                self.create.drive_direct(wheel, wheel)
+
+    def done(self):
+        return self._finished.is_set()
+
+    def on_sample(self, sample):
+        with self._lock:
+            if self.done():
+                return
+            progress = self._measure(self.odometry.pose())
+            moved = progress - self._progress
+            self._progress = progress
+            if self._stopping:
+                self._still = self._still + 1 if moved == 0 else 0
+                if self._still >= SETTLE_FRAMES:
+                    self._finish()
+            else:
+                rate = max(moved, 0.0) / STREAM_PERIOD
+                remaining = self._travel - progress - rate * STREAM_PERIOD / 2.0  # At the midpoint to the next frame
+                if remaining <= stopping_distance(rate, self.latency, self.deceleration):
+                    self._stop()
+            if not self.done() and sample.time > self._deadline:
+                self._stop()
+                self._finish(RuntimeError("The Create 2 did not reach the end of its {0}".format(self.kind)))
+
+    def cancel(self):
+        with self._lock:
+            if self.done():
+                return False
+            self.cancelled = True
+            self._stop()
+            self._finish()
+            return True
+
+    def fail(self, error):
+        with self._lock:
+            if self.done():
+                return
+            self._stop()
+            self._finish(error)
+
+    def _measure(self, pose):
+        """
+        :return: Progress from the start pose toward the target, in mm of wheel travel
+        """
+        start = self._start
+        if self.kind == TURN:
+            return self._direction * math.radians(pose.heading - start.heading) * self.odometry.wheel_base / 2.0
+        heading = math.radians(start.heading)
+        along = (pose.x - start.x) * math.cos(heading) + (pose.y - start.y) * math.sin(heading)
+        return self._direction * along
+
+    def _stop(self):
+        if not self._stopping:
+            self._stopping = True
+            self.stopped_at = self._progress
+            self.create.stop_motion()
+
+    def _finish(self, error=None):
+        self._stream.unsubscribe(self.on_sample)
+        if self.kind == TURN:
+            self.result = self._direction * math.degrees(self._progress * 2.0 / self.odometry.wheel_base)
+        else:
+            self.result = self._direction * self._progress
+        self.error = error
+        self._finished.set()
@@ -0,0 +1,172 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Dead reckoning from the Create's wheel encoders.
+#
+# The pose starts at the origin facing along x, with y to the robot's left and the heading counterclockwise in
+# degrees, matching the simulator.  The heading is continuous rather than wrapped, so a full turn to the left
+# reads 360 and the change in heading over a move is a simple difference.
+#
+# Each step turns the robot by the difference in wheel travel over the wheel base and moves it by the mean wheel
+# travel along the heading halfway through the turn.
+import math
+from collections import namedtuple
+
+import numpy
+
+import sensors
+from stream import SampleRing
+
+WHEEL_BASE = 235.0  # Distance between the drive wheels, in mm
+WHEEL_DIAMETER = 72.0  # mm
+COUNTS_PER_REVOLUTION = 508.8
+MM_PER_COUNT = math.pi * WHEEL_DIAMETER / COUNTS_PER_REVOLUTION
+DEFAULT_HISTORY = 4096  # Poses kept, about a minute at stream rate
+ENCODER_PACKETS = (sensors.LEFT_ENCODER_COUNTS, sensors.RIGHT_ENCODER_COUNTS)
+
+Pose = namedtuple("Pose", "time x y heading")
+
+
+def encoder_delta(previous, current):
+    """
+    :return: The signed change between two 16 bit encoder readings, allowing for the count rolling over
+    """
+    return (current - previous + 0x8000) % 0x10000 - 0x8000
+
+
+def wheel_speeds(velocity, radius, wheel_base=WHEEL_BASE):
+    """
+    :return: (right, left) wheel speeds, in mm/s, that a Drive command with velocity and radius asks for
+    """
+    if radius in (32767, -32768, 0):  # Straight, or no radius to turn about
+        return velocity, velocity
+    if radius == -1:  # Turn in place clockwise
+        return -velocity, velocity
+    if radius == 1:  # Turn in place counterclockwise
+        return velocity, -velocity
+    half = wheel_base / 2.0
+    return int(round(velocity * (radius + half) / radius)), int(round(velocity * (radius - half) / radius))
+
+
+def integrate(left_counts, right_counts, start=(0.0, 0.0, 0.0), wheel_base=WHEEL_BASE, mm_per_count=MM_PER_COUNT):
+    """
+    Vectorised dead reckoning over a log of encoder readings, giving the same poses as Odometry would
+    :param left_counts: Array of left encoder readings
+    :param right_counts: Array of right encoder readings taken at the same times
+    :param start: (x, y, heading) at the first reading, in mm and degrees
+    :return: Array shaped readings x 3 of x, y and heading at each reading
+    """
+    left = numpy.asarray(left_counts, dtype=numpy.int64)
+    right = numpy.asarray(right_counts, dtype=numpy.int64)
+    left_travel = ((numpy.diff(left) + 0x8000) % 0x10000 - 0x8000) * mm_per_count
+    right_travel = ((numpy.diff(right) + 0x8000) % 0x10000 - 0x8000) * mm_per_count
+
+    x, y, heading = start
+    turns = (right_travel - left_travel) / wheel_base
+    headings = math.radians(heading) + numpy.concatenate(([0.0], numpy.cumsum(turns)))
+    middle = headings[:-1] + turns / 2.0
+    travel = (right_travel + left_travel) / 2.0
+
+    poses = numpy.empty((len(left), 3))
+    poses[:, 0] = x + numpy.concatenate(([0.0], numpy.cumsum(travel * numpy.cos(middle))))
+    poses[:, 1] = y + numpy.concatenate(([0.0], numpy.cumsum(travel * numpy.sin(middle))))
+    poses[:, 2] = numpy.degrees(headings)
+    return poses
+
+
+class Odometry(object):
+    """
+    Tracks the Create's pose from the encoder packets in its sensor stream.  The stream must include
+    LEFT_ENCODER_COUNTS and RIGHT_ENCODER_COUNTS.
+
+        odometry = Odometry()
+        odometry.attach(robot.start_stream(odometry.ENCODER_PACKETS))
+    """
+
+    ENCODER_PACKETS = ENCODER_PACKETS
+
+    def __init__(self, start=(0.0, 0.0, 0.0), wheel_base=WHEEL_BASE, mm_per_count=MM_PER_COUNT,
+                 history=DEFAULT_HISTORY):
+        """
+        :param start: (x, y, heading) at the first reading, in mm and degrees
+        :param history: Number of poses to keep
+        """
+        self.wheel_base = wheel_base
+        self.mm_per_count = mm_per_count
+        self.ring = SampleRing(history)
+        self._x, self._y, heading = start
+        self._heading = math.radians(heading)
+        self._counts = None  # (left, right) at the last reading
+
+    def attach(self, stream):
+        """
+        Update from every sample of a SensorStream, on its reader thread
+        """
+        stream.subscribe(self.on_sample)
+
+    def detach(self, stream):
+        stream.unsubscribe(self.on_sample)
+
+    def on_sample(self, sample):
+        values = sample.values
+        self.update(values[sensors.LEFT_ENCODER_COUNTS], values[sensors.RIGHT_ENCODER_COUNTS], sample.time)
+
+    def update(self, left_counts, right_counts, time):
+        """
+        Advance the pose by one pair of encoder readings.  Only one thread may update.
+        :return: The new Pose
+        """
+        if self._counts is not None:
+            previous_left, previous_right = self._counts
+            left = encoder_delta(previous_left, left_counts) * self.mm_per_count
+            right = encoder_delta(previous_right, right_counts) * self.mm_per_count
+            turn = (right - left) / self.wheel_base
+            middle = self._heading + turn / 2.0
+            travel = (right + left) / 2.0
+            self._x += travel * math.cos(middle)
+            self._y += travel * math.sin(middle)
+            self._heading += turn
+        self._counts = (left_counts, right_counts)
+        pose = Pose(time, self._x, self._y, math.degrees(self._heading))
+        self.ring.append(pose)
+        return pose
+
+    def pose(self):
+        """
+        :return: The latest Pose, or None before the first reading
+        """
+        return self.ring.latest()
+
+    def history(self, seconds=None):
+        """
+        :param seconds: Length of history to return.  None returns all the poses kept
+        :return: Array shaped poses x 4 of time, x, y and heading, oldest first
+        """
+        poses = self.ring.last(self.ring.capacity) if seconds is None else self.ring.window(seconds)
+        return numpy.array(poses, dtype=numpy.float64).reshape(-1, 4)
+
+    @staticmethod
+    def replay(samples, start=(0.0, 0.0, 0.0), wheel_base=WHEEL_BASE, mm_per_count=MM_PER_COUNT):
+        """
+        Recompute the poses for a log of SensorSamples, such as SensorStream.window returns
+        :return: Array shaped samples x 4 of time, x, y and heading
+        """
+        left = [sample.values[sensors.LEFT_ENCODER_COUNTS] for sample in samples]
+        right = [sample.values[sensors.RIGHT_ENCODER_COUNTS] for sample in samples]
+        poses = integrate(left, right, start, wheel_base, mm_per_count)
+        return numpy.column_stack(([sample.time for sample in samples], poses))
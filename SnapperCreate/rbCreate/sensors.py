@@ -0,0 +1,194 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Sensor packets of the Create 2 Open Interface.
+#
+# Each packet is identified by its packet ID and carries a single big-endian value; the format is the struct code
+# for that value.
+import struct
+from collections import namedtuple
+
+import commands
+
+Packet = namedtuple("Packet", "name format size")
+
+
+def _packet(name, format):
+    return Packet(name, format, struct.calcsize(">" + format))
+
+BUMPS_WHEEL_DROPS = 7
+WALL = 8
+CLIFF_LEFT = 9
+CLIFF_FRONT_LEFT = 10
+CLIFF_FRONT_RIGHT = 11
+CLIFF_RIGHT = 12
+VIRTUAL_WALL = 13
+WHEEL_OVERCURRENTS = 14
+DIRT_DETECT = 15
+INFRARED_OMNI = 17
+BUTTONS = 18
+DISTANCE = 19  # mm travelled since the value was last sent
+ANGLE = 20  # Degrees turned counterclockwise since the value was last sent
+CHARGING_STATE = 21
+VOLTAGE = 22  # mV
+CURRENT = 23  # mA, negative when discharging
+TEMPERATURE = 24  # Degrees C
+BATTERY_CHARGE = 25  # mAh
+BATTERY_CAPACITY = 26  # mAh
+WALL_SIGNAL = 27
+CLIFF_LEFT_SIGNAL = 28
+CLIFF_FRONT_LEFT_SIGNAL = 29
+CLIFF_FRONT_RIGHT_SIGNAL = 30
+CLIFF_RIGHT_SIGNAL = 31
+CHARGING_SOURCES = 34
+OI_MODE = 35  # 0 Off, 1 Passive, 2 Safe, 3 Full
+SONG_NUMBER = 36
+SONG_PLAYING = 37
+STREAM_PACKETS = 38
+REQUESTED_VELOCITY = 39  # mm/s
+REQUESTED_RADIUS = 40  # mm
+REQUESTED_RIGHT_VELOCITY = 41  # mm/s
+REQUESTED_LEFT_VELOCITY = 42  # mm/s
+LEFT_ENCODER_COUNTS = 43  # Cumulative, rolling over at the ends of the 16 bit range
+RIGHT_ENCODER_COUNTS = 44
+LIGHT_BUMPER = 45
+LIGHT_BUMP_LEFT = 46
+LIGHT_BUMP_FRONT_LEFT = 47
+LIGHT_BUMP_CENTER_LEFT = 48
+LIGHT_BUMP_CENTER_RIGHT = 49
+LIGHT_BUMP_FRONT_RIGHT = 50
+LIGHT_BUMP_RIGHT = 51
+INFRARED_LEFT = 52
+INFRARED_RIGHT = 53
+LEFT_MOTOR_CURRENT = 54  # mA
+RIGHT_MOTOR_CURRENT = 55
+MAIN_BRUSH_CURRENT = 56
+SIDE_BRUSH_CURRENT = 57
+STASIS = 58
+
+PACKETS = {
+    BUMPS_WHEEL_DROPS: _packet("bumps_wheel_drops", "B"),
+    WALL: _packet("wall", "B"),
+    CLIFF_LEFT: _packet("cliff_left", "B"),
+    CLIFF_FRONT_LEFT: _packet("cliff_front_left", "B"),
+    CLIFF_FRONT_RIGHT: _packet("cliff_front_right", "B"),
+    CLIFF_RIGHT: _packet("cliff_right", "B"),
+    VIRTUAL_WALL: _packet("virtual_wall", "B"),
+    WHEEL_OVERCURRENTS: _packet("wheel_overcurrents", "B"),
+    DIRT_DETECT: _packet("dirt_detect", "B"),
+    INFRARED_OMNI: _packet("infrared_omni", "B"),
+    BUTTONS: _packet("buttons", "B"),
+    DISTANCE: _packet("distance", "h"),
+    ANGLE: _packet("angle", "h"),
+    CHARGING_STATE: _packet("charging_state", "B"),
+    VOLTAGE: _packet("voltage", "H"),
+    CURRENT: _packet("current", "h"),
+    TEMPERATURE: _packet("temperature", "b"),
+    BATTERY_CHARGE: _packet("battery_charge", "H"),
+    BATTERY_CAPACITY: _packet("battery_capacity", "H"),
+    WALL_SIGNAL: _packet("wall_signal", "H"),
+    CLIFF_LEFT_SIGNAL: _packet("cliff_left_signal", "H"),
+    CLIFF_FRONT_LEFT_SIGNAL: _packet("cliff_front_left_signal", "H"),
+    CLIFF_FRONT_RIGHT_SIGNAL: _packet("cliff_front_right_signal", "H"),
+    CLIFF_RIGHT_SIGNAL: _packet("cliff_right_signal", "H"),
+    CHARGING_SOURCES: _packet("charging_sources", "B"),
+    OI_MODE: _packet("oi_mode", "B"),
+    SONG_NUMBER: _packet("song_number", "B"),
+    SONG_PLAYING: _packet("song_playing", "B"),
+    STREAM_PACKETS: _packet("stream_packets", "B"),
+    REQUESTED_VELOCITY: _packet("requested_velocity", "h"),
+    REQUESTED_RADIUS: _packet("requested_radius", "h"),
+    REQUESTED_RIGHT_VELOCITY: _packet("requested_right_velocity", "h"),
+    REQUESTED_LEFT_VELOCITY: _packet("requested_left_velocity", "h"),
+    LEFT_ENCODER_COUNTS: _packet("left_encoder_counts", "h"),
+    RIGHT_ENCODER_COUNTS: _packet("right_encoder_counts", "h"),
+    LIGHT_BUMPER: _packet("light_bumper", "B"),
+    LIGHT_BUMP_LEFT: _packet("light_bump_left", "H"),
+    LIGHT_BUMP_FRONT_LEFT: _packet("light_bump_front_left", "H"),
+    LIGHT_BUMP_CENTER_LEFT: _packet("light_bump_center_left", "H"),
+    LIGHT_BUMP_CENTER_RIGHT: _packet("light_bump_center_right", "H"),
+    LIGHT_BUMP_FRONT_RIGHT: _packet("light_bump_front_right", "H"),
+    LIGHT_BUMP_RIGHT: _packet("light_bump_right", "H"),
+    INFRARED_LEFT: _packet("infrared_left", "B"),
+    INFRARED_RIGHT: _packet("infrared_right", "B"),
+    LEFT_MOTOR_CURRENT: _packet("left_motor_current", "h"),
+    RIGHT_MOTOR_CURRENT: _packet("right_motor_current", "h"),
+    MAIN_BRUSH_CURRENT: _packet("main_brush_current", "h"),
+    SIDE_BRUSH_CURRENT: _packet("side_brush_current", "h"),
+    STASIS: _packet("stasis", "B"),
+}
+
+
+def packet(packet_id):
+    """
+    :return: The Packet for packet_id
+    """
+    try:
+        return PACKETS[packet_id]
+    except KeyError:
+        raise RuntimeError("Unsupported sensor packet {0}".format(packet_id))
+
+
+def checksum(data):
+    """
+    :param data: bytearray of a stream frame, from the header up to but not including the checksum
+    :return: The checksum byte that makes the frame's bytes sum to 0 modulo 256
+    """
+    return -sum(data) & 0xFF
+
+
+class PacketGroup(object):
+    """
+    Everything needed to query a group of packets with Query List, worked out once per group: the request bytes,
+    the struct that decodes the reply and the record type the values are returned in
+    """
+
+    def __init__(self, packet_ids):
+        self.packet_ids = tuple(packet_ids)
+        if not self.packet_ids:
+            raise RuntimeError("A query needs at least one packet")
+        packets = [packet(packet_id) for packet_id in self.packet_ids]
+        names = [p.name for p in packets]
+        if len(set(names)) != len(names):
+            raise RuntimeError("Each packet may only be queried once")
+        self.request = struct.pack(">BB{0}B".format(len(self.packet_ids)), int(commands.QUERY_LIST),
+                                   len(self.packet_ids), *self.packet_ids)
+        self.struct = struct.Struct(">" + "".join(p.format for p in packets))
+        self.size = self.struct.size  # Bytes in the reply
+        self.record = namedtuple("SensorRecord", names)
+
+    def decode(self, data):
+        """
+        :param data: The reply, which is the packet values one after another
+        :return: SensorRecord with a field per packet, named as in PACKETS
+        """
+        return self.record._make(self.struct.unpack_from(data))
+
+
+_groups = {}  # PacketGroup by tuple of packet IDs.  Programs only ever query a handful of groups.
+
+
+def packet_group(packet_ids):
+    """
+    :return: The cached PacketGroup for packet_ids, in that order
+    """
+    key = tuple(packet_ids)
+    group = _groups.get(key)
+    if group is None:
+        group = _groups[key] = PacketGroup(key)
+    return group
@@ -0,0 +1,222 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+import threading
+import time
+from collections import namedtuple
+
+import serial
+
+from stream_parser import StreamParser
+
+STREAM_PERIOD = 0.015  # The Create sends a frame every 15ms
+DEFAULT_CAPACITY = 4096  # Samples kept, about a minute of history
+
+SensorSample = namedtuple("SensorSample", "time values")  # values maps packet ID to value
+
+
+class SampleRing(object):
+    """
+    A fixed size history of sensor samples, written by one thread and read by any number of others without locks.
+
+    The writer stores a sample in its slot before publishing the new count, and a slot is only reused capacity
+    samples later.  Readers copy the slots they want and then drop any that the writer reused while they were
+    copying.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._count = 0  # Samples ever appended
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def append(self, sample):
+        """
+        Add a sample, replacing the oldest once the ring is full.  Only one thread may append.
+        """
+        self._slots[self._count % self.capacity] = sample
+        self._count += 1
+
+    def latest(self):
+        """
+        :return: The most recent SensorSample, or None before the first one arrives
+        """
+        count = self._count
+        if not count:
+            return None
+        return self._slots[(count - 1) % self.capacity]
+
+    def last(self, n):
+        """
+        :return: List of up to n of the most recent samples, oldest first
+        """
+        count = self._count
+        first = max(count - min(n, self.capacity), 0)
+        samples = [self._slots[index % self.capacity] for index in range(first, count)]
+        # The writer may have wrapped round onto the oldest slots while they were being copied
+        overwritten = self._count - self.capacity - first
+        if overwritten > 0:
+            samples = samples[overwritten:]
+        return samples
+
+    def window(self, seconds, now=None):
+        """
+        :param seconds: Length of the window
+        :param now: End of the window.  Defaults to the time of the latest sample
+        :return: List of the samples from the last seconds, oldest first
+        """
+        samples = self.last(self.capacity)
+        if not samples:
+            return samples
+        start = (samples[-1].time if now is None else now) - seconds
+        for index, sample in enumerate(samples):
+            if sample.time >= start:
+                return samples[index:]
+        return []
+
+
+class SensorStream(object):
+    """
+    Reads the Create's sensor stream on a background thread and keeps the parsed samples in a SampleRing.
+
+    Without the thread, the stream is read on whichever thread calls wait_for_frames, which suits a simulated robot
+    on a VirtualClock: its frames are generated as the clock is stepped, so there is never anything to wait for.
+    """
+
+    def __init__(self, connection, packet_ids, clock, capacity=DEFAULT_CAPACITY, threaded=True):
+        """
+        :param connection: The open serial port.  Reads should time out, so the thread can notice it has been stopped
+        :param packet_ids: The packets requested in the stream
+        :param clock: Provides time() for timestamping samples
+        :param capacity: Samples kept in the ring
+        :param threaded: If false, no thread is started and frames are only read by wait_for_frames
+        """
+        self.connection = connection
+        self.parser = StreamParser(packet_ids)  # Rejects unsupported packets before the stream is requested
+        self.packet_ids = list(self.parser.packet_ids)
+        self.clock = clock
+        self.ring = SampleRing(capacity)
+        self.error = None  # The exception that stopped the thread, if any
+        self._listeners = []
+        self._arrived = threading.Condition()  # Notified after each batch of frames has been handled
+        self._running = False
+        self._thread = None
+        self.threaded = threaded
+
+    @property
+    def frames(self):
+        return self.parser.frames
+
+    @property
+    def bad_frames(self):
+        return self.parser.bad_frames
+
+    @property
+    def bytes_discarded(self):
+        return self.parser.bytes_discarded
+
+    def subscribe(self, listener):
+        """
+        Call listener(sample) with every new SensorSample, on the reader thread.  Listeners must be quick, so the
+        thread keeps up with the stream, and must not raise.
+        """
+        self._listeners = self._listeners + [listener]  # Replaced rather than changed, as the thread iterates it
+
+    def unsubscribe(self, listener):
+        self._listeners = [existing for existing in self._listeners if existing != listener]
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        if not self.threaded:
+            return
+        self._thread = threading.Thread(target=self._run, name="CreateSensors")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the reader thread and wait for it to exit
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wait_for_frames(self, count, timeout):
+        """
+        Block until count frames have been parsed in total and passed to the listeners.  Without the reader thread,
+        read the frames already waiting on the port instead, returning as soon as nothing more is waiting.
+        :param count: Total number of frames to wait for, as counted by frames
+        :param timeout: Maximum time to wait, in real seconds
+        :return: True if the frames arrived, False if the timeout expired or the thread stopped first
+        """
+        if not self.threaded:
+            while self._running and self.parser.frames < count and self.connection.in_waiting:
+                self._read()
+            return self.parser.frames >= count
+        deadline = time.time() + timeout
+        with self._arrived:
+            while self.parser.frames < count and self._running:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._arrived.wait(remaining)
+            return self.parser.frames >= count
+
+    def latest(self):
+        """
+        :return: The most recent SensorSample, or None before the first frame arrives
+        """
+        return self.ring.latest()
+
+    def window(self, seconds, now=None):
+        """
+        :return: List of the samples from the last seconds, oldest first.  See SampleRing.window
+        """
+        return self.ring.window(seconds, now)
+
+    def _run(self):
+        while self._running:
+            self._read()
+
+    def _read(self):
+        """
+        Read from the port once and hand every whole frame received to the ring and the listeners
+        """
+        try:
+            if not self.parser.fill(self.connection):
+                return
+        except serial.SerialException as err:
+            self.error = err
+            self._running = False
+            with self._arrived:
+                self._arrived.notify_all()
+            return
+        now = self.clock.time()
+        packet_ids = self.packet_ids
+        for values in self.parser.decode():
+            sample = SensorSample(now, dict(zip(packet_ids, values)))
+            self.ring.append(sample)
+            for listener in self._listeners:
+                listener(sample)
+        with self._arrived:
+            self._arrived.notify_all()
@@ -0,0 +1,144 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Framing of the Open Interface sensor stream.
+#
+# A frame is the header byte 19, the length n of the body, the body of packet IDs each followed by its value, and
+# a checksum that makes all n + 3 bytes sum to 0 modulo 256.  The packets in a stream are fixed when it is
+# requested, so every frame has the same size and layout, which is compiled into a single struct.
+import struct
+
+import sensors
+
+STREAM_HEADER = 19  # First byte of every stream frame
+DEFAULT_BUFFER_SIZE = 4096
+
+
+class StreamParser(object):
+    """
+    Finds and decodes stream frames in a preallocated buffer, without copying the frames out of it.
+
+    Bytes are read or fed into the free space at the end of the buffer and decoded in place through a memoryview.
+    Frames are located by searching for the header, length and first packet ID together, which rarely occur by
+    chance inside a frame.  After a bad checksum or lost bytes, the search resumes one byte after the false start,
+    so the parser is back in step at the next good frame.
+    """
+
+    def __init__(self, packet_ids, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        :param packet_ids: The packets requested in the stream, in order
+        :param buffer_size: Bytes of buffer to preallocate.  Must hold at least two frames
+        """
+        self.packet_ids = tuple(packet_ids)
+        if not self.packet_ids:
+            raise RuntimeError("A stream needs at least one packet")
+        packets = [sensors.packet(packet_id) for packet_id in self.packet_ids]
+        body = sum(1 + packet.size for packet in packets)
+        if body > 255:
+            raise RuntimeError("Too many packets for a single stream frame")
+        self.frame_size = body + 3
+        if buffer_size < 2 * self.frame_size:
+            raise RuntimeError("The stream buffer must hold at least two frames")
+
+        self._frame = struct.Struct(">BB" + "".join("B" + packet.format for packet in packets) + "B")
+        self._bytes = struct.Struct("{0}B".format(self.frame_size))  # The frame as bytes, for the checksum
+        self._signature = bytes(bytearray([STREAM_HEADER, body, self.packet_ids[0]]))
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # First unparsed byte
+        self._end = 0  # End of the bytes received
+
+        self.frames = 0  # Frames decoded
+        self.bad_frames = 0  # Frames rejected for a bad checksum or unexpected packet IDs
+        self.bytes_discarded = 0  # Bytes skipped while looking for the start of a frame
+
+    def fill(self, connection):
+        """
+        Read the bytes waiting on the connection into the buffer.  Blocks for up to the connection's read timeout
+        when nothing is waiting.
+        :return: Number of bytes read
+        """
+        self._make_room()
+        wanted = min(max(connection.in_waiting, 1), len(self._buffer) - self._end)
+        count = connection.readinto(self._view[self._end:self._end + wanted])
+        self._end += count
+        return count
+
+    def feed(self, data):
+        """
+        Copy received bytes into the buffer.  Call decode() between feeds so the buffer doesn't overflow.
+        :param data: str, bytearray or memoryview
+        """
+        self._make_room()
+        count = len(data)
+        if count > len(self._buffer) - self._end:
+            raise RuntimeError("Stream buffer overflow")
+        self._view[self._end:self._end + count] = data
+        self._end += count
+
+    def decode(self):
+        """
+        Decode every complete frame in the buffer
+        :return: Generator of tuples of packet values, ordered like packet_ids
+        """
+        buffer = self._buffer
+        view = self._view
+        signature = self._signature
+        frame_size = self.frame_size
+        while True:
+            start = self._start
+            end = self._end
+            found = buffer.find(signature, start, end)
+            if found < 0:
+                # Keep a tail that could be the beginning of the next signature
+                keep = max(end - len(signature) + 1, start)
+                self.bytes_discarded += keep - start
+                self._start = keep
+                return
+            self.bytes_discarded += found - start
+            self._start = found
+            if end - found < frame_size:
+                return  # Wait for the rest of the frame
+
+            fields = None
+            if not sum(self._bytes.unpack_from(view, found)) & 0xFF:
+                fields = self._frame.unpack_from(view, found)
+                if fields[2:-1:2] != self.packet_ids:
+                    fields = None
+            if fields is None:
+                # The signature was a coincidence or the frame was corrupted; look again just after it
+                self.bad_frames += 1
+                self._start = found + 1
+                continue
+
+            self._start = found + frame_size
+            self.frames += 1
+            yield fields[3:-1:2]
+
+    def _make_room(self):
+        """
+        Move the unparsed bytes to the front of the buffer once they are past its middle
+        """
+        start = self._start
+        end = self._end
+        if start == end:
+            self._start = self._end = 0
+        elif start > len(self._buffer) // 2:
+            self._buffer[:end - start] = self._buffer[start:end]
+            self._start = 0
+            self._end = end - start
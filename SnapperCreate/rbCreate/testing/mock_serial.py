@@ -16,14 +16,20 @@
     TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
     SOFTWARE.
 """
+import time
+
 import serial
 
+READ_TIMEOUT = 0.1  # Matches the timeout of the real port, so readers polling the mock don't spin
+
 
 class MockSerial(serial.Serial):
     def __init__(self, port, parity, stopbits, bytesize, baudrate):
         print("Initialized MockSerial")
+        self._baudrate = baudrate
 
     is_open = True
+    in_waiting = 0
 
     def close(self):
         print("Closed connection")
@@ -33,6 +39,15 @@ class MockSerial(serial.Serial):
         # print data
         return None
 
+    def flush(self):
+        return None
+
+    def _reconfigure_port(self, *args, **kwargs):
+        # There is no port to reconfigure when the baud rate changes
+        return None
+
     def read(self, size=1):
-        print "Reading data"
+        # Nothing ever arrives, so every read times out
+        time.sleep(READ_TIMEOUT)
+        return ""
 
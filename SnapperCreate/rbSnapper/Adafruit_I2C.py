@@ -4,7 +4,7 @@ import re
 try:
     import smbus
 except ImportError:
-    raise
+    smbus = None  # Only a bus passed to the constructor, such as a simulated device, can be used
 
 
 # ===========================================================================
@@ -39,14 +39,23 @@ class Adafruit_I2C(object):
     # Gets the I2C bus number /dev/i2c#
     return 1 if Adafruit_I2C.getPiRevision() > 1 else 0
 
-  def __init__(self, address, busnum=-1, debug=False):
+  def __init__(self, address, busnum=-1, debug=False, bus=None, record=None):
     self.address = address
-    # By default, the correct I2C bus is auto-detected using /proc/cpuinfo
-    # Alternatively, you can hard-code the bus version below:
-    # self.bus = smbus.SMBus(0); # Force I2C0 (early 256MB Pi's)
-    # self.bus = smbus.SMBus(1); # Force I2C1 (512MB Pi's)
-    self.bus = smbus.SMBus(busnum if busnum >= 0 else Adafruit_I2C.getPiI2CBusNumber())
+    if bus is None:
+      if smbus is None:
+        raise ImportError("smbus is required to access the I2C bus")
+      # By default, the correct I2C bus is auto-detected using /proc/cpuinfo
+      # Alternatively, you can hard-code the bus version below:
+      # bus = smbus.SMBus(0); # Force I2C0 (early 256MB Pi's)
+      # bus = smbus.SMBus(1); # Force I2C1 (512MB Pi's)
+      bus = smbus.SMBus(busnum if busnum >= 0 else Adafruit_I2C.getPiI2CBusNumber())
+    # Anything with the SMBus methods can stand in for the bus
+    if record is not None:
+      bus = record.bus(bus)                 # a recording.TrafficLog logs every transaction
+    self.bus = bus
     self.debug = debug
+    # Number of bus transactions issued, used to measure bus utilisation
+    self.transactions = 0
 
   def reverseByteOrder(self, data):
     "Reverses the byte order of an int (16-bit) or long (32-bit) value"
@@ -65,6 +74,7 @@ class Adafruit_I2C(object):
   def write8(self, reg, value):
     "Writes an 8-bit value to the specified register/address"
     try:
+      self.transactions += 1
       self.bus.write_byte_data(self.address, reg, value)
       if self.debug:
         print "I2C: Wrote 0x%02X to register 0x%02X" % (value, reg)
@@ -74,6 +84,7 @@ class Adafruit_I2C(object):
   def write16(self, reg, value):
     "Writes a 16-bit value to the specified register/address pair"
     try:
+      self.transactions += 1
       self.bus.write_word_data(self.address, reg, value)
       if self.debug:
         print ("I2C: Wrote 0x%02X to register pair 0x%02X,0x%02X" %
@@ -84,6 +95,7 @@ class Adafruit_I2C(object):
   def writeRaw8(self, value):
     "Writes an 8-bit value on the bus"
     try:
+      self.transactions += 1
       self.bus.write_byte(self.address, value)
       if self.debug:
         print "I2C: Wrote 0x%02X" % value
@@ -96,6 +108,7 @@ class Adafruit_I2C(object):
       if self.debug:
         print "I2C: Writing list to register 0x%02X:" % reg
         print list
+      self.transactions += 1
       self.bus.write_i2c_block_data(self.address, reg, list)
     except IOError, err:
       return self.errMsg()
@@ -103,6 +116,7 @@ class Adafruit_I2C(object):
   def readList(self, reg, length):
     "Read a list of bytes from the I2C device"
     try:
+      self.transactions += 1
       results = self.bus.read_i2c_block_data(self.address, reg, length)
       if self.debug:
         print ("I2C: Device 0x%02X returned the following from reg 0x%02X" %
@@ -115,6 +129,7 @@ class Adafruit_I2C(object):
   def readU8(self, reg):
     "Read an unsigned byte from the I2C device"
     try:
+      self.transactions += 1
       result = self.bus.read_byte_data(self.address, reg)
       if self.debug:
         print ("I2C: Device 0x%02X returned 0x%02X from reg 0x%02X" %
@@ -126,6 +141,7 @@ class Adafruit_I2C(object):
   def readS8(self, reg):
     "Reads a signed byte from the I2C device"
     try:
+      self.transactions += 1
       result = self.bus.read_byte_data(self.address, reg)
       if result > 127: result -= 256
       if self.debug:
@@ -138,6 +154,7 @@ class Adafruit_I2C(object):
   def readU16(self, reg, little_endian=True):
     "Reads an unsigned 16-bit value from the I2C device"
     try:
+      self.transactions += 1
       result = self.bus.read_word_data(self.address,reg)
       # Swap bytes if using big endian because read_word_data assumes little
       # endian on ARM (little endian) systems.
@@ -3,6 +3,7 @@
 import time
 import math
 from Adafruit_I2C import Adafruit_I2C
+from shadow_registers import ShadowRegisters
 
 # ============================================================================
 # Adafruit PCA9685 16-Channel PWM Servo Driver
@@ -28,22 +29,38 @@ class PWM :
   # Bits
   __RESTART            = 0x80
   __SLEEP              = 0x10
+  __AI                 = 0x20
   __ALLCALL            = 0x01
   __INVRT              = 0x10
   __OUTDRV             = 0x04
 
-  general_call_i2c = Adafruit_I2C(0x00)
+  # SMBus block writes carry at most 32 data bytes
+  __MAX_BLOCK          = 32
 
   @classmethod
-  def softwareReset(cls):
+  def softwareReset(cls, bus=None):
     """Sends a software reset (SWRST) command to all the servo drivers on the bus"""
-    cls.general_call_i2c.writeRaw8(0x06)        # SWRST
+    Adafruit_I2C(0x00, bus=bus).writeRaw8(0x06)        # SWRST
 
-  def __init__(self, address=0x40, debug=False):
-    self.i2c = Adafruit_I2C(address)
+  def __init__(self, address=0x40, debug=False, bus=None, record=None, resume=False):
+    """bus is an SMBus compatible object to use instead of the Pi's I2C bus, such as a simulated PCA9685.
+    record is a recording.TrafficLog to log every bus transaction in.
+    With resume, a chip that is already awake and configured by this driver, because it stayed powered while the
+    program restarted, keeps its outputs running instead of having them all switched off.  resumed says which
+    happened."""
+    self.i2c = Adafruit_I2C(address, bus=bus, record=record)
     self.i2c.debug = debug
     self.address = address
     self.debug = debug
+    self.shadow = ShadowRegisters()               # last values written to the LEDn registers
+    self.resumed = False
+    if resume:
+      mode1 = self.i2c.readU8(self.__MODE1)
+      if mode1 >= 0 and not mode1 & self.__SLEEP and mode1 & self.__AI and self.readPWMFrame(0, 16) is not None:
+        if (self.debug):
+          print "Resuming the running PCA9685 outputs"
+        self.resumed = True
+        return
     if (self.debug):
       print "Reseting PCA9685 MODE1 (without SLEEP) and MODE2"
     self.setAllPWM(0, 0)
@@ -53,6 +70,7 @@ class PWM :
 
     mode1 = self.i2c.readU8(self.__MODE1)
     mode1 = mode1 & ~self.__SLEEP                 # wake up (reset sleep)
+    mode1 = mode1 | self.__AI                     # register auto-increment for frame writes
     self.i2c.write8(self.__MODE1, mode1)
     time.sleep(0.005)                             # wait for oscillator
 
@@ -69,6 +87,8 @@ class PWM :
     if (self.debug):
       print "Final pre-scale: %d" % prescale
 
+    if self.i2c.readU8(self.__PRESCALE) == prescale:
+      return                                      # already running at this rate, so don't stop the outputs
     oldmode = self.i2c.readU8(self.__MODE1);
     newmode = (oldmode & 0x7F) | 0x10             # sleep
     self.i2c.write8(self.__MODE1, newmode)        # go to sleep
@@ -79,10 +99,57 @@ class PWM :
 
   def setPWM(self, channel, on, off):
     """Sets a single PWM channel"""
-    self.i2c.write8(self.__LED0_ON_L+4*channel, on & 0xFF)
-    self.i2c.write8(self.__LED0_ON_H+4*channel, on >> 8)
-    self.i2c.write8(self.__LED0_OFF_L+4*channel, off & 0xFF)
-    self.i2c.write8(self.__LED0_OFF_H+4*channel, off >> 8)
+    self.setPWMFrame(channel, [(on, off)])
+
+  def setPWMFrame(self, channel, values):
+    """Sets consecutive PWM channels, starting at channel, from a list of (on, off) pairs.
+
+    Only the register bytes that differ from the shadow copy are sent.  Relies on MODE1 auto-increment so each
+    run of changed bytes, up to 32 at a time, is a single I2C transaction.
+
+    Returns False if a write failed.  The registers it covered are forgotten, so the next frame sends them again."""
+    return self.__transmit(self.shadow.update(channel, values))
+
+  def readPWMFrame(self, channel, count):
+    """Reads consecutive PWM channels back from the chip, starting at channel, and loads them into the shadow copy.
+
+    Returns a list of (on, off) pairs, with the full on or full off bit as 4096, or None if the read failed."""
+    data = []
+    total = count * 4
+    while len(data) < total:
+      block = self.i2c.readList(self.__LED0_ON_L + channel * 4 + len(data), min(self.__MAX_BLOCK, total - len(data)))
+      if block == -1:
+        return None
+      data.extend(block)
+    self.shadow.load(channel, data)
+    return [((data[i + 1] & 0x1F) << 8 | data[i], (data[i + 3] & 0x1F) << 8 | data[i + 2]) for i in range(0, total, 4)]
+
+  def flush(self):
+    """Resends every register value held in the shadow copy, e.g. to restore outputs after a reset.  Returns False if
+    a write failed"""
+    return self.__transmit(self.shadow.known_runs())
+
+  def invalidate(self):
+    """Forgets the shadow copy so the next write to each channel is sent in full.  Call after softwareReset"""
+    self.shadow.invalidate()
+
+  def __transmit(self, runs):
+    sent = True
+    for offset, data in runs:
+      for start in range(0, len(data), self.__MAX_BLOCK):
+        block = data[start:start + self.__MAX_BLOCK]
+        if len(block) == 1:
+          result = self.i2c.write8(self.__LED0_ON_L+offset+start, block[0])
+        else:
+          result = self.i2c.writeList(self.__LED0_ON_L+offset+start, block)
+        if result == -1:
+          self.shadow.forget(offset + start, len(block))  # The chip may not hold these, so send them next time
+          sent = False
+    return sent
+
+  def getTransactionCount(self):
+    """Returns the number of I2C transactions issued to this driver"""
+    return self.i2c.transactions
 
   def setAllPWM(self, on, off):
     """Sets a all PWM channels"""
@@ -90,3 +157,4 @@ class PWM :
     self.i2c.write8(self.__ALL_LED_ON_H, on >> 8)
     self.i2c.write8(self.__ALL_LED_OFF_L, off & 0xFF)
     self.i2c.write8(self.__ALL_LED_OFF_H, off >> 8)
+    self.shadow.set_all(on, off)
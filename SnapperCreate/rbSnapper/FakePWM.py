@@ -18,14 +18,35 @@
 """
 
 #!/usr/bin/python
+from shadow_registers import ShadowRegisters
+
 
 class PWM:
     def __init__(self):
         """This is just a stub"""
         self.pwmFreq = 0
+        self.transactions = 0  # Mirrors the I2C transactions the real driver would issue
+        self.shadow = ShadowRegisters()
+        self.resumed = False  # The stub never has outputs to carry on from
 
     def setPWMFreq(self, frequency):
         self.pwmFreq = frequency
 
     def setPWM(self, channel, start, stop):
-        print "Channel: {0}, Start: {1}, Stop: {2}".format(channel, start, stop)
+        self.setPWMFrame(channel, [(start, stop)])
+
+    def setPWMFrame(self, channel, values):
+        runs = self.shadow.update(channel, values)
+        self.transactions += sum((len(data) + 31) // 32 for offset, data in runs)
+        if runs:
+            for offset, (start, stop) in enumerate(values):
+                print "Channel: {0}, Start: {1}, Stop: {2}".format(channel + offset, start, stop)
+
+    def flush(self):
+        self.transactions += sum((len(data) + 31) // 32 for offset, data in self.shadow.known_runs())
+
+    def invalidate(self):
+        self.shadow.invalidate()
+
+    def getTransactionCount(self):
+        return self.transactions
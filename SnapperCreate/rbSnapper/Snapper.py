@@ -16,14 +16,25 @@
     TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
     SOFTWARE.
 """
-try:
-    from Adafruit_PWM_Servo_Driver import PWM
-except ImportError:
-    from FakePWM import PWM
+from Adafruit_PWM_Servo_Driver import PWM
+import FakePWM
 
-from numpy import interp
-from time import sleep
 from enum import Enum
+from itertools import takewhile
+
+from calibration import Calibration
+from kinematics import Kinematics
+from kinematics import POSITION_TOLERANCE
+from motion import MotionExecutor
+from motion import run_now
+from pose_store import DEFAULT_POSE_PATH
+from pose_store import PoseStore
+from profiles import TrapezoidalProfile
+from profiles import default_limits
+from scheduler import FrameScheduler
+from scheduler import SystemClock
+from trajectory import ProfiledTrajectory
+from trajectory import frame_count
 
 
 class Joints(Enum):
@@ -35,286 +46,320 @@ class Joints(Enum):
 
 PWM_FREQ = 50.0
 
-PULSE_LENGTH = 1000000.0 / PWM_FREQ / 4096
-
-ARM_MIN = 600   # Minimum pulse width for the lower joints, fully counter-clockwise
-ARM_MAX = 2400  # Maximum pulse width for the lower joints, fully clockwise
-
-GRIPPER_MIN = 750  # Minimum pulse width for the gripper.  Very important that the gripper servo does NOT go below this or we risk breakage
-GRIPPER_MAX = 2400  # Maximum pulse width for the gripper.
-
-CENTER = 1500  # Pulse with for zeroed position
-
-UPDATE_TIME_DELAY = 0.007
+UPDATE_TIME_DELAY = 0.007  # Period of the servo update loop, in seconds
 
 
 class Snapper:
 
-    def __init__(self):
+    def __init__(self, calibration=None, clock=None, async_motion=False, profile=None, limits=None, kinematics=None,
+                 pwm=None, record=None, pose_file=DEFAULT_POSE_PATH):
+        """
+        :param calibration: Calibration holding the per-joint pulse widths.  Defaults to the stock Snapper servos
+        :param clock: Clock providing time() and sleep() used to pace motion.  Defaults to the system clock
+        :param async_motion: If true, motion commands are run by a background thread and return immediately.  Use
+                             the MotionHandle they return to wait for or cancel the move.
+        :param profile: Velocity profile for every move, TrapezoidalProfile (the default) or SCurveProfile
+        :param limits: List of JointLimits indexed by PWM channel.  Defaults to the stock Snapper servos
+        :param kinematics: Kinematics used by move_to and position.  Defaults to the stock Snapper geometry
+        :param pwm: The PCA9685 driver.  Defaults to the one on the Pi's I2C bus, or a stub that prints every write
+                    when smbus is not installed
+        :param record: recording.TrafficLog to record the I2C traffic of the default PCA9685 driver in
+        :param pose_file: File the last commanded pose is saved to after every move, so a restart can carry on from
+                          it instead of jumping to the centre.  None to always start by centring
+        """
         print "Creating Snapper interface"
-        self.pwm = PWM()
-        self.pwm.setPWMFreq(PWM_FREQ)
-
-        print "Pulse Length: {0}".format(PULSE_LENGTH)
+        self.calibration = calibration if calibration is not None else Calibration(pwm_freq=PWM_FREQ)
+        self.clock = clock if clock is not None else SystemClock()
+        self.scheduler = FrameScheduler(UPDATE_TIME_DELAY, self.clock)
+        self.last_move_statistics = None  # FrameStatistics of the most recent move
+        self.executor = MotionExecutor() if async_motion else None
+        self.profile = profile if profile is not None else TrapezoidalProfile()
+        self.limits = limits if limits is not None else default_limits()
+        self.kinematics = kinematics if kinematics is not None else Kinematics()
+        if pwm is None:
+            try:
+                pwm = PWM(record=record, resume=True)
+            except ImportError:
+                pwm = FakePWM.PWM()
+        self.pwm = pwm
+        self.pwm.setPWMFreq(self.calibration.pwm_freq)
+
+        print "Pulse Length: {0}".format(self.calibration.pulse_length)
 
         self.waist_position = 0
         self.shoulder_position = 0
         self.elbow_position = 0
         self.wrist_position = 0
         self.gripper_position = 50
+        self.state_bus = None  # state_bus.StatePublisher the joint positions are published to, once attached
+        self.pose_store = PoseStore(pose_file) if pose_file is not None else None
+        self._ticks = None  # OFF ticks last written to each joint, indexed by PWM channel
+
+        self.resumed_from = self._resume_position()
+        if self.resumed_from is None:
+            self.initialize_position()
 
-        self.initialize_position()
+    def _resume_position(self):
+        """
+        Carry on from the pose the arm was left in, if it is known
+        :return: "pca9685" if the chip kept driving the servos, "pose file" if the saved pose was reapplied, or None
+                 if the pose is unknown
+        """
+        if getattr(self.pwm, "resumed", False):
+            frame = self.pwm.readPWMFrame(Joints.WAIST.value, len(Joints))
+            ticks = [off - on for on, off in frame] if frame is not None else []
+            # A channel that is fully off, or never set, is not holding its servo anywhere
+            if len(ticks) == len(Joints) and all(0 < tick < 4096 for tick in ticks):
+                print "Resuming from the pose held by the PCA9685"
+                self._ticks = ticks
+                self._update_joint_positions(self.calibration.values(ticks))
+                return "pca9685"
+
+        pose = self.pose_store.load() if self.pose_store is not None else None
+        if pose is None or len(pose["values"]) != len(Joints):
+            return None
+        if pose["calibration"] == self.calibration.key:
+            values, ticks = pose["values"], pose["ticks"]
+        else:
+            # Calibrated since the pose was saved, so find the values that drive the servos to the same place
+            values = self.calibration.values(pose["ticks"])
+            ticks = self.calibration.ticks_array([values])[0].tolist()
+        print "Resuming from the pose saved in {0}".format(self.pose_store.path)
+        self._write_frame((values, ticks))
+        return "pose file"
 
     def initialize_position(self):
-        self.center()
-        sleep(1)
+        """
+        Drive every servo straight to its centre and give them time to get there.  Only for when the pose is unknown,
+        as the servos move at full speed.
+        """
+        self._submit(self._center).wait()
+        self.clock.sleep(1)
 
     def center(self):
         """
-        Sets all servos to their centered positions
-        :return: None
+        Moves all servos to their centered positions, following the velocity profile like any other move
+        :return: MotionHandle for the move
         """
-        self.pwm.setPWM(Joints.WAIST, 0, int(CENTER / PULSE_LENGTH))
-        self.pwm.setPWM(Joints.SHOULDER, 0, int(CENTER / PULSE_LENGTH))
-        self.pwm.setPWM(Joints.ELBOW, 0, int(CENTER / PULSE_LENGTH))
-        self.pwm.setPWM(Joints.WRIST, 0, int(CENTER / PULSE_LENGTH))
-        self.pwm.setPWM(Joints.GRIPPER, 0, int(CENTER / PULSE_LENGTH))
+        return self.set_joints(dict(zip(Joints, self._center_values())))
+
+    def _center_values(self):
+        return [(joint.low + joint.high) / 2 for joint in self.calibration.joints]
+
+    def _center(self, handle):
+        ticks = [self.calibration.center_ticks(joint.value) for joint in Joints]
+        self.pwm.setPWMFrame(Joints.WAIST.value, [(0, tick) for tick in ticks])
+        self._ticks = ticks
+        self._update_joint_positions(self._center_values())
+        self._save_pose()
 
     def stow(self):
         """
         Sets all servos to a compact position suitable for unpowered movement
-        :return: None
+        :return: MotionHandle for the move
         """
-        self.set_joints({
+        return self.set_joints({
             Joints.WAIST: 0,
             Joints.SHOULDER: -80,
             Joints.ELBOW: -65,
             Joints.WRIST: -30,
         })
 
-    def _query_duration(self, current_joint_position, target_position):
-        step = 1 if current_joint_position > target_position else -1
-        rng = range(current_joint_position, target_position, step)
-        # Total move time is the number of steps * the time per step, plus an extra step time as a buffer
-        return len(rng) * UPDATE_TIME_DELAY + UPDATE_TIME_DELAY
+    def _query_duration(self, joint, current_joint_position, target_position):
+        # The profile's minimum time, rounded up to whole update periods as the move is executed
+        duration = self.profile.duration(target_position - current_joint_position, self.limits[joint.value])
+        return frame_count(duration, UPDATE_TIME_DELAY) * UPDATE_TIME_DELAY
+
+    def joints_move_duration(self, joint_values):
+        """
+        :param joint_values: Dictionary of values from Joints enum, as passed to set_joints
+        :return: Duration of the corresponding set_joints move, in seconds
+        """
+        current = self._joint_positions()
+        # Joints are synchronised, so the move takes as long as the slowest joint needs
+        return max([self._query_duration(joint, current[joint.value], value)
+                    for joint, value in joint_values.items()] + [0.0])
 
     def waist_move_duration(self, degrees):
-        return self._query_duration(self.waist_position, degrees)
+        return self._query_duration(Joints.WAIST, self.waist_position, degrees)
 
     def shoulder_move_duration(self, degrees):
-        return self._query_duration(self.shoulder_position, degrees)
+        return self._query_duration(Joints.SHOULDER, self.shoulder_position, degrees)
 
     def elbow_move_duration(self, degrees):
-        return self._query_duration(self.elbow_position, degrees)
+        return self._query_duration(Joints.ELBOW, self.elbow_position, degrees)
 
     def wrist_move_duration(self, degrees):
-        return self._query_duration(self.wrist_position, degrees)
+        return self._query_duration(Joints.WRIST, self.wrist_position, degrees)
 
     def gripper_move_duration(self, percentage):
-        return self._query_duration(self.gripper_position, percentage)
+        return self._query_duration(Joints.GRIPPER, self.gripper_position, percentage)
 
     def set_waist(self, degrees=0):
         """
         Rotates the waist joint to the specified angle
         :param degrees: clamped to [-90, 90]
-        :return: Duration of the commanded motion, in seconds
+        :return: MotionHandle for the move
         """
-        start_position = self.waist_position
-        step = 1 if degrees > start_position else -1
-        travel = range(start_position, degrees, step)
-
-        print "Moving waist from {0} to {1}".format(start_position, degrees)
-        for i in travel:
-            value = _interpolate_arm(i)
-            self.pwm.setPWM(Joints.WAIST, 0, value)
-            self.waist_position = i
-            print "Update waist to {0} degrees".format(self.waist_position)
-            sleep(UPDATE_TIME_DELAY)
+        print "Moving waist from {0} to {1}".format(self.waist_position, degrees)
+        return self.set_joints({Joints.WAIST: degrees})
 
     def set_shoulder(self, degrees=0):
         """
         Rotates the shoulder joint to the specified angle
         :param degrees: clamped to [-90, 90]
-        :return: None
+        :return: MotionHandle for the move
         """
-        start_position = self.shoulder_position
-        step = 1 if degrees > start_position else -1
-        travel = range(start_position, degrees, step)
-
-        print "Moving shoulder from {0} to {1}".format(start_position, degrees)
-        for i in travel:
-            value = _interpolate_arm(i)
-            self.pwm.setPWM(Joints.SHOULDER, 0, value)
-            self.shoulder_position = i
-            print "Update waist to {0} degrees".format(self.shoulder_position)
-            sleep(UPDATE_TIME_DELAY)
+        print "Moving shoulder from {0} to {1}".format(self.shoulder_position, degrees)
+        return self.set_joints({Joints.SHOULDER: degrees})
 
     def set_elbow(self, degrees=0):
         """
         Rotates the elbow joint to the specified angle
         :param degrees: clamped to [-90. 90]
-        :return: None
+        :return: MotionHandle for the move
         """
-        start_position = self.elbow_position
-        step = 1 if degrees > start_position else -1
-        travel = range(start_position, degrees, step)
-
-        print "Moving elbow from {0} to {1}".format(start_position, degrees)
-        for i in travel:
-            value = _interpolate_arm(i)
-            self.pwm.setPWM(Joints.ELBOW, 0, value)
-            self.elbow_position = i
-            print "Update elbow to {0} degrees".format(self.elbow_position)
-            sleep(UPDATE_TIME_DELAY)
+        print "Moving elbow from {0} to {1}".format(self.elbow_position, degrees)
+        return self.set_joints({Joints.ELBOW: degrees})
 
     def set_wrist(self, degrees=0):
         """
         Rotates the wrist joint to the specified angle
         :param degrees: clamped to [-90, 90]
-        :return: None
+        :return: MotionHandle for the move
         """
-        start_position = self.wrist_position
-        step = 1 if degrees > start_position else -1
-        travel = range(start_position, degrees, step)
-
-        print "Moving wrist from {0} to {1}".format(start_position, degrees)
-        for i in travel:
-            value = _interpolate_arm(i)
-            self.pwm.setPWM(Joints.WRIST, 0, value)
-            self.wrist_position = i
-            print "Update waist to {0} degrees".format(self.wrist_position)
-            sleep(UPDATE_TIME_DELAY)
+        print "Moving wrist from {0} to {1}".format(self.wrist_position, degrees)
+        return self.set_joints({Joints.WRIST: degrees})
 
     def set_gripper(self, percentage):
         """
         Sets the gripper to the specified open percentage
         :param percentage: clamped [0, 100] where 0 is completely closed and 100 is completely open
-        :return:
+        :return: MotionHandle for the move
         """
-        start_position = self.gripper_position
-        step = 1 if percentage > start_position else -1
-        travel = range(start_position, percentage, step)
-
-        print "Moving gripper from {0} to {1}".format(start_position, percentage)
-        for i in travel:
-            value = _interpolate_arm(i)
-            self.pwm.setPWM(Joints.GRIPPER, 0, value)
-            self.gripper_position = i
-            print "Update gripper to {0} degrees".format(self.gripper_position)
-            sleep(UPDATE_TIME_DELAY)
+        print "Moving gripper from {0} to {1}".format(self.gripper_position, percentage)
+        return self.set_joints({Joints.GRIPPER: percentage})
 
     def set_joints(self, joint_values):
         """
-        Set multiple joints at once in a batch.
+        Set multiple joints at once in a batch.  All joints follow the velocity profile within their limits and
+        arrive at their targets together, in the least time the slowest joint allows.
         :param joint_values: Dictionary of values from Joints enum
-        :return: None
+        :return: MotionHandle for the move
         """
-        desired_waist = joint_values.get(Joints.WAIST, self.waist_position)
-        desired_wrist = joint_values.get(Joints.WRIST, self.wrist_position)
-        desired_shoulder = joint_values.get(Joints.SHOULDER, self.shoulder_position)
-        desired_elbow = joint_values.get(Joints.ELBOW, self.elbow_position)
-        desired_gripper = joint_values.get(Joints.GRIPPER, self.gripper_position)
-
-        waist_step = 1 if desired_waist > self.waist_position else -1
-        wrist_step = 1 if desired_wrist > self.wrist_position else -1
-        shoulder_step = 1 if desired_shoulder > self.shoulder_position else -1
-        elbow_step = 1 if desired_elbow > self.elbow_position else -1
-        gripper_step = 1 if desired_gripper > self.gripper_position else -1
-
-        waist_range = range(self.waist_position, desired_waist, waist_step)
-        wrist_range = range(self.wrist_position, desired_wrist, wrist_step)
-        shoulder_range = range(self.shoulder_position, desired_shoulder, shoulder_step)
-        elbow_range = range(self.elbow_position, desired_elbow, elbow_step)
-        gripper_range = range(self.gripper_position, desired_gripper, gripper_step)
-
-        max_steps = max(len(waist_range), len(wrist_range), len(shoulder_range), len(elbow_range), len(gripper_range))
-
-        # Normalize number of steps and recalculate ranges
-        interp_waist_range = []
-        waist_order = [self.waist_position, desired_waist] if waist_step == 1 else [desired_waist, self.waist_position]
-
-        interp_wrist_range = []
-        wrist_order = [self.wrist_position, desired_wrist] if wrist_step == 1 else [desired_wrist, self.wrist_position]
-
-        interp_elbow_range = []
-        elbow_order = [self.elbow_position, desired_elbow] if elbow_step == 1 else [desired_elbow, self.elbow_position]
-
-        interp_shoulder_range = []
-        shoulder_order = [self.shoulder_position, desired_shoulder] if shoulder_step == 1 else [desired_shoulder, self.shoulder_position]
-
-        interp_gripper_range = []
-        gripper_order = [self.gripper_position, desired_gripper] if gripper_step == 1 else [desired_gripper, self.gripper_position]
-
-        for i in range(max_steps):
-            interp_waist_range.append(int(interp(i, [0, max_steps], waist_order)))
-            interp_wrist_range.append(int(interp(i, [0, max_steps], wrist_order)))
-            interp_elbow_range.append(int(interp(i, [0, max_steps], elbow_order)))
-            interp_shoulder_range.append(int(interp(i, [0, max_steps], shoulder_order)))
-            interp_gripper_range.append(int(interp(i, [0, max_steps], gripper_order)))
+        return self._submit(self._move, dict(joint_values))
 
-        # Now, if we were in reversed order for the interpolation we flip back
-        if wrist_step == -1:
-            interp_wrist_range.reverse()
-
-        if waist_step == -1:
-            interp_waist_range.reverse()
-
-        if elbow_step == -1:
-            interp_elbow_range.reverse()
-
-        if shoulder_step == -1:
-            interp_shoulder_range.reverse()
-
-        if gripper_step == -1:
-            interp_gripper_range.reverse()
-
-        # Finally, send each joint a PWM command and delay
-        for i in range(max_steps):
-            waist = interp_waist_range[i]
-            update = _interpolate_arm(waist)
-            self.pwm.setPWM(Joints.WAIST, 0, update)
-            self.waist_position = waist
-
-            wrist = interp_wrist_range[i]
-            update = _interpolate_arm(wrist)
-            self.pwm.setPWM(Joints.WRIST, 0, update)
-            self.wrist_position = wrist
-
-            shoulder = interp_shoulder_range[i]
-            update = _interpolate_arm(shoulder)
-            self.pwm.setPWM(Joints.SHOULDER, 0, update)
-            self.shoulder_position = shoulder
-
-            elbow = interp_elbow_range[i]
-            update = _interpolate_arm(elbow)
-            self.pwm.setPWM(Joints.ELBOW, 0, update)
-            self.elbow_position = elbow
-
-            gripper = interp_gripper_range[i]
-            update = _interpolate_gripper(gripper)
-            self.pwm.setPWM(Joints.GRIPPER, 0, update)
-            self.gripper_position = gripper
-
-            sleep(UPDATE_TIME_DELAY)
-
-        # Normalize the number of steps and recompute ranges
-
-        print "Setting desired_waist to {0}, desired_wrist to {1}".format(desired_waist, desired_wrist)
+    def stepped_move(self, joint_values):
+        """
+        Generator that makes the same move as set_joints one frame at a time, without waiting between frames.  After
+        each frame it yields the time until the next one is due, so it can run as a task on an rbCreate.EventLoop
+        alongside other devices.  Nothing else may move the arm until it finishes.
+        :param joint_values: Dictionary of values from Joints enum
+        """
+        try:
+            for frame in self._plan(joint_values).rows():
+                self._write_frame(frame)
+                yield UPDATE_TIME_DELAY
+        finally:
+            self._save_pose()
+
+    def move_to(self, x, y, z, pitch=None, tolerance=POSITION_TOLERANCE):
+        """
+        Moves the gripper tip to a point, choosing the joint angles closest to the pose the arm is in when the move
+        starts.  See kinematics.py for the coordinate system.
+        :param x: mm forward of the waist axis
+        :param y: mm to the left of the waist axis
+        :param z: mm above the arm's mounting surface
+        :param pitch: Gripper angle from vertical in degrees, or None to allow any angle
+        :param tolerance: Furthest, in mm, the gripper tip may end up from the point, or None to accept the closest
+                          pose however far off it is
+        :return: MotionHandle for the move.  Waiting on it raises RuntimeError if the point is out of reach
+        """
+        return self._submit(self._move_to, (x, y, z), pitch, tolerance)
 
+    def position(self):
+        """
+        :return: (x, y, z, pitch) of the gripper tip in the current pose
+        """
+        return self.kinematics.forward(*self._joint_positions()[:Joints.GRIPPER.value])
 
-def _interpolate_arm(degrees):
-    if degrees < -90:
-        degrees = -90
-    elif degrees > 90:
-        degrees = 90
+    def shutdown(self):
+        """
+        Finish any queued moves and stop the background motion thread, if there is one
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
 
-    return int(interp(degrees, [-90, 90], [ARM_MIN, ARM_MAX]) / PULSE_LENGTH)
+    def _submit(self, move, *args):
+        """
+        Run a move on the motion thread in asynchronous mode, or immediately otherwise
+        :return: MotionHandle for the move
+        """
+        if self.executor is not None:
+            return self.executor.submit(move, *args)
+        return run_now(move, *args)
+
+    def _move_to(self, handle, point, pitch, tolerance):
+        x, y, z = point
+        solution = self.kinematics.inverse(x, y, z, self._joint_positions()[:Joints.GRIPPER.value], pitch, tolerance)
+        if solution is None:
+            raise RuntimeError("({0}, {1}, {2}) is out of the arm's reach".format(x, y, z))
+        arm_joints = (Joints.WAIST, Joints.SHOULDER, Joints.ELBOW, Joints.WRIST)
+        return self._move(handle, dict(zip(arm_joints, [int(round(angle)) for angle in solution])))
+
+    def _move(self, handle, joint_values):
+        # The start pose is read when the move runs, so queued moves chain from wherever the previous one finished
+        trajectory = self._plan(joint_values)
+
+        start_transactions = self.pwm.getTransactionCount()
+        start_suppressed = self.pwm.shadow.channels_suppressed
+        frames = takewhile(lambda frame: not handle.cancelled(), trajectory.rows())
+        try:
+            self.last_move_statistics = self.scheduler.run(frames, self._write_frame)
+        finally:
+            self._save_pose()
+
+        print "Moved {0} steps using {1} I2C transactions, skipped {2} unchanged channel writes: {3}".format(
+            self.last_move_statistics.frames, self.pwm.getTransactionCount() - start_transactions,
+            self.pwm.shadow.channels_suppressed - start_suppressed, self.last_move_statistics)
+        return self.last_move_statistics
+
+    def _plan(self, joint_values):
+        """
+        :return: ProfiledTrajectory from the current pose to joint_values
+        """
+        current = self._joint_positions()
+        target = [joint_values.get(joint, current[joint.value]) for joint in Joints]
+        return ProfiledTrajectory(self.calibration, current, target, self.profile, self.limits, UPDATE_TIME_DELAY)
 
+    def _write_frame(self, frame):
+        """
+        Send one step of a trajectory.  Each step is a single frame covering every joint, ordered by channel to
+        match the Joints enum.
+        :param frame: (values, ticks) pair from Trajectory.rows
+        """
+        values, ticks = frame
+        self.pwm.setPWMFrame(Joints.WAIST.value, [(0, tick) for tick in ticks])
+        self._ticks = ticks
+        self._update_joint_positions(values)
 
-def _interpolate_gripper(percentage):
-    if percentage < 0:
-        percentage = 0
-    elif percentage > 100:
-        percentage = 100
+    def _save_pose(self):
+        """
+        Persist the pose last written, once a move has finished or stopped
+        """
+        if self.pose_store is not None and self._ticks is not None:
+            self.pose_store.save(self._joint_positions(), self._ticks, self.calibration.key)
 
-    return int(interp(percentage, [0, 100], [GRIPPER_MIN, GRIPPER_MAX]) / PULSE_LENGTH)
+    def _joint_positions(self):
+        """
+        :return: The current joint positions as a list indexed by PWM channel
+        """
+        return [self.waist_position, self.shoulder_position, self.elbow_position, self.wrist_position,
+                self.gripper_position]
+
+    def _update_joint_positions(self, values):
+        self.waist_position, self.shoulder_position, self.elbow_position, self.wrist_position, \
+            self.gripper_position = values
+        if self.state_bus is not None:
+            self.state_bus.publish_arm(values)
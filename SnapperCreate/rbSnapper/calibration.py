@@ -0,0 +1,221 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+import hashlib
+import json
+import os
+
+import numpy
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".rbSnapper")
+
+ARM_MIN = 600  # Minimum pulse width for the lower joints, fully counter-clockwise
+ARM_MAX = 2400  # Maximum pulse width for the lower joints, fully clockwise
+ARM_CENTER = 1500  # Pulse width for the zeroed position
+
+GRIPPER_MIN = 750  # Minimum pulse width for the gripper.  Very important that the gripper servo does NOT go below this or we risk breakage
+GRIPPER_MAX = 2400  # Maximum pulse width for the gripper.
+
+
+class JointCalibration(object):
+    """
+    Pulse widths, in microseconds, for a single servo and the range of commanded values they map to.
+
+    The low end of the range maps to min_pulse, the midpoint to center_pulse and the high end to max_pulse, with
+    linear interpolation in between.
+    """
+
+    def __init__(self, min_pulse, max_pulse, center_pulse=None, low=-90, high=90):
+        if low >= high:
+            raise RuntimeError("low must be less than high")
+        if center_pulse is None:
+            center_pulse = (min_pulse + max_pulse) / 2.0
+        self.min_pulse = min_pulse
+        self.max_pulse = max_pulse
+        self.center_pulse = center_pulse
+        self.low = low
+        self.high = high
+
+    def to_dict(self):
+        return {
+            "min": self.min_pulse,
+            "max": self.max_pulse,
+            "center": self.center_pulse,
+            "low": self.low,
+            "high": self.high,
+        }
+
+    @staticmethod
+    def from_dict(values):
+        return JointCalibration(values["min"], values["max"], values.get("center"),
+                                values.get("low", -90), values.get("high", 90))
+
+
+def default_joints():
+    """
+    The calibration used by the Snapper arm, ordered by PWM channel: waist, shoulder, elbow, wrist and gripper.
+    The gripper is commanded as an open percentage rather than in degrees.
+    """
+    return [
+        JointCalibration(ARM_MIN, ARM_MAX, ARM_CENTER),
+        JointCalibration(ARM_MIN, ARM_MAX, ARM_CENTER),
+        JointCalibration(ARM_MIN, ARM_MAX, ARM_CENTER),
+        JointCalibration(ARM_MIN, ARM_MAX, ARM_CENTER),
+        JointCalibration(GRIPPER_MIN, GRIPPER_MAX, low=0, high=100),
+    ]
+
+
+class Calibration(object):
+    """
+    Lookup tables that convert commanded joint values into PCA9685 ticks.
+
+    One table entry is built per integer value in each joint's range when the calibration is created, so converting
+    a value is a clamp and an index.  Tables are cached on disk, keyed by a hash of the calibration contents.
+    """
+
+    def __init__(self, joints=None, pwm_freq=50.0, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        :param joints: List of JointCalibration, indexed by PWM channel.  Defaults to default_joints()
+        :param pwm_freq: The PWM frequency, in Hz, that the servo driver runs at
+        :param cache_dir: Directory where tables are cached.  Pass None to disable the cache
+        """
+        self.joints = joints if joints is not None else default_joints()
+        self.pwm_freq = pwm_freq
+        self.pulse_length = 1000000.0 / pwm_freq / 4096
+        self.key = self._key()
+
+        tables = self._load(cache_dir)
+        if tables is None:
+            tables = self._build()
+            self._store(cache_dir, tables)
+
+        # Numpy tables for vectorised lookups, plain lists for fast scalar lookups
+        self.tables = tables
+        self._lists = [table.tolist() for table in tables]
+
+        # All tables joined end to end, so a steps x joints array converts with a single fancy index
+        self._flat = numpy.concatenate(tables)
+        lows = numpy.array([joint.low for joint in self.joints])
+        sizes = numpy.array([len(table) for table in tables])
+        self._lows = lows
+        self._highs = numpy.array([joint.high for joint in self.joints])
+        self._offsets = numpy.concatenate(([0], numpy.cumsum(sizes)[:-1])) - lows
+
+    def ticks(self, channel, value):
+        """
+        Convert a commanded value to a tick count
+        :param channel: The PWM channel of the joint
+        :param value: Degrees or percentage, clamped to the joint's range
+        :return: The OFF tick for the joint's PWM channel
+        """
+        joint = self.joints[channel]
+        if value < joint.low:
+            value = joint.low
+        elif value > joint.high:
+            value = joint.high
+        return self._lists[channel][int(value) - joint.low]
+
+    def ticks_array(self, values):
+        """
+        Convert an array of commanded values to tick counts
+        :param values: Array shaped steps x joints, with one column per PWM channel starting at channel 0
+        :return: Integer array of OFF ticks with the same shape
+        """
+        values = numpy.clip(values, self._lows, self._highs).astype(numpy.intp)
+        return self._flat[values + self._offsets]
+
+    def values(self, ticks):
+        """
+        Convert tick counts back to commanded values, the inverse of ticks
+        :param ticks: OFF ticks indexed by PWM channel, starting at channel 0
+        :return: List of the value whose ticks are closest to each, in degrees or percentage.  When several values
+                 share a tick count, the middle one is used.
+        """
+        values = []
+        for table, joint, tick in zip(self.tables, self.joints, ticks):
+            matches = numpy.flatnonzero(table == tick)
+            index = matches[len(matches) // 2] if len(matches) else numpy.abs(table - tick).argmin()
+            values.append(joint.low + int(index))
+        return values
+
+    def center_ticks(self, channel):
+        """
+        :return: The tick count for the joint's center pulse width
+        """
+        return int(self.joints[channel].center_pulse / self.pulse_length)
+
+    def to_dict(self):
+        return {"pwm_freq": self.pwm_freq, "joints": [joint.to_dict() for joint in self.joints]}
+
+    @staticmethod
+    def from_json(path, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        Load a calibration from a JSON file of the form produced by to_dict
+        """
+        with open(path) as infile:
+            values = json.load(infile)
+        return Calibration([JointCalibration.from_dict(joint) for joint in values["joints"]],
+                           values.get("pwm_freq", 50.0), cache_dir)
+
+    def _key(self):
+        contents = json.dumps(self.to_dict(), sort_keys=True)
+        return hashlib.sha1(contents.encode("utf-8")).hexdigest()
+
+    def _build(self):
+        tables = []
+        for joint in self.joints:
+            values = numpy.arange(joint.low, joint.high + 1)
+            pulses = numpy.interp(values, [joint.low, (joint.low + joint.high) / 2.0, joint.high],
+                                  [joint.min_pulse, joint.center_pulse, joint.max_pulse])
+            tables.append((pulses / self.pulse_length).astype(numpy.int32))
+        return tables
+
+    def _cache_path(self, cache_dir):
+        return os.path.join(cache_dir, "calibration-{0}.npz".format(self.key))
+
+    def _load(self, cache_dir):
+        if cache_dir is None:
+            return None
+        path = self._cache_path(cache_dir)
+        if not os.path.exists(path):
+            return None
+        try:
+            archive = numpy.load(path)
+            tables = [archive["arr_{0}".format(i)] for i in range(len(self.joints))]
+            archive.close()
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+
+        for table, joint in zip(tables, self.joints):
+            if len(table) != joint.high - joint.low + 1:
+                return None
+        return tables
+
+    def _store(self, cache_dir, tables):
+        if cache_dir is None:
+            return
+        path = self._cache_path(cache_dir)
+        temp_path = path + ".tmp"
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            with open(temp_path, "wb") as outfile:
+                numpy.savez(outfile, *tables)
+            os.rename(temp_path, path)
+        except (IOError, OSError) as err:
+            print "Unable to cache calibration tables: {0}".format(err)
@@ -0,0 +1,261 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Forward and inverse kinematics for the waist, shoulder, elbow and wrist of the Snapper arm.
+#
+# Coordinates are in millimetres with the origin on the mounting surface directly below the waist axis: x points
+# forward, y to the left and z up.  The waist turns the arm about z, positive to the left.  The shoulder, elbow and
+# wrist all bend in the same vertical plane.  The shoulder angle is measured from vertical, and the elbow and wrist
+# angles are measured from the link before them, all positive when bending forward.  Pitch is the angle of the
+# gripper from vertical, so 90 points the gripper straight ahead and 180 points it straight down.
+import math
+
+import numpy
+
+REFINE_CANDIDATES = 16  # Closest grid poses tried as starting points for the exact solution
+POSITION_TOLERANCE = 1.0  # Default distance, in millimetres, the gripper tip may miss an inverse target by
+PITCH_TOLERANCE = 1.0  # Default error, in degrees, allowed in a requested pitch
+
+
+class ArmGeometry(object):
+    """
+    Link lengths of the arm, in millimetres
+    """
+
+    def __init__(self, base_height=72.0, upper_arm=95.0, forearm=90.0, hand=80.0):
+        """
+        :param base_height: Height of the shoulder axis above the mounting surface
+        :param upper_arm: Shoulder axis to elbow axis
+        :param forearm: Elbow axis to wrist axis
+        :param hand: Wrist axis to the tip of the closed gripper
+        """
+        self.base_height = base_height
+        self.upper_arm = upper_arm
+        self.forearm = forearm
+        self.hand = hand
+
+
+class Kinematics(object):
+    """
+    Converts between joint angles and gripper positions.
+
+    Inverse kinematics looks up candidate poses in a precomputed grid of the arm's planar workspace, picks the one
+    closest to the current pose, and then solves for it exactly.  The grid is built on the first inverse call.
+    """
+
+    def __init__(self, geometry=None, joint_range=(-90, 90), resolution=3.0, cell_size=8.0):
+        """
+        :param geometry: ArmGeometry.  Defaults to the stock Snapper
+        :param joint_range: (low, high) limits of every joint, in degrees
+        :param resolution: Spacing of the workspace grid, in degrees
+        :param cell_size: Size of the square cells the workspace grid is bucketed into, in millimetres
+        """
+        self.geometry = geometry if geometry is not None else ArmGeometry()
+        self.joint_range = joint_range
+        self.resolution = resolution
+        self.cell_size = cell_size
+        self._grid = None
+
+    def forward(self, waist, shoulder, elbow, wrist):
+        """
+        :return: (x, y, z, pitch) of the gripper tip for the given joint angles, in degrees
+        """
+        position = self.forward_array(numpy.array([[waist, shoulder, elbow, wrist]], dtype=numpy.float64))[0]
+        return tuple(position.tolist())
+
+    def forward_array(self, angles):
+        """
+        Vectorised forward kinematics
+        :param angles: Array shaped poses x 4 of waist, shoulder, elbow and wrist angles, in degrees
+        :return: Array shaped poses x 4 of x, y, z and pitch
+        """
+        angles = numpy.asarray(angles, dtype=numpy.float64)
+        reach, height = self._planar(angles[:, 1], angles[:, 2], angles[:, 3])
+        waist = numpy.radians(angles[:, 0])
+        return numpy.column_stack((reach * numpy.cos(waist), reach * numpy.sin(waist), height,
+                                   angles[:, 1] + angles[:, 2] + angles[:, 3]))
+
+    def inverse(self, x, y, z, current=None, pitch=None, tolerance=POSITION_TOLERANCE,
+                pitch_tolerance=PITCH_TOLERANCE):
+        """
+        Find the joint angles that put the gripper tip at (x, y, z).  When no exact solution is within the joint
+        limits, the closest grid pose is used instead, which can miss by up to cell_size and resolution.
+        :param current: Current (waist, shoulder, elbow, wrist), used to choose the solution needing the least
+                        travel.  Defaults to all joints at 0
+        :param pitch: Required gripper pitch in degrees, or None to allow any pitch
+        :param tolerance: Furthest, in millimetres, the gripper tip may end up from the target, or None for no limit
+        :param pitch_tolerance: Largest error in degrees allowed in the pitch, or None for no limit
+        :return: (waist, shoulder, elbow, wrist) in degrees, or None if the target cannot be reached within the
+                 tolerances
+        """
+        grid = self._workspace()
+        current = numpy.asarray(current if current is not None else (0, 0, 0, 0), dtype=numpy.float64)
+        low, high = self.joint_range
+
+        solutions = self._waist_solutions(x, y)
+        costs = []
+        poses = []
+        branches = []
+        for branch, (waist, reach) in enumerate(solutions):
+            candidates = grid.lookup(reach, z)
+            if not len(candidates):
+                continue
+            candidate_poses, reaches, heights = candidates
+            keep = numpy.hypot(reaches - reach, heights - z) <= self.cell_size
+            if pitch is not None:
+                keep &= numpy.abs(candidate_poses.sum(axis=1) - pitch) <= self.resolution
+            candidate_poses = candidate_poses[keep]
+            costs.append(numpy.square(candidate_poses - current[1:]).sum(axis=1) + (waist - current[0]) ** 2)
+            poses.append(candidate_poses)
+            branches.append(numpy.full(len(candidate_poses), branch, dtype=numpy.int64))
+        if not costs:
+            return None
+        costs = numpy.concatenate(costs)
+        if not len(costs):
+            return None
+        poses = numpy.concatenate(poses)
+        branches = numpy.concatenate(branches)
+
+        # Solve exactly at the pitch and elbow direction of the closest grid poses.  A grid pose is only an
+        # approximation, so fall back to the closest one if none of the exact solutions stays within the joint limits.
+        order = costs.argsort()
+        tried = set()
+        for index in order:
+            pose = poses[index]
+            waist, reach = solutions[branches[index]]
+            target_pitch = pitch if pitch is not None else float(pose.sum())
+            key = (waist, target_pitch, pose[1] >= 0)
+            if key in tried:
+                continue
+            tried.add(key)
+            exact = self._solve_planar(reach, z, target_pitch, pose[1] >= 0)
+            if exact is not None and all(low <= angle <= high for angle in exact):
+                return (waist,) + exact
+            if len(tried) == REFINE_CANDIDATES:
+                break
+        waist, reach = solutions[branches[order[0]]]
+        closest = (waist,) + tuple(poses[order[0]].tolist())
+        reached_x, reached_y, reached_z, reached_pitch = self.forward(*closest)
+        if tolerance is not None and math.sqrt((reached_x - x) ** 2 + (reached_y - y) ** 2 +
+                                               (reached_z - z) ** 2) > tolerance:
+            return None
+        if pitch is not None and pitch_tolerance is not None and abs(reached_pitch - pitch) > pitch_tolerance:
+            return None
+        return closest
+
+    def _waist_solutions(self, x, y):
+        """
+        :return: List of (waist angle, signed planar reach) pairs within the waist range.  A target behind the arm is
+                 reached by leaning the arm backwards.
+        """
+        low, high = self.joint_range
+        angle = math.degrees(math.atan2(y, x))
+        reach = math.hypot(x, y)
+        solutions = []
+        for waist, signed in ((angle, reach), (angle - 180.0, -reach), (angle + 180.0, -reach)):
+            if low <= waist <= high:
+                solutions.append((waist, signed))
+        return solutions
+
+    def _planar(self, shoulder, elbow, wrist):
+        g = self.geometry
+        s = numpy.radians(shoulder)
+        e = s + numpy.radians(elbow)
+        w = e + numpy.radians(wrist)
+        reach = g.upper_arm * numpy.sin(s) + g.forearm * numpy.sin(e) + g.hand * numpy.sin(w)
+        height = g.base_height + g.upper_arm * numpy.cos(s) + g.forearm * numpy.cos(e) + g.hand * numpy.cos(w)
+        return reach, height
+
+    def _solve_planar(self, reach, z, pitch, positive_elbow):
+        """
+        Closed form solution of the shoulder and elbow for a fixed pitch
+        :return: (shoulder, elbow, wrist) in degrees, or None if there is no solution at this pitch
+        """
+        g = self.geometry
+        p = math.radians(pitch)
+        # Position of the wrist axis relative to the shoulder axis, with the first axis vertical
+        vertical = z - g.base_height - g.hand * math.cos(p)
+        horizontal = reach - g.hand * math.sin(p)
+        cosine = (vertical ** 2 + horizontal ** 2 - g.upper_arm ** 2 - g.forearm ** 2) / (2.0 * g.upper_arm * g.forearm)
+        if abs(cosine) > 1.0:
+            return None  # The wrist axis is out of reach at this pitch
+        elbow = math.acos(cosine)
+        if not positive_elbow:
+            elbow = -elbow
+        shoulder = math.atan2(horizontal, vertical) - math.atan2(g.forearm * math.sin(elbow),
+                                                                 g.upper_arm + g.forearm * math.cos(elbow))
+        shoulder = math.degrees(shoulder)
+        elbow = math.degrees(elbow)
+        return shoulder, elbow, pitch - shoulder - elbow
+
+    def _workspace(self):
+        if self._grid is None:
+            self._grid = WorkspaceGrid(self, self.joint_range, self.resolution, self.cell_size)
+        return self._grid
+
+
+class WorkspaceGrid(object):
+    """
+    Every combination of shoulder, elbow and wrist angle on a regular grid, bucketed by the planar position of the
+    gripper tip so the poses near a point can be found with an index calculation.
+    """
+
+    def __init__(self, kinematics, joint_range, resolution, cell_size):
+        low, high = joint_range
+        steps = numpy.arange(low, high + resolution / 2.0, resolution)
+        shoulder, elbow, wrist = [axis.ravel() for axis in numpy.meshgrid(steps, steps, steps, indexing="ij")]
+        reach, height = kinematics._planar(shoulder, elbow, wrist)
+
+        self.cell_size = cell_size
+        self.reach_origin = reach.min()
+        self.height_origin = height.min()
+        self.columns = int((height.max() - self.height_origin) // cell_size) + 1
+        self.rows = int((reach.max() - self.reach_origin) // cell_size) + 1
+
+        cells = self._cell(reach, height)
+        order = numpy.argsort(cells, kind="mergesort")
+        self.poses = numpy.column_stack((shoulder, elbow, wrist))[order].astype(numpy.float32)
+        self.reaches = reach[order].astype(numpy.float32)
+        self.heights = height[order].astype(numpy.float32)
+        # offsets[c]:offsets[c + 1] is the slice of poses that fall in cell c
+        self.offsets = numpy.searchsorted(cells[order], numpy.arange(self.rows * self.columns + 1))
+
+    def _cell(self, reach, height):
+        row = ((reach - self.reach_origin) // self.cell_size).astype(numpy.int64)
+        column = ((height - self.height_origin) // self.cell_size).astype(numpy.int64)
+        return row * self.columns + column
+
+    def lookup(self, reach, height):
+        """
+        :return: (poses, reaches, heights) arrays for the poses in the 3 x 3 block of cells around the point, or an
+                 empty tuple if the point is outside the workspace
+        """
+        row = int((reach - self.reach_origin) // self.cell_size)
+        column = int((height - self.height_origin) // self.cell_size)
+        if row < -1 or row > self.rows or column < -1 or column > self.columns:
+            return ()
+
+        slices = []
+        for r in range(max(row - 1, 0), min(row + 2, self.rows)):
+            first = r * self.columns + max(column - 1, 0)
+            last = r * self.columns + min(column + 1, self.columns - 1)
+            slices.append(slice(self.offsets[first], self.offsets[last + 1]))
+        if not slices:
+            return ()
+        index = numpy.concatenate([numpy.arange(s.start, s.stop) for s in slices])
+        return self.poses[index], self.reaches[index], self.heights[index]
@@ -0,0 +1,127 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+import threading
+import Queue
+
+
+class MotionHandle(object):
+    """
+    Tracks a single commanded move.  Returned by every Snapper motion command.
+    """
+
+    def __init__(self):
+        self._finished = threading.Event()
+        self._cancelled = False
+        self.result = None
+        self.error = None
+
+    def wait(self, timeout=None):
+        """
+        Block until the move has finished or been cancelled
+        :param timeout: Maximum time to wait, in seconds.  None waits indefinitely
+        :return: True if the move finished, False if the timeout expired first
+        """
+        self._finished.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self._finished.is_set()
+
+    def done(self):
+        """
+        :return: True once the move has finished, including moves that were cancelled
+        """
+        return self._finished.is_set()
+
+    def cancel(self):
+        """
+        Cancel the move.  A queued move never starts, and a running move stops after the frame in progress, leaving
+        the joints wherever they are.
+        :return: False if the move had already finished, else True
+        """
+        if self.done():
+            return False
+        self._cancelled = True
+        return True
+
+    def cancelled(self):
+        return self._cancelled
+
+    def _finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self._finished.set()
+
+
+class MotionExecutor(object):
+    """
+    Runs moves one at a time, in the order they were submitted, on a background thread.
+    """
+
+    def __init__(self):
+        self._queue = Queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="SnapperMotion")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, move, *args):
+        """
+        Queue a move
+        :param move: Callable invoked as move(handle, *args) on the motion thread.  Long running moves should check
+                     handle.cancelled() and return early when it is set.
+        :return: The MotionHandle for the move
+        """
+        handle = MotionHandle()
+        self._queue.put((handle, move, args))
+        return handle
+
+    def shutdown(self, wait=True):
+        """
+        Stop the motion thread once the moves already queued have run
+        """
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            handle, move, args = item
+            if handle.cancelled():
+                handle._finish()
+                continue
+            try:
+                handle._finish(move(handle, *args))
+            except Exception as err:
+                handle._finish(error=err)
+
+
+def run_now(move, *args):
+    """
+    Run a move on the calling thread, for blocking mode
+    :return: The finished MotionHandle
+    """
+    handle = MotionHandle()
+    try:
+        handle._finish(move(handle, *args))
+    except Exception as err:
+        handle._finish(error=err)
+        raise
+    return handle
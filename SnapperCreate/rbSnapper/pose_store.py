@@ -0,0 +1,80 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+import json
+import os
+
+from calibration import DEFAULT_CACHE_DIR
+
+DEFAULT_POSE_PATH = os.path.join(DEFAULT_CACHE_DIR, "pose.json")
+
+
+class PoseStore(object):
+    """
+    The arm's last commanded pose, kept in a small file so that a restart can carry on from it instead of jumping the
+    servos to their centres.
+
+    Each save writes a temporary file, forces it to disk and renames it over the previous one, so a crash or power cut
+    leaves either the old pose or the new one and never a partly written file.
+    """
+
+    def __init__(self, path=DEFAULT_POSE_PATH):
+        self.path = path
+        self.saves = 0
+
+    def load(self):
+        """
+        :return: Dictionary with the joint "values" and PWM "ticks", indexed by channel, and the "calibration" key they
+                 were commanded with.  None if nothing has been saved or the file cannot be read.
+        """
+        try:
+            with open(self.path) as infile:
+                pose = json.load(infile)
+            if len(pose["values"]) != len(pose["ticks"]):
+                return None
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+        return pose
+
+    def save(self, values, ticks, calibration_key):
+        """
+        :param values: Joint values, indexed by PWM channel
+        :param ticks: PWM OFF ticks last written for each joint
+        :param calibration_key: Calibration.key of the calibration that converted values into ticks
+        """
+        directory = os.path.dirname(self.path)
+        temp_path = self.path + ".tmp"
+        contents = json.dumps({"values": list(values), "ticks": list(ticks), "calibration": calibration_key})
+        try:
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(temp_path, "w") as outfile:
+                outfile.write(contents)
+                outfile.flush()
+                os.fsync(outfile.fileno())
+            os.rename(temp_path, self.path)
+            # The rename is only durable once the directory entry is on disk too
+            descriptor = os.open(directory or ".", os.O_RDONLY)
+            try:
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+        except (IOError, OSError) as err:
+            print "Unable to save the arm pose: {0}".format(err)
+            return
+        self.saves += 1
@@ -0,0 +1,221 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Velocity profiles for point to point joint moves.
+#
+# Every profile is symmetric: an acceleration phase of length Ta up to a peak velocity V, an optional cruise at V,
+# and a deceleration phase that mirrors the acceleration.  The trapezoidal profile accelerates at a constant rate;
+# the S-curve profile also limits jerk, so its acceleration phase ramps the acceleration up and back down.
+import math
+
+import numpy
+
+
+class JointLimits(object):
+    """
+    Motion limits for a single joint, in joint units (degrees, or percent for the gripper) per second
+    """
+
+    def __init__(self, velocity, acceleration, jerk=None):
+        if velocity <= 0 or acceleration <= 0 or (jerk is not None and jerk <= 0):
+            raise RuntimeError("Joint limits must be positive")
+        self.velocity = float(velocity)
+        self.acceleration = float(acceleration)
+        self.jerk = float(jerk) if jerk is not None else None
+
+
+def default_limits():
+    """
+    Limits for the stock Snapper servos, ordered by PWM channel: waist, shoulder, elbow, wrist and gripper
+    """
+    arm = JointLimits(velocity=250.0, acceleration=3000.0, jerk=60000.0)
+    return [arm, arm, arm, arm, JointLimits(velocity=300.0, acceleration=3000.0, jerk=60000.0)]
+
+
+class ProfileSegment(object):
+    """
+    A planned move of a single joint over a fixed duration
+    """
+
+    def __init__(self, distance, velocity, accel_time, jerk_time, duration):
+        """
+        :param distance: Signed travel
+        :param velocity: Peak speed
+        :param accel_time: Length of the acceleration phase, which the deceleration phase mirrors
+        :param jerk_time: Length of the jerk phases at each end of the acceleration phase.  0 for a trapezoid
+        :param duration: Total length of the move
+        """
+        self.distance = distance
+        self.velocity = velocity
+        self.accel_time = accel_time
+        self.jerk_time = jerk_time
+        self.duration = duration
+        # Peak acceleration: the velocity gained over the acceleration phase is peak * (Ta - Tj)
+        self._peak = velocity / (accel_time - jerk_time) if accel_time > jerk_time else 0.0
+
+    def positions(self, times):
+        """
+        :param times: Array of times since the start of the move
+        :return: Array of displacements from the start position at each time
+        """
+        times = numpy.clip(numpy.asarray(times, dtype=numpy.float64), 0.0, self.duration)
+        if self.distance == 0:
+            return numpy.zeros_like(times)
+
+        travel = abs(self.distance)
+        ta = self.accel_time
+        v = self.velocity
+        result = numpy.where(times <= ta, self._accelerating(times),
+                             numpy.where(times < self.duration - ta, v * ta / 2.0 + v * (times - ta),
+                                         travel - self._accelerating(self.duration - times)))
+        return math.copysign(1.0, self.distance) * result
+
+    def _accelerating(self, times):
+        """
+        Displacement during the acceleration phase, for times in [0, Ta]
+        """
+        times = numpy.clip(times, 0.0, self.accel_time)
+        tj = self.jerk_time
+        ta = self.accel_time
+        a = self._peak
+        v = self.velocity
+
+        # The acceleration phase is point symmetric about its middle: v(t) + v(Ta - t) == V
+        mirrored = numpy.where(times > ta - tj, ta - times, times)
+        ramp = a * mirrored ** 3 / (6.0 * tj) if tj > 0 else numpy.zeros_like(times)
+        constant = tj * tj * a / 6.0 + a * tj / 2.0 * (times - tj) + a * (times - tj) ** 2 / 2.0
+        rising = numpy.where(times <= tj, ramp, constant)
+        return numpy.where(times > ta - tj, v * times - v * ta / 2.0 + ramp, rising)
+
+
+class TrapezoidalProfile(object):
+    """
+    Constant acceleration up to the velocity limit, cruise, then constant deceleration
+    """
+
+    def duration(self, distance, limits):
+        """
+        :return: The minimum time, in seconds, to travel distance within limits
+        """
+        travel = abs(distance)
+        v = limits.velocity
+        a = limits.acceleration
+        if travel >= v * v / a:
+            return v / a + travel / v
+        return 2.0 * math.sqrt(travel / a)
+
+    def plan(self, distance, limits, duration):
+        """
+        Plan a move that takes exactly duration, which must be at least duration(distance, limits)
+        :return: ProfileSegment
+        """
+        travel = abs(distance)
+        if travel == 0:
+            return ProfileSegment(0, 0.0, 0.0, 0.0, duration)
+        a = limits.acceleration
+        # duration == V / a + travel / V, taking the slower root so V stays within the velocity limit
+        discriminant = max(a * a * duration * duration - 4.0 * a * travel, 0.0)
+        v = (a * duration - math.sqrt(discriminant)) / 2.0
+        return ProfileSegment(distance, v, v / a, 0.0, duration)
+
+
+class SCurveProfile(object):
+    """
+    Jerk limited acceleration and deceleration, giving smooth changes in acceleration at the ends of each phase.
+    Limits without a jerk value fall back to the trapezoidal profile.
+    """
+
+    def duration(self, distance, limits):
+        """
+        :return: The minimum time, in seconds, to travel distance within limits
+        """
+        travel = abs(distance)
+        if limits.jerk is None:
+            return TrapezoidalProfile().duration(distance, limits)
+        if travel == 0:
+            return 0.0
+        v = min(limits.velocity, self._reachable_velocity(travel, limits))
+        return self._accel_time(v, limits) + travel / v
+
+    def plan(self, distance, limits, duration):
+        """
+        Plan a move that takes exactly duration, which must be at least duration(distance, limits)
+        :return: ProfileSegment
+        """
+        travel = abs(distance)
+        if limits.jerk is None:
+            return TrapezoidalProfile().plan(distance, limits, duration)
+        if travel == 0:
+            return ProfileSegment(0, 0.0, 0.0, 0.0, duration)
+
+        # The move time, Ta(V) + travel / V, falls as the peak velocity rises, so bisect for the velocity that
+        # gives the requested duration
+        low = 0.0
+        high = min(limits.velocity, self._reachable_velocity(travel, limits))
+        for _ in range(60):
+            v = (low + high) / 2.0
+            if self._accel_time(v, limits) + travel / v > duration:
+                low = v
+            else:
+                high = v
+        v = high
+        accel_time = self._accel_time(v, limits)
+        return ProfileSegment(distance, v, accel_time, self._jerk_time(v, limits), duration)
+
+    @staticmethod
+    def _jerk_time(velocity, limits):
+        a = limits.acceleration
+        j = limits.jerk
+        if velocity * j >= a * a:
+            return a / j
+        return math.sqrt(velocity / j)  # The acceleration limit is never reached
+
+    @staticmethod
+    def _accel_time(velocity, limits):
+        a = limits.acceleration
+        j = limits.jerk
+        if velocity * j >= a * a:
+            return velocity / a + a / j
+        return 2.0 * math.sqrt(velocity / j)
+
+    @staticmethod
+    def _reachable_velocity(travel, limits):
+        """
+        :return: The peak velocity at which the acceleration and deceleration phases together cover travel
+        """
+        a = limits.acceleration
+        j = limits.jerk
+        # With the acceleration limit reached, travel == V * (V / a + a / j)
+        v = (-a * a / j + math.sqrt(a ** 4 / (j * j) + 4.0 * a * travel)) / 2.0
+        if v * j >= a * a:
+            return v
+        # Otherwise travel == V * 2 * sqrt(V / j)
+        return (travel * math.sqrt(j) / 2.0) ** (2.0 / 3.0)
+
+
+def synchronize(profile, distances, limits):
+    """
+    Plan a multi-joint move in which every joint starts and finishes together, in the least time that keeps every
+    joint within its limits
+    :param profile: TrapezoidalProfile or SCurveProfile
+    :param distances: Signed travel of each joint
+    :param limits: JointLimits for each joint
+    :return: List of ProfileSegment, one per joint
+    """
+    duration = max([profile.duration(distance, limit) for distance, limit in zip(distances, limits)] + [0.0])
+    return [profile.plan(distance, limit, duration) for distance, limit in zip(distances, limits)]
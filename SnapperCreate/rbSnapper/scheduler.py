@@ -0,0 +1,165 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+import ctypes
+import ctypes.util
+import math
+import os
+import sys
+import time
+
+CLOCK_MONOTONIC = 1  # Linux clock id for clock_gettime
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+def _monotonic_clock():
+    """
+    Python 3 has time.monotonic, which system time changes such as NTP adjustments don't move.  Python 2 doesn't, so
+    on Linux this calls clock_gettime(CLOCK_MONOTONIC) directly.  Anywhere else it falls back to time.time
+    :return: Function returning the time in seconds
+    """
+    if hasattr(time, "monotonic"):
+        return time.monotonic
+    if not sys.platform.startswith("linux"):
+        return time.time
+    try:
+        clock_gettime = ctypes.CDLL(ctypes.util.find_library("rt") or "librt.so.1", use_errno=True).clock_gettime
+    except (OSError, AttributeError):
+        return time.time
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+
+    def monotonic():
+        now = _Timespec()
+        if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(now)) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return now.tv_sec + now.tv_nsec * 1e-9
+    return monotonic
+
+
+class SystemClock(object):
+    """
+    The system's monotonic clock.  Clocks provide time(), in seconds, and sleep(seconds); anything with those two
+    methods can be passed where a clock is expected.
+    """
+    sleep = staticmethod(time.sleep)
+    time = staticmethod(_monotonic_clock())
+
+
+class FrameStatistics(object):
+    """
+    Timing of a single scheduled run.  Lateness is how long after its deadline a frame was issued.
+    """
+
+    def __init__(self, period, tolerance):
+        self.period = period
+        self.tolerance = tolerance
+        self.frames = 0
+        self.missed = 0  # Frames issued more than tolerance seconds after their deadline
+        self.max_lateness = 0.0
+        self.duration = 0.0
+        self._lateness_sum = 0.0
+        self._lateness_squares = 0.0
+
+    def record(self, lateness):
+        self.frames += 1
+        self._lateness_sum += lateness
+        self._lateness_squares += lateness * lateness
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+        if lateness > self.tolerance:
+            self.missed += 1
+
+    @property
+    def expected_duration(self):
+        return self.frames * self.period
+
+    @property
+    def mean_lateness(self):
+        return self._lateness_sum / self.frames if self.frames else 0.0
+
+    @property
+    def jitter(self):
+        """
+        :return: Standard deviation of the frame lateness, in seconds
+        """
+        if not self.frames:
+            return 0.0
+        variance = self._lateness_squares / self.frames - self.mean_lateness ** 2
+        return math.sqrt(max(variance, 0.0))
+
+    def __str__(self):
+        return ("{0} frames in {1:.3f}s (expected {2:.3f}s), {3} missed deadlines, "
+                "lateness mean {4:.2f}ms max {5:.2f}ms, jitter {6:.2f}ms").format(
+            self.frames, self.duration, self.expected_duration, self.missed, self.mean_lateness * 1000,
+            self.max_lateness * 1000, self.jitter * 1000)
+
+
+class FrameScheduler(object):
+    """
+    Issues frames at a fixed rate against absolute deadlines.
+
+    Frame k is due at start + k * period.  Time spent writing a frame comes out of the wait before the next one
+    rather than adding to it, so a run of n frames takes n * period however long each write takes.  A frame that
+    is late is issued immediately and the following deadlines are unchanged, so the run catches back up.  A deadline
+    more than two periods away means the clock stepped back, which only time.time does, and the schedule restarts from
+    the current time rather than waiting out the step.
+    """
+
+    def __init__(self, period, clock=None, tolerance=None):
+        """
+        :param period: Seconds between frames
+        :param clock: Clock providing time() and sleep().  Defaults to SystemClock
+        :param tolerance: Lateness, in seconds, beyond which a frame counts as a missed deadline.  Defaults to
+                          half a period
+        """
+        self.period = period
+        self.clock = clock if clock is not None else SystemClock()
+        self.tolerance = tolerance if tolerance is not None else period / 2.0
+
+    def run(self, frames, write):
+        """
+        Call write(frame) for each frame on schedule, then hold the last frame for a full period
+        :param frames: Iterable of frames
+        :param write: Callable that transmits a single frame
+        :return: FrameStatistics for the run
+        """
+        clock = self.clock
+        statistics = FrameStatistics(self.period, self.tolerance)
+        start = clock.time()
+        deadline = start
+
+        for frame in frames:
+            now = clock.time()
+            if deadline - now > 2 * self.period:
+                deadline = now
+            if now < deadline:
+                clock.sleep(deadline - now)
+                now = clock.time()
+            statistics.record(max(now - deadline, 0.0))
+            write(frame)
+            deadline += self.period
+
+        now = clock.time()
+        if now < deadline:
+            clock.sleep(min(deadline - now, self.period))
+        statistics.duration = clock.time() - start
+        return statistics
@@ -0,0 +1,130 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+CHANNELS = 16  # Output channels on a PCA9685
+BYTES_PER_CHANNEL = 4  # LEDn_ON_L, LEDn_ON_H, LEDn_OFF_L, LEDn_OFF_H
+
+# Unchanged bytes between two changed runs are resent, rather than starting a new transaction, when the gap is this
+# small.  Each transaction costs the address and register bytes, start and stop conditions and a system call, which
+# together take about as long as sending a whole channel.
+MERGE_GAP = 4
+
+
+def encode(on, off):
+    return [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
+
+
+class ShadowRegisters(object):
+    """
+    A copy of the LEDn_ON/OFF registers last written to a PCA9685, used to send only the bytes that change.
+
+    Register values start out unknown, so the first write to each channel is always sent in full.  After anything
+    that changes the chip's registers behind our back, such as a software reset or power cycle, call invalidate().
+    """
+
+    def __init__(self):
+        self._registers = [None] * (CHANNELS * BYTES_PER_CHANNEL)  # None marks an unknown register value
+        self.channels_transmitted = 0  # Channel writes that needed at least one byte sent
+        self.channels_suppressed = 0  # Channel writes that matched the chip and were skipped
+        self.bytes_transmitted = 0
+        self.bytes_suppressed = 0
+
+    def update(self, channel, values):
+        """
+        Record a write of consecutive channels and work out which register bytes need to be sent
+        :param channel: The first channel written
+        :param values: List of (on, off) pairs, one per channel
+        :return: List of (offset, data) runs, where offset is the byte offset from LED0_ON_L
+        """
+        first = channel * BYTES_PER_CHANNEL
+        data = []
+        for on, off in values:
+            data.extend(encode(on, off))
+
+        registers = self._registers
+        runs = []
+        run_start = None
+        run_end = None
+        for index, value in enumerate(data):
+            if index % BYTES_PER_CHANNEL == 0:
+                channel_changed = False
+            offset = first + index
+            if registers[offset] != value:
+                if run_start is None:
+                    run_start = offset
+                elif offset - run_end > MERGE_GAP + 1:
+                    runs.append((run_start, run_end))
+                    run_start = offset
+                run_end = offset
+                registers[offset] = value
+                channel_changed = True
+            if index % BYTES_PER_CHANNEL == BYTES_PER_CHANNEL - 1:
+                if channel_changed:
+                    self.channels_transmitted += 1
+                else:
+                    self.channels_suppressed += 1
+        if run_start is not None:
+            runs.append((run_start, run_end))
+
+        sent = sum(end - start + 1 for start, end in runs)
+        self.bytes_transmitted += sent
+        self.bytes_suppressed += len(data) - sent
+        return [(start, registers[start:end + 1]) for start, end in runs]
+
+    def load(self, channel, data):
+        """
+        Record register values read back from the chip, without counting them as writes
+        :param channel: The first channel read
+        :param data: Register bytes from LEDn_ON_L of that channel on
+        """
+        first = channel * BYTES_PER_CHANNEL
+        self._registers[first:first + len(data)] = list(data)
+
+    def set_all(self, on, off):
+        """
+        Record a write to the ALL_LED registers, which sets every channel at once
+        """
+        self._registers = encode(on, off) * CHANNELS
+
+    def forget(self, offset, count):
+        """
+        Mark registers unknown, such as after a write to them failed, so they are sent again next time
+        :param offset: Byte offset from LED0_ON_L
+        :param count: Number of registers
+        """
+        self._registers[offset:offset + count] = [None] * count
+
+    def invalidate(self):
+        """
+        Forget every register value, so the next write to each channel is sent in full
+        """
+        self._registers = [None] * (CHANNELS * BYTES_PER_CHANNEL)
+
+    def known_runs(self):
+        """
+        :return: List of (offset, data) runs covering every register with a known value, for resending
+        """
+        runs = []
+        run_start = None
+        for offset, value in enumerate(self._registers + [None]):
+            if value is not None and run_start is None:
+                run_start = offset
+            elif value is None and run_start is not None:
+                runs.append((run_start, self._registers[run_start:offset]))
+                run_start = None
+        return runs
@@ -0,0 +1,128 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+import math
+
+import numpy
+
+from profiles import synchronize
+
+DEFAULT_CHUNK_SIZE = 256  # Steps generated at a time when streaming a trajectory
+
+
+class Trajectory(object):
+    """
+    A synchronised multi-joint move, where every joint travels in a straight line from its start to its target and
+    all joints arrive together.
+
+    The move has one step per unit of travel of the joint that moves furthest.  Step k, for k in [1, steps], places
+    each joint at start + (target - start) * k / steps, so the start pose is not repeated and the last step lands
+    exactly on the target.
+    """
+
+    def __init__(self, calibration, start, target):
+        """
+        :param calibration: The Calibration used to convert joint values into ticks
+        :param start: Sequence of current joint values, indexed by PWM channel
+        :param target: Sequence of target joint values, indexed by PWM channel
+        """
+        self.calibration = calibration
+        self.start = numpy.asarray(start, dtype=numpy.float64)
+        self.target = numpy.asarray(target, dtype=numpy.float64)
+        self._delta = self.target - self.start
+        self.steps = int(numpy.abs(self._delta).max()) if len(self._delta) else 0
+
+    def __len__(self):
+        return self.steps
+
+    def values(self, first=0, last=None):
+        """
+        Joint values for steps [first, last) of the move
+        :return: Integer array shaped steps x joints
+        """
+        if last is None:
+            last = self.steps
+        if self.steps == 0 or last <= first:
+            return numpy.empty((0, len(self.start)), dtype=numpy.int64)
+        return numpy.rint(self.start + self._displacements(first, last)).astype(numpy.int64)
+
+    def _displacements(self, first, last):
+        """
+        :return: Float array, shaped steps x joints, of the travel from the start pose at steps [first, last)
+        """
+        fractions = numpy.arange(first + 1, last + 1, dtype=numpy.float64) / self.steps
+        return numpy.outer(fractions, self._delta)
+
+    def ticks(self, first=0, last=None):
+        """
+        PWM OFF ticks for steps [first, last) of the move
+        :return: Integer array shaped steps x joints
+        """
+        return self.calibration.ticks_array(self.values(first, last))
+
+    def chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Generate the move in blocks of at most chunk_size steps, so long moves are never held in memory at once
+        :return: Generator of (values, ticks) array pairs
+        """
+        for first in range(0, self.steps, chunk_size):
+            values = self.values(first, min(first + chunk_size, self.steps))
+            yield values, self.calibration.ticks_array(values)
+
+    def rows(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Generate the move one step at a time, computing it chunk_size steps at a time
+        :return: Generator of (values, ticks) list pairs
+        """
+        for values, ticks in self.chunks(chunk_size):
+            for row in zip(values.tolist(), ticks.tolist()):
+                yield row
+
+
+def frame_count(duration, period):
+    """
+    :return: The number of update periods needed to cover duration
+    """
+    # Allow for rounding error so a duration of exactly n periods is n frames
+    return int(math.ceil(duration / period - 1e-9))
+
+
+class ProfiledTrajectory(Trajectory):
+    """
+    A synchronised multi-joint move that follows a velocity profile, sampled once per update period.
+
+    Every joint follows its own profile, planned so that all joints start and finish together in the least time
+    their limits allow.  Step k, for k in [1, steps], is the pose k periods after the start, and the last step lands
+    exactly on the target.
+    """
+
+    def __init__(self, calibration, start, target, profile, limits, period):
+        """
+        :param profile: TrapezoidalProfile or SCurveProfile
+        :param limits: List of JointLimits, indexed by PWM channel
+        :param period: Time between steps, in seconds
+        """
+        super(ProfiledTrajectory, self).__init__(calibration, start, target)
+        self.period = period
+        self.segments = synchronize(profile, self._delta.tolist(), limits)
+        self.duration = self.segments[0].duration if self.segments else 0.0
+        self.steps = frame_count(self.duration, period)
+
+    def _displacements(self, first, last):
+        times = numpy.arange(first + 1, last + 1, dtype=numpy.float64) * self.period
+        return numpy.column_stack([segment.positions(times) for segment in self.segments])
@@ -0,0 +1,5 @@
+from log import LogReader
+from log import TrafficLog
+from replay import replay
+from transports import RecordingBus
+from transports import RecordingSerial
@@ -0,0 +1,246 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# A compact binary log of everything sent to and received from the robot's devices.
+#
+# The file starts with an 8 byte header, MAGIC and the format VERSION, followed by frames.  Every frame is a 12 byte
+# FRAME header, the time from the log's clock, a channel number, a kind and a payload length, followed by the
+# payload.  Each device recorded is a channel, announced by a CHANNEL frame carrying its name before its first
+# traffic.  Frames are only ever appended, so a run that dies part way through loses at most the unflushed tail, and
+# a partly written last frame is ignored when the log is read.
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+MAGIC = "RBLOG\x00"
+VERSION = 1
+HEADER = struct.Struct("<6sH")
+FRAME = struct.Struct("<dBBH")  # time, channel, kind, payload length
+MAX_PAYLOAD = 0xFFFF  # Longer payloads are split across frames
+FLUSH_INTERVAL = 1.0  # Longest time, in seconds of the log's clock, that frames are buffered before being written
+INDEX_STRIDE = 1024  # Frames between entries of the reader's time index
+
+# Frame kinds
+CHANNEL = 0  # Payload is the channel's name
+SERIAL_WRITE = 1  # Payload is the bytes written to the port
+SERIAL_READ = 2  # Payload is the bytes read from the port
+SERIAL_BAUD = 3  # Payload is the port's new baud rate, as a little endian uint32
+# I2C payloads are the device address, then the register, then the data bytes written or read.  write_byte has no
+# register, so its payload is the address and the value.
+I2C_WRITE_BYTE = 16
+I2C_WRITE_BYTE_DATA = 17
+I2C_WRITE_WORD_DATA = 18
+I2C_WRITE_BLOCK = 19
+I2C_READ_BYTE_DATA = 20
+I2C_READ_WORD_DATA = 21
+I2C_READ_BLOCK = 22
+
+BAUD = struct.Struct("<I")
+WORD = struct.Struct("<H")
+
+Frame = namedtuple("Frame", "time channel kind data")
+
+
+class TrafficLog(object):
+    """
+    Writes a traffic log.  Wrap each device with serial() or bus() and use the wrapper in its place.
+    """
+
+    def __init__(self, path, clock=None):
+        """
+        :param path: File to write.  An existing file is replaced
+        :param clock: Object providing time(), which timestamps the frames.  Defaults to the time module
+        """
+        self.path = path
+        self.clock = clock if clock is not None else time
+        self.frames = 0
+        self.bytes_logged = 0
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._channels = {}  # Name to channel number
+        self._lock = threading.Lock()  # Devices are used from several threads
+        self._flushed = self.clock.time()
+
+    def channel(self, name):
+        """
+        :return: The channel number for name, announcing it in the log the first time it is used
+        """
+        with self._lock:
+            number = self._channels.get(name)
+            if number is None:
+                if len(self._channels) > 0xFF:
+                    raise RuntimeError("A traffic log holds at most 256 channels")
+                number = len(self._channels)
+                self._channels[name] = number
+                self._write(number, CHANNEL, name)
+            return number
+
+    def record(self, channel, kind, data):
+        """
+        Append a frame, timestamped now
+        :param data: Payload, as a str or bytearray
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            self._write(channel, kind, data)
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._flushed = self.clock.time()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def serial(self, connection, name="create"):
+        """
+        :return: connection wrapped so that everything written to and read from it is recorded
+        """
+        from transports import RecordingSerial
+        return RecordingSerial(connection, self, name)
+
+    def bus(self, bus, name="i2c"):
+        """
+        :return: An SMBus compatible bus wrapped so that every transaction on it is recorded
+        """
+        from transports import RecordingBus
+        return RecordingBus(bus, self, name)
+
+    def _write(self, channel, kind, data):
+        now = self.clock.time()
+        for start in range(0, max(len(data), 1), MAX_PAYLOAD):
+            chunk = data[start:start + MAX_PAYLOAD]
+            self._file.write(FRAME.pack(now, channel, kind, len(chunk)))
+            self._file.write(bytes(chunk))
+            self.frames += 1
+            self.bytes_logged += FRAME.size + len(chunk)
+        if now - self._flushed >= FLUSH_INTERVAL:
+            self._file.flush()
+            self._flushed = now
+
+
+class LogReader(object):
+    """
+    Reads a traffic log through a memory map, so logs of any length can be searched without reading them into
+    memory.  Opening the log scans the frame headers once to find the channels and build a sparse time index.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size < HEADER.size:
+            self._file.close()
+            raise RuntimeError("{0} is not a traffic log".format(path))
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise RuntimeError("{0} is not a version {1} traffic log".format(path, VERSION))
+
+        self.channels = {}  # Channel number to name
+        self.frame_count = 0
+        self.start_time = None
+        self.end_time = None
+        self.truncated = False  # True if the last frame was only partly written
+        self._index_times = array("d")  # Time of every INDEX_STRIDE'th frame
+        self._index_offsets = array("L")  # and its offset in the file
+        self._end = HEADER.size  # Offset just past the last whole frame
+        self._scan()
+
+    def __len__(self):
+        return self.frame_count
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def channel(self, name):
+        """
+        :return: The channel number recorded under name
+        """
+        for number, channel_name in self.channels.items():
+            if channel_name == name:
+                return number
+        raise RuntimeError("{0} has no channel named {1}".format(self.path, name))
+
+    def frames(self, start=None, end=None, channels=None, kinds=None):
+        """
+        Generate the frames in order, reading each from the map only when it is reached
+        :param start: Earliest time to include, found through the time index rather than by reading every frame
+        :param end: Latest time to include
+        :param channels: Channel names to include, or None for all of them
+        :param kinds: Frame kinds to include, or None for all of them.  CHANNEL frames are never included
+        :return: Generator of Frame
+        """
+        numbers = None if channels is None else set(self.channel(name) for name in channels)
+        offset = HEADER.size
+        if start is not None and self._index_times:
+            # Frames can share a time, so start from the index entry before the first one at start
+            position = bisect.bisect_left(self._index_times, start)
+            offset = self._index_offsets[max(position - 1, 0)]
+        unpack = FRAME.unpack_from
+        data = self._map
+        while offset < self._end:
+            when, channel, kind, length = unpack(data, offset)
+            payload = offset + FRAME.size
+            offset = payload + length
+            if start is not None and when < start:
+                continue
+            if end is not None and when > end:
+                return
+            if kind == CHANNEL or (numbers is not None and channel not in numbers):
+                continue
+            if kinds is not None and kind not in kinds:
+                continue
+            yield Frame(when, channel, kind, data[payload:offset])
+
+    def _scan(self):
+        unpack = FRAME.unpack_from
+        data = self._map
+        size = len(data)
+        offset = HEADER.size
+        count = 0
+        when = None
+        while offset + FRAME.size <= size:
+            when, channel, kind, length = unpack(data, offset)
+            if offset + FRAME.size + length > size:
+                break
+            if count % INDEX_STRIDE == 0:
+                self._index_times.append(when)
+                self._index_offsets.append(offset)
+            if kind == CHANNEL:
+                self.channels[channel] = data[offset + FRAME.size:offset + FRAME.size + length]
+            else:
+                if self.start_time is None:
+                    self.start_time = when
+                self.end_time = when
+            count += 1
+            offset += FRAME.size + length
+        self.truncated = offset != size
+        self._end = offset
+        self.frame_count = count
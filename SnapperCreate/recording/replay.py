@@ -0,0 +1,93 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Replays a traffic log into the mock devices.  Every recorded write is fed to the device standing in for its channel
+# at the time it was recorded, so a SimulatedCreate and SimulatedPCA9685 on a VirtualClock go through the same states
+# as the real hardware did.  Reads are not replayed, since the simulated devices answer for themselves, but I2C reads
+# are repeated and compared with what the hardware returned.
+import log
+
+
+class ReplayStatistics(object):
+    def __init__(self):
+        self.frames = 0  # Frames fed to a device
+        self.skipped = 0  # Frames for channels with no device
+        self.mismatches = 0  # I2C reads where the device returned something other than the recording
+        self.first_mismatch = None  # Frame of the first mismatch
+
+
+def replay(reader, devices, clock, start=None, end=None):
+    """
+    Feed the recorded writes to devices, sleeping on clock until each one is due
+    :param reader: LogReader
+    :param devices: Dictionary of channel name to device: a serial-like object, such as SimulatedCreate, for serial
+                    channels or an SMBus compatible bus, such as SimulatedPCA9685, for I2C channels
+    :param clock: Clock providing time() and sleep(), normally a VirtualClock started at reader.start_time
+    :param start: Earliest recorded time to replay
+    :param end: Latest recorded time to replay
+    :return: ReplayStatistics
+    """
+    statistics = ReplayStatistics()
+    targets = {}
+    for number, name in reader.channels.items():
+        targets[number] = devices.get(name)
+
+    for frame in reader.frames(start, end):
+        device = targets.get(frame.channel)
+        if device is None:
+            statistics.skipped += 1
+            continue
+        if frame.time > clock.time():
+            clock.sleep(frame.time - clock.time())
+        statistics.frames += 1
+        if _apply(device, frame) is False:
+            statistics.mismatches += 1
+            if statistics.first_mismatch is None:
+                statistics.first_mismatch = frame
+    return statistics
+
+
+def _apply(device, frame):
+    """
+    :return: False if an I2C read did not match the recording
+    """
+    kind = frame.kind
+    data = bytearray(frame.data)
+    if kind == log.SERIAL_WRITE:
+        device.write(frame.data)
+    elif kind == log.SERIAL_READ:
+        waiting = device.in_waiting
+        if waiting:
+            device.read(waiting)  # Keep the device's output from piling up
+    elif kind == log.SERIAL_BAUD:
+        device.baudrate = log.BAUD.unpack(frame.data)[0]
+    elif kind == log.I2C_WRITE_BYTE:
+        device.write_byte(data[0], data[1])
+    elif kind == log.I2C_WRITE_BYTE_DATA:
+        device.write_byte_data(data[0], data[1], data[2])
+    elif kind == log.I2C_WRITE_BLOCK:
+        device.write_i2c_block_data(data[0], data[1], list(data[2:]))
+    elif kind == log.I2C_WRITE_WORD_DATA:
+        device.write_word_data(data[0], data[1], log.WORD.unpack(frame.data[2:4])[0])
+    elif kind == log.I2C_READ_BYTE_DATA:
+        return device.read_byte_data(data[0], data[1]) == data[2]
+    elif kind == log.I2C_READ_WORD_DATA:
+        return device.read_word_data(data[0], data[1]) == log.WORD.unpack(frame.data[2:4])[0]
+    elif kind == log.I2C_READ_BLOCK:
+        return list(device.read_i2c_block_data(data[0], data[1], len(data) - 2)) == list(data[2:])
+    return True
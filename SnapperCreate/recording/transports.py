@@ -0,0 +1,122 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# Stand-ins for the serial port and the I2C bus that pass everything through to the real device and record it in a
+# TrafficLog.  Get them from TrafficLog.serial and TrafficLog.bus.
+import struct
+
+import log
+
+
+class RecordingSerial(object):
+    """
+    Wraps a serial port, recording every write, every non-empty read and every baud rate change.
+
+    The wrapper has no file descriptor, so an AsyncCreate polls it rather than selecting on the port, which keeps
+    every byte passing through the recorder.
+    """
+
+    def __init__(self, connection, traffic_log, name):
+        self.__dict__["connection"] = connection
+        self.__dict__["log"] = traffic_log
+        self.__dict__["channel"] = traffic_log.channel(name)
+
+    def write(self, data):
+        written = self.connection.write(data)
+        self.log.record(self.channel, log.SERIAL_WRITE, data)
+        return written
+
+    def read(self, size=1):
+        data = self.connection.read(size)
+        if data:
+            self.log.record(self.channel, log.SERIAL_READ, data)
+        return data
+
+    def readinto(self, buffer):
+        count = self.connection.readinto(buffer)
+        if count:
+            self.log.record(self.channel, log.SERIAL_READ, memoryview(buffer)[:count].tobytes())
+        return count
+
+    @property
+    def baudrate(self):
+        return self.connection.baudrate
+
+    @baudrate.setter
+    def baudrate(self, value):
+        self.connection.baudrate = value
+        self.log.record(self.channel, log.SERIAL_BAUD, log.BAUD.pack(value))
+
+    def __getattr__(self, name):
+        if name == "fileno":
+            raise AttributeError("A recorded port has no file descriptor")
+        return getattr(self.connection, name)
+
+    def __setattr__(self, name, value):
+        if name == "baudrate":
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.connection, name, value)
+
+
+class RecordingBus(object):
+    """
+    Wraps an SMBus compatible bus, recording every transaction that succeeds
+    """
+
+    def __init__(self, bus, traffic_log, name):
+        self.bus = bus
+        self.log = traffic_log
+        self.channel = traffic_log.channel(name)
+
+    def write_byte(self, address, value):
+        self.bus.write_byte(address, value)
+        self._record(log.I2C_WRITE_BYTE, address, value)
+
+    def write_byte_data(self, address, register, value):
+        self.bus.write_byte_data(address, register, value)
+        self._record(log.I2C_WRITE_BYTE_DATA, address, register, value)
+
+    def write_word_data(self, address, register, value):
+        self.bus.write_word_data(address, register, value)
+        self._record(log.I2C_WRITE_WORD_DATA, address, register, *bytearray(log.WORD.pack(value)))
+
+    def write_i2c_block_data(self, address, register, data):
+        self.bus.write_i2c_block_data(address, register, data)
+        self._record(log.I2C_WRITE_BLOCK, address, register, *data)
+
+    def read_byte_data(self, address, register):
+        value = self.bus.read_byte_data(address, register)
+        self._record(log.I2C_READ_BYTE_DATA, address, register, value)
+        return value
+
+    def read_word_data(self, address, register):
+        value = self.bus.read_word_data(address, register)
+        self._record(log.I2C_READ_WORD_DATA, address, register, *bytearray(log.WORD.pack(value)))
+        return value
+
+    def read_i2c_block_data(self, address, register, length=32):
+        data = self.bus.read_i2c_block_data(address, register, length)
+        self._record(log.I2C_READ_BLOCK, address, register, *data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.bus, name)
+
+    def _record(self, kind, *values):
+        self.log.record(self.channel, kind, struct.pack("{0}B".format(len(values)), *values))
@@ -0,0 +1,6 @@
+from clock import Event
+from clock import Timeline
+from clock import VirtualClock
+from create2 import SimulatedCreate
+from pca9685 import SimulatedPCA9685
+from simulator import Simulation
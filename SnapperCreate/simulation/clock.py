@@ -0,0 +1,100 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+import threading
+from collections import namedtuple
+
+Event = namedtuple("Event", "time source name state")
+
+
+class Timeline(object):
+    """
+    Every state change of the simulated hardware, in the order it happened
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def record(self, time, source, name, state):
+        """
+        :param time: Virtual time of the change, in seconds
+        :param source: The device that changed, e.g. "create" or "pca9685"
+        :param name: What happened, e.g. "drive" or "pwm"
+        :param state: Dictionary describing the device after the change
+        """
+        self.events.append(Event(time, source, name, state))
+
+    def select(self, source=None, name=None):
+        """
+        :return: List of the events matching source and name, either of which may be None to match anything
+        """
+        return [event for event in self.events
+                if (source is None or event.source == source) and (name is None or event.name == name)]
+
+    def last(self, source=None, name=None):
+        """
+        :return: The most recent matching event, or None if there is none
+        """
+        for event in reversed(self.events):
+            if (source is None or event.source == source) and (name is None or event.name == name):
+                return event
+        return None
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.events)
+
+
+class VirtualClock(object):
+    """
+    A clock whose time only moves when someone sleeps.  sleep() returns immediately after advancing the time, so
+    code paced by the clock runs as fast as it can compute while seeing exactly the timing it asked for.
+
+    Every sleep advances the one shared time, so the clock suits code that runs on a single thread.  Two threads
+    sleeping at once would each push the time forward, and together they would see it run too fast.
+    """
+
+    def __init__(self, start=0.0, timeline=None):
+        """
+        :param start: Initial time, in seconds
+        :param timeline: Timeline the simulated devices record into.  Defaults to a new, empty one
+        """
+        self._now = float(start)
+        self._lock = threading.Lock()
+        self.timeline = timeline if timeline is not None else Timeline()
+        self.sleeps = 0  # Number of calls to sleep
+        self.slept = 0.0  # Total time slept, in seconds
+
+    def time(self):
+        return self._now
+
+    def sleep(self, seconds):
+        if seconds < 0:
+            raise RuntimeError("Cannot sleep for a negative time")
+        with self._lock:
+            self._now += seconds
+            self.sleeps += 1
+            self.slept += seconds
+
+    def record(self, source, name, **state):
+        """
+        Add an event to the timeline at the current time
+        """
+        self.timeline.record(self._now, source, name, state)
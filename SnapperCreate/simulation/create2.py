@@ -0,0 +1,430 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# An iRobot Create 2 on the other end of a serial connection.
+#
+# Commands written to the port are decoded as Open Interface opcodes and drive a differential drive model of the
+# robot.  Between commands the wheel speeds are constant, so the robot follows a straight line or an arc and its
+# pose is integrated exactly, whenever a command arrives or the pose is asked for.  The pose starts at the origin
+# facing along x, with y to the robot's left and the heading in degrees counterclockwise.  The wheels accelerate
+# toward their requested speeds at a limited rate, so the robot takes a little time and distance to stop.
+#
+# A requested sensor stream is generated frame by frame as the virtual time passes each 15ms period, and queued for
+# reading like bytes arriving on a real port.
+#
+# The robot talks at the rate set by its last Baud command.  While the port's baudrate differs from it, bytes in both
+# directions are lost.  Above max_baudrate the robot's replies are lost, like a marginal cable or adapter, though
+# commands still get through.
+import math
+import struct
+import threading
+import time
+
+import serial
+
+from rbCreate import commands
+from rbCreate import sensors
+from rbCreate.odometry import MM_PER_COUNT
+from rbCreate.stream import STREAM_PERIOD
+from rbCreate.stream_parser import STREAM_HEADER
+from rbCreate.testing.mock_serial import MockSerial
+
+WHEEL_BASE = 235.0  # Distance between the drive wheels, in mm
+MAX_VELOCITY = 500  # mm/s
+STRAIGHT_RADII = (32767, -32768)
+COUNTS_PER_MM = 1.0 / MM_PER_COUNT
+ACCELERATION = 1000.0  # Rate at which the wheels change speed, in mm/s^2
+RAMP_STEP = 0.001  # Integration step while a wheel is changing speed, in seconds
+INPUT_BUFFER = 4096  # Bytes the port holds before the oldest unread ones are lost
+READ_WAIT = 0.001  # Real seconds a read waits when there is nothing to read
+BITS_PER_BYTE = 10  # 8N1 framing adds a start and a stop bit to every byte
+BAUD_RATES = dict((int(code), rate) for rate, code in commands.BAUD_CODES.items())  # Rate of each baud code
+MODES = ["off", "passive", "safe", "full"]  # Indexed by the OI mode sensor value
+
+START = int(commands.STATE_START)
+RESET = int(commands.STATE_RESET)
+STOP = int(commands.STATE_STOP)
+SAFE = int(commands.MODE_SAFE)
+FULL = int(commands.MODE_FULL)
+BAUD = int(commands.BAUD)
+DOCK = int(commands.RETURN_TO_DOCK)
+DRIVE = int(commands.DRIVE)
+DRIVE_DIRECT = int(commands.DRIVE_DIRECT)
+STREAM = int(commands.STREAM)
+QUERY_LIST = int(commands.QUERY_LIST)
+PAUSE_RESUME_STREAM = int(commands.PAUSE_RESUME_STREAM)
+
+# Number of data bytes that follow each opcode
+DATA_LENGTHS = {
+    START: 0,
+    RESET: 0,
+    STOP: 0,
+    SAFE: 0,
+    FULL: 0,
+    BAUD: 1,
+    DOCK: 0,
+    DRIVE: 4,
+    DRIVE_DIRECT: 4,
+    PAUSE_RESUME_STREAM: 1,
+}  # STREAM and QUERY_LIST have a variable length, given by their first data byte
+
+
+def _signed16(high, low):
+    value = (high << 8) | low
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _wrap16(value):
+    return (value + 0x8000) % 0x10000 - 0x8000
+
+
+class SimulatedCreate(MockSerial):
+    """
+    A serial port with a simulated Create 2 behind it.  Pass it to Create.connect as the connection.
+
+    Like the robot, it starts switched off and ignores everything but Start until it has been started, and it only
+    drives in Safe or Full mode.
+    """
+
+    def __init__(self, clock, wheel_base=WHEEL_BASE, acceleration=ACCELERATION, wire_time=False,
+                 max_baudrate=None):
+        """
+        :param clock: VirtualClock that times the robot's motion and timestamps the timeline events
+        :param wheel_base: Distance between the drive wheels, in mm
+        :param acceleration: Rate at which the wheels change speed in mm/s^2, or None to change instantly
+        :param wire_time: If true, each write takes as long in real time as its bytes would take to send at
+                          baudrate, so the port can be saturated like a real one
+        :param max_baudrate: Fastest rate at which the robot's replies arrive intact, or None for no limit
+        """
+        # MockSerial's constructor only announces itself, so it is not called
+        self.clock = clock
+        self.wheel_base = float(wheel_base)
+        self.acceleration = acceleration
+        self.wire_time = wire_time
+        self.max_baudrate = max_baudrate
+        self._baudrate = commands.BAUDRATE_CONNECTION_DEFAULT  # Rate of the port
+        self.robot_baudrate = commands.BAUDRATE_CONNECTION_DEFAULT  # Rate the robot talks at
+        self.is_open = True
+        self.mode = "off"
+        self.baud_code = None  # Last baud code received, None until a Baud command is sent
+        self.right_velocity = 0  # Requested wheel speeds, in mm/s
+        self.left_velocity = 0
+        self.actual_right_velocity = 0.0  # Speeds the wheels are turning at, in mm/s
+        self.actual_left_velocity = 0.0
+        self.radius = STRAIGHT_RADII[0]  # Radius of the last Drive command
+        self.x = 0.0  # mm
+        self.y = 0.0
+        self.heading = 0.0  # radians, counterclockwise from x
+        self.distance = 0.0  # Signed distance travelled by the centre of the robot, in mm
+        self.right_distance = 0.0  # Signed distance travelled by each wheel, in mm
+        self.left_distance = 0.0
+        # Sensors with no model behind them, by packet ID.  Set them to script what the robot reports.
+        self.readings = {
+            sensors.VOLTAGE: 15500,
+            sensors.CURRENT: -150,
+            sensors.TEMPERATURE: 25,
+            sensors.BATTERY_CHARGE: 2500,
+            sensors.BATTERY_CAPACITY: 2696,
+        }
+        self.stream_ids = []
+        self.streaming = False
+        self.writes = 0  # Calls to write, each of which is a system call on a real port
+        self.bytes_written = 0
+        self.bytes_lost = 0  # Stream bytes dropped because the input buffer was full
+        self.bytes_garbled = 0  # Bytes lost in either direction because the link was not working
+        self._pending = bytearray()  # Bytes of a command that has not been received in full
+        self._output = bytearray()  # Bytes waiting to be read
+        self._next_frame = None  # Virtual time of the next stream frame
+        self._distance_unsent = 0.0  # Travel and turn not yet reported by the distance and angle sensors
+        self._angle_unsent = 0.0
+        self._updated = clock.time()
+        self._lock = threading.Lock()  # The sensor thread reads while the main thread writes
+
+    @property
+    def baudrate(self):
+        return self._baudrate
+
+    @baudrate.setter
+    def baudrate(self, value):
+        # serial.Serial reconfigures the port here; there is no port to reconfigure
+        self._baudrate = value
+
+    def write(self, data):
+        if not self.is_open:
+            raise serial.SerialException("Attempting to use a port that is not open")
+        if self.wire_time:
+            time.sleep(len(data) * BITS_PER_BYTE / float(self.baudrate))
+        with self._lock:
+            self.writes += 1
+            self.bytes_written += len(data)
+            self._emit()  # Frames due before the command arrived reflect the state before it
+            if self._baudrate != self.robot_baudrate:
+                self.bytes_garbled += len(data)
+                self.clock.record("create", "garbled", baudrate=self._baudrate, robot_baudrate=self.robot_baudrate)
+                return len(data)
+            self._pending.extend(bytearray(data))
+            self._receive()
+        return len(data)
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise serial.SerialException("Attempting to use a port that is not open")
+        with self._lock:
+            self._emit()
+            if not self._output:
+                self._lock.release()
+                try:
+                    time.sleep(READ_WAIT)  # Wait like a port with a read timeout
+                finally:
+                    self._lock.acquire()
+                self._emit()
+            self._garble()
+            data = bytes(self._output[:size])
+            del self._output[:size]
+        return data
+
+    @property
+    def in_waiting(self):
+        with self._lock:
+            self._emit()
+            self._garble()
+            return len(self._output)
+
+    def close(self):
+        self.is_open = False
+        self.clock.record("create", "close")
+
+    def pose(self):
+        """
+        :return: (x, y, heading) at the current time, in mm and degrees
+        """
+        with self._lock:
+            self._emit()
+            self._integrate()
+            return self.x, self.y, math.degrees(self.heading)
+
+    def _garble(self):
+        """
+        Lose everything the robot has sent while its replies cannot get through
+        """
+        too_fast = self.max_baudrate is not None and self._baudrate > self.max_baudrate
+        if self._output and (self._baudrate != self.robot_baudrate or too_fast):
+            self.bytes_garbled += len(self._output)
+            del self._output[:]
+
+    def _receive(self):
+        pending = self._pending
+        while pending:
+            opcode = pending[0]
+            if opcode == STREAM or opcode == QUERY_LIST:
+                if len(pending) < 2:
+                    return
+                length = 1 + pending[1]
+            else:
+                length = DATA_LENGTHS.get(opcode)
+            if length is None:
+                del pending[0]
+                self.clock.record("create", "unknown", opcode=opcode)
+                continue
+            if len(pending) <= length:
+                return  # Wait for the rest of the command
+            data = pending[1:length + 1]
+            del pending[:length + 1]
+            self._execute(opcode, data)
+
+    def _execute(self, opcode, data):
+        self._integrate()
+        if opcode == START:
+            self.mode = "passive"
+            self._set_wheels(0, 0)
+            name = "start"
+        elif self.mode == "off":
+            self.clock.record("create", "ignored", opcode=opcode, mode=self.mode)
+            return
+        elif opcode == RESET or opcode == STOP:
+            self.mode = "off"
+            self._set_wheels(0, 0)
+            name = "reset" if opcode == RESET else "stop"
+        elif opcode == SAFE or opcode == FULL:
+            self.mode = "safe" if opcode == SAFE else "full"
+            name = self.mode
+        elif opcode == DOCK:
+            # Seeking the dock is not simulated; the robot just gives up control
+            self.mode = "passive"
+            self._set_wheels(0, 0)
+            name = "dock"
+        elif opcode == BAUD:
+            self.baud_code = data[0]
+            self.robot_baudrate = BAUD_RATES.get(self.baud_code, self.robot_baudrate)
+            name = "baud"
+        elif opcode == STREAM:
+            packet_ids = list(data[1:])
+            if any(packet_id not in sensors.PACKETS for packet_id in packet_ids):
+                self.clock.record("create", "ignored", opcode=opcode, packets=packet_ids)
+                return
+            self.stream_ids = packet_ids
+            self._set_streaming(True)
+            self.clock.record("create", "stream", packets=packet_ids)
+            return
+        elif opcode == QUERY_LIST:
+            packet_ids = list(data[1:])
+            if any(packet_id not in sensors.PACKETS for packet_id in packet_ids):
+                self.clock.record("create", "ignored", opcode=opcode, packets=packet_ids)
+                return
+            for packet_id in packet_ids:
+                self._output.extend(struct.pack(">" + sensors.PACKETS[packet_id].format, self._sensor(packet_id)))
+            self.clock.record("create", "query", packets=packet_ids)
+            return
+        elif opcode == PAUSE_RESUME_STREAM:
+            self._set_streaming(bool(data[0]) and bool(self.stream_ids))
+            self.clock.record("create", "resume_stream" if self.streaming else "pause_stream")
+            return
+        elif self.mode == "passive":
+            self.clock.record("create", "ignored", opcode=opcode, mode=self.mode)
+            return
+        elif opcode == DRIVE:
+            self._drive(_signed16(data[0], data[1]), _signed16(data[2], data[3]))
+            name = "drive"
+        else:
+            self._set_wheels(_signed16(data[0], data[1]), _signed16(data[2], data[3]))
+            name = "drive_direct"
+        self.clock.record("create", name, mode=self.mode, right=self.right_velocity, left=self.left_velocity,
+                          x=self.x, y=self.y, heading=math.degrees(self.heading))
+
+    def _drive(self, velocity, radius):
+        self.radius = radius
+        velocity = _clamp(velocity, -MAX_VELOCITY, MAX_VELOCITY)
+        if radius in STRAIGHT_RADII or radius == 0:  # Straight, or no radius to turn about, as odometry assumes
+            self._set_wheels(velocity, velocity)
+        elif radius == -1:  # Turn in place clockwise
+            self._set_wheels(-velocity, velocity)
+        elif radius == 1:  # Turn in place counterclockwise
+            self._set_wheels(velocity, -velocity)
+        else:
+            radius = _clamp(radius, -2000, 2000)
+            half = self.wheel_base / 2.0
+            self._set_wheels(velocity * (radius + half) / radius, velocity * (radius - half) / radius)
+
+    def _set_wheels(self, right, left):
+        self.right_velocity = _clamp(right, -MAX_VELOCITY, MAX_VELOCITY)
+        self.left_velocity = _clamp(left, -MAX_VELOCITY, MAX_VELOCITY)
+
+    def _set_streaming(self, streaming):
+        if streaming and not self.streaming:
+            self._next_frame = self.clock.time() + STREAM_PERIOD
+        self.streaming = streaming
+
+    def _emit(self):
+        """
+        Queue every stream frame due by the current time
+        """
+        now = self.clock.time()
+        output = self._output
+        while self.streaming and self._next_frame <= now:
+            self._integrate(self._next_frame)
+            output.extend(self._frame())
+            self._next_frame += STREAM_PERIOD
+        if len(output) > INPUT_BUFFER:
+            self.bytes_lost += len(output) - INPUT_BUFFER
+            del output[:len(output) - INPUT_BUFFER]
+
+    def _frame(self):
+        body = bytearray()
+        for packet_id in self.stream_ids:
+            body.append(packet_id)
+            body.extend(struct.pack(">" + sensors.PACKETS[packet_id].format, self._sensor(packet_id)))
+        frame = bytearray([STREAM_HEADER, len(body)]) + body
+        frame.append(sensors.checksum(frame))
+        return frame
+
+    def _sensor(self, packet_id):
+        """
+        :return: The value the robot would report for packet_id now
+        """
+        if packet_id == sensors.DISTANCE:
+            value = _clamp(int(round(self._distance_unsent)), -0x8000, 0x7FFF)
+            self._distance_unsent -= value
+            return value
+        if packet_id == sensors.ANGLE:
+            value = _clamp(int(round(self._angle_unsent)), -0x8000, 0x7FFF)
+            self._angle_unsent -= value
+            return value
+        if packet_id == sensors.OI_MODE:
+            return MODES.index(self.mode)
+        if packet_id == sensors.REQUESTED_VELOCITY:
+            return int((self.right_velocity + self.left_velocity) / 2)
+        if packet_id == sensors.REQUESTED_RADIUS:
+            return self.radius
+        if packet_id == sensors.REQUESTED_RIGHT_VELOCITY:
+            return int(self.right_velocity)
+        if packet_id == sensors.REQUESTED_LEFT_VELOCITY:
+            return int(self.left_velocity)
+        if packet_id == sensors.LEFT_ENCODER_COUNTS:
+            return _wrap16(int(self.left_distance * COUNTS_PER_MM))
+        if packet_id == sensors.RIGHT_ENCODER_COUNTS:
+            return _wrap16(int(self.right_distance * COUNTS_PER_MM))
+        return self.readings.get(packet_id, 0)
+
+    def _integrate(self, until=None):
+        """
+        Advance the pose to until, by default the current time
+        """
+        now = self.clock.time() if until is None else until
+        elapsed = now - self._updated
+        if elapsed <= 0:
+            return
+        self._updated = now
+        while elapsed > 0:
+            right = self.actual_right_velocity
+            left = self.actual_left_velocity
+            if self.acceleration is None or (right == self.right_velocity and left == self.left_velocity):
+                self.actual_right_velocity = self.right_velocity
+                self.actual_left_velocity = self.left_velocity
+                self._advance(elapsed, self.right_velocity, self.left_velocity)
+                return
+            step = min(elapsed, RAMP_STEP)
+            change = self.acceleration * step
+            self.actual_right_velocity = _clamp(self.right_velocity, right - change, right + change)
+            self.actual_left_velocity = _clamp(self.left_velocity, left - change, left + change)
+            self._advance(step, (right + self.actual_right_velocity) / 2.0, (left + self.actual_left_velocity) / 2.0)
+            elapsed -= step
+
+    def _advance(self, elapsed, right, left):
+        """
+        Move the robot for elapsed seconds with constant wheel speeds
+        """
+        velocity = (right + left) / 2.0
+        turn_rate = (right - left) / self.wheel_base
+        heading = self.heading + turn_rate * elapsed
+        if abs(turn_rate) < 1e-12:
+            self.x += velocity * math.cos(self.heading) * elapsed
+            self.y += velocity * math.sin(self.heading) * elapsed
+        else:
+            radius = velocity / turn_rate
+            self.x += radius * (math.sin(heading) - math.sin(self.heading))
+            self.y -= radius * (math.cos(heading) - math.cos(self.heading))
+        self.heading = math.atan2(math.sin(heading), math.cos(heading))
+        self.distance += velocity * elapsed
+        self.right_distance += right * elapsed
+        self.left_distance += left * elapsed
+        self._distance_unsent += velocity * elapsed
+        self._angle_unsent += math.degrees(turn_rate * elapsed)
@@ -0,0 +1,203 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# A PCA9685 PWM controller behind an SMBus compatible interface, so the real Adafruit driver can run against it.
+#
+# The register file follows the datasheet: MODE1 auto-increment decides whether a block write walks through the
+# registers or overwrites one, writes to PRESCALE only take effect while the oscillator is asleep, the ALL_LED
+# registers write every channel at once, and a general call software reset restores the power-on values.
+import errno
+
+OSCILLATOR = 25000000.0  # Internal oscillator frequency, in Hz
+CHANNELS = 16
+BYTES_PER_CHANNEL = 4
+
+MODE1 = 0x00
+MODE2 = 0x01
+LED0_ON_L = 0x06
+LAST_LED = LED0_ON_L + CHANNELS * BYTES_PER_CHANNEL - 1  # LED15_OFF_H, where auto-increment rolls back to MODE1
+ALL_LED_ON_L = 0xFA
+ALL_LED_OFF_H = 0xFD
+PRESCALE = 0xFE
+
+RESTART = 0x80
+AI = 0x20
+SLEEP = 0x10
+FULL = 0x10  # The full on / full off bit in LEDn_ON_H and LEDn_OFF_H
+
+GENERAL_CALL = 0x00
+SWRST = 0x06
+
+
+def power_on_registers():
+    registers = [0] * 256
+    registers[MODE1] = SLEEP | 0x01  # Asleep, responding to the LED All Call address
+    registers[MODE2] = 0x04  # Totem pole outputs
+    registers[PRESCALE] = 0x1E  # 200Hz
+    for channel in range(CHANNELS):
+        registers[LED0_ON_L + channel * BYTES_PER_CHANNEL + 3] = FULL  # Every output starts fully off
+    return registers
+
+
+class SimulatedPCA9685(object):
+    """
+    Emulates the registers of a PCA9685 and records every change to an output in the clock's timeline.  Pass it as
+    the bus of Adafruit_PWM_Servo_Driver.PWM.
+    """
+
+    def __init__(self, clock, address=0x40):
+        """
+        :param clock: VirtualClock that timestamps the timeline events
+        :param address: I2C address the chip answers on
+        """
+        self.clock = clock
+        self.address = address
+        self.registers = power_on_registers()
+        self.writes = 0  # Bus transactions that wrote to the chip
+        self.reads = 0
+        self._outputs = [self.output(channel) for channel in range(CHANNELS)]
+
+    # region SMBus interface
+    def write_byte(self, address, value):
+        if address == GENERAL_CALL and value == SWRST:
+            self.reset()
+            return
+        self._check(address)
+        self.writes += 1
+
+    def write_byte_data(self, address, register, value):
+        self._write(address, register, [value])
+
+    def write_word_data(self, address, register, value):
+        self._write(address, register, [value & 0xFF, value >> 8])
+
+    def write_i2c_block_data(self, address, register, data):
+        self._write(address, register, data)
+
+    def read_byte_data(self, address, register):
+        return self._read(address, register, 1)[0]
+
+    def read_word_data(self, address, register):
+        low, high = self._read(address, register, 2)
+        return low | (high << 8)
+
+    def read_i2c_block_data(self, address, register, length=32):
+        return self._read(address, register, length)
+
+    # endregion
+
+    def reset(self):
+        """
+        Restore the power-on register values, as a software reset or power cycle does
+        """
+        self.registers = power_on_registers()
+        self.clock.record("pca9685", "reset")
+        self._publish(range(CHANNELS))
+
+    def frequency(self):
+        """
+        :return: The PWM frequency set by the prescaler, in Hz
+        """
+        return OSCILLATOR / (4096.0 * (self.registers[PRESCALE] + 1))
+
+    def output(self, channel):
+        """
+        :return: (on, off, ticks) for the channel, where ticks is the length of the high pulse in 1/4096ths of a
+                 period
+        """
+        first = LED0_ON_L + channel * BYTES_PER_CHANNEL
+        on_l, on_h, off_l, off_h = self.registers[first:first + BYTES_PER_CHANNEL]
+        on = on_l | ((on_h & 0x0F) << 8)
+        off = off_l | ((off_h & 0x0F) << 8)
+        if off_h & FULL:
+            ticks = 0
+        elif on_h & FULL:
+            ticks = 4096
+        else:
+            ticks = (off - on) % 4096
+        return on, off, ticks
+
+    def pulse_width(self, channel):
+        """
+        :return: Length of the high pulse on the channel, in seconds.  0 while the oscillator is asleep
+        """
+        if self.registers[MODE1] & SLEEP:
+            return 0.0
+        return self.output(channel)[2] / (4096.0 * self.frequency())
+
+    def _check(self, address):
+        if address != self.address:
+            raise IOError(errno.EIO, "No PCA9685 at address 0x%02X" % address)
+
+    def _write(self, address, register, data):
+        self._check(address)
+        self.writes += 1
+        registers = self.registers
+        touched = set()
+        pointer = register
+        for value in data:
+            value &= 0xFF
+            if LED0_ON_L <= pointer <= LAST_LED:
+                registers[pointer] = value
+                touched.add((pointer - LED0_ON_L) // BYTES_PER_CHANNEL)
+            elif ALL_LED_ON_L <= pointer <= ALL_LED_OFF_H:
+                for channel in range(CHANNELS):
+                    registers[LED0_ON_L + channel * BYTES_PER_CHANNEL + pointer - ALL_LED_ON_L] = value
+                touched.update(range(CHANNELS))
+            elif pointer == PRESCALE:
+                # The prescaler can only be changed while the oscillator is off
+                if registers[MODE1] & SLEEP:
+                    registers[PRESCALE] = value
+                    self.clock.record("pca9685", "frequency", frequency=self.frequency())
+            elif pointer == MODE1:
+                if (registers[MODE1] ^ value) & SLEEP:
+                    self.clock.record("pca9685", "sleep" if value & SLEEP else "wake")
+                registers[MODE1] = value & ~RESTART  # RESTART clears itself once the outputs restart
+            else:
+                registers[pointer] = value
+            pointer = self._next(pointer)
+        self._publish(sorted(touched))
+
+    def _read(self, address, register, length):
+        self._check(address)
+        self.reads += 1
+        values = []
+        pointer = register
+        for _ in range(length):
+            # The ALL_LED registers are write only
+            values.append(0 if ALL_LED_ON_L <= pointer <= ALL_LED_OFF_H else self.registers[pointer])
+            pointer = self._next(pointer)
+        return values
+
+    def _next(self, pointer):
+        if not self.registers[MODE1] & AI:
+            return pointer
+        if pointer == LAST_LED or pointer == 0xFF:
+            return MODE1
+        return pointer + 1
+
+    def _publish(self, channels):
+        """
+        Record the outputs that changed
+        """
+        for channel in channels:
+            output = self.output(channel)
+            if output != self._outputs[channel]:
+                self._outputs[channel] = output
+                on, off, ticks = output
+                self.clock.record("pca9685", "pwm", channel=channel, on=on, off=off, ticks=ticks)
@@ -0,0 +1,80 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+from rbCreate import Create
+from rbCreate import EventLoop
+from rbCreate import Fleet
+from rbSnapper import Snapper
+from rbSnapper.Adafruit_PWM_Servo_Driver import PWM
+
+from clock import VirtualClock
+from create2 import SimulatedCreate
+from pca9685 import SimulatedPCA9685
+
+
+class Simulation(object):
+    """
+    A Create 2 and a Snapper arm sharing one virtual clock, so scripts written against the real robot run in
+    however long they take to compute.  Everything the simulated hardware does is recorded in timeline.
+    """
+
+    def __init__(self, start=0.0):
+        """
+        :param start: Initial virtual time, in seconds
+        """
+        self.clock = VirtualClock(start)
+        self.timeline = self.clock.timeline
+        self.create = SimulatedCreate(self.clock)
+        self.robots = [self.create]  # Every simulated Create, for fleets
+        self.pca9685 = SimulatedPCA9685(self.clock)
+
+    def robot(self, port="simulated", record=None):
+        """
+        :param record: recording.TrafficLog to record the robot's traffic in
+        :return: A connected Create talking to the simulated robot
+        """
+        robot = Create(port, clock=self.clock)
+        robot.command_latency = 0.0  # The simulated robot acts on a command the moment it is written
+        robot.stream_thread = False  # Read the stream as moves step the clock, so nothing waits in real time
+        robot.deceleration = self.create.acceleration or robot.deceleration
+        robot.connect(connection=self.create, record=record)
+        return robot
+
+    def fleet(self, count):
+        """
+        :param count: Number of robots.  The first is self.create, and the rest are added to self.robots
+        :return: A connected Fleet, with an EventLoop on the virtual clock, talking to the simulated robots
+        """
+        while len(self.robots) < count:
+            self.robots.append(SimulatedCreate(self.clock))
+        fleet = Fleet(["simulated{0}".format(index) for index in range(count)], EventLoop(self.clock))
+        fleet.connect(connections=self.robots[:count])
+        return fleet
+
+    def arm(self, **kwargs):
+        """
+        :param kwargs: Passed on to Snapper.  Motion is blocking by default, because a motion thread sleeping on the
+                       virtual clock alongside the main thread would make time run too fast.  The pose is not saved
+                       to disk unless pose_file is given, but a second arm on the same simulation resumes from the
+                       pose the PCA9685 is holding
+        :return: A Snapper driving the simulated PCA9685 through the real driver
+        """
+        kwargs.setdefault("clock", self.clock)
+        kwargs.setdefault("pwm", PWM(bus=self.pca9685, record=kwargs.get("record"), resume=True))
+        kwargs.setdefault("pose_file", None)  # Keep runs independent of each other
+        return Snapper(**kwargs)
@@ -0,0 +1,3 @@
+from bus import RobotState
+from bus import StatePublisher
+from bus import StateReader
@@ -0,0 +1,198 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+# The live state of the arm and the Create, published by the control process into a memory mapped file so that
+# monitoring and planning processes can read it without sockets or pickling.
+#
+# The file holds one fixed layout record: a HEADER, then a sequence counter, then the BODY.  The record is guarded by
+# a seqlock.  The publisher makes the counter odd, writes the body and makes the counter even again.  A reader
+# copies the body between two reads of the counter and keeps the copy only if the counter was even and unchanged, so
+# it never sees a half written record and never blocks the publisher.  Only one process may publish to a file.
+#
+# Readers may keep the file mapped while the publisher restarts, so a publisher takes over the existing file in place
+# and carries on its sequence.  The file is never truncated, which would fault the readers' mappings.  A sequence of 0
+# means nothing has been published yet, and is skipped when the counter wraps.
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+MAGIC = "RBST"
+VERSION = 1
+HEADER = struct.Struct("<4sH")
+SEQUENCE = struct.Struct("<I")
+SEQUENCE_MASK = 0xFFFFFFFF
+# Publish time; arm update time and waist, shoulder, elbow, wrist and gripper positions; Create update time,
+# connected and streaming flags, commanded right and left wheel speeds, emergency stop count and odometry pose
+BODY = struct.Struct("<dd5ddBBhhIddd")
+SEQUENCE_OFFSET = HEADER.size + 2  # Padded so the counter is aligned
+BODY_OFFSET = SEQUENCE_OFFSET + SEQUENCE.size
+SIZE = BODY_OFFSET + BODY.size
+READ_TIMEOUT = 0.1  # Seconds of failed reads before assuming the publisher died part way through a write
+
+SHARED_MEMORY = "/dev/shm"  # A RAM backed filesystem, so publishing never touches the disk
+DEFAULT_PATH = os.path.join(SHARED_MEMORY if os.path.isdir(SHARED_MEMORY) else tempfile.gettempdir(),
+                            "snapper-create-state")
+
+NAN = float("nan")  # Marks values that have not been published, such as the pose before odometry starts
+
+RobotState = namedtuple("RobotState", "sequence time arm_time waist shoulder elbow wrist gripper create_time "
+                                      "connected streaming right_speed left_speed emergency_stops x y heading")
+
+
+class StatePublisher(object):
+    """
+    Writes the state record.  Attach the arm and Create, and they publish whenever their state changes.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, clock=None):
+        """
+        :param path: File to publish in.  It is created if need be, or taken over from an earlier publisher
+        :param clock: Object providing time(), which timestamps each update.  Defaults to the time module
+        """
+        self.path = path
+        self.clock = clock if clock is not None else time
+        self.publishes = 0
+        self._lock = threading.Lock()  # The arm and the Create publish from different threads
+        self._sequence = 0
+        self._arm = (NAN, NAN, NAN, NAN, NAN, NAN)
+        self._create = (NAN, False, False, 0, 0, 0, NAN, NAN, NAN)
+        descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(descriptor).st_size < SIZE:
+                os.ftruncate(descriptor, SIZE)  # Only ever grown, never truncated under a reader's mapping
+            self._map = mmap.mmap(descriptor, SIZE)
+        finally:
+            os.close(descriptor)
+        if HEADER.unpack_from(self._map, 0) == (MAGIC, VERSION):
+            # Carry on from the last publisher, rounding up in case it died part way through a write
+            self._sequence = (SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0] + 1) & ~1 & SEQUENCE_MASK
+        else:
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION)
+        with self._lock:
+            self._write()
+
+    def attach_arm(self, arm):
+        """
+        Publish the Snapper's joint positions every time they change
+        """
+        arm.state_bus = self
+        self.publish_arm(arm._joint_positions())
+
+    def attach_create(self, create):
+        """
+        Publish the Create's drive state every time it is commanded, and its pose with every odometry update
+        """
+        create.state_bus = self
+        self.publish_create(create)
+
+    def publish_arm(self, positions):
+        """
+        :param positions: Joint positions indexed by PWM channel: waist, shoulder, elbow, wrist and gripper
+        """
+        with self._lock:
+            self._arm = (self.clock.time(),) + tuple(float(position) for position in positions)
+            self._write()
+
+    def publish_create(self, create):
+        pose = create.odometry.pose() if create.odometry is not None else None
+        x, y, heading = (pose.x, pose.y, pose.heading) if pose is not None else (NAN, NAN, NAN)
+        connected = create.connected is True and create.connection is not None and create.connection.is_open
+        with self._lock:
+            self._create = (self.clock.time(), connected, create.stream is not None,
+                            create.right_speed, create.left_speed, create.emergency_stops, x, y, heading)
+            self._write()
+
+    def close(self):
+        """
+        Stop publishing.  The file is left in place, holding the last state, until the next publisher takes it over.
+        """
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+
+    def _write(self):
+        if self._map is None:
+            return
+        body = BODY.pack(self.clock.time(), *(self._arm + self._create))  # Packed first to keep the odd spell short
+        writing = (self._sequence + 1) & SEQUENCE_MASK
+        if writing == SEQUENCE_MASK:
+            writing = 1  # Wrap round without passing through 0
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, writing)  # Odd while the body is being written
+        self._map[BODY_OFFSET:SIZE] = body
+        self._sequence = writing + 1
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, self._sequence)
+        self.publishes += 1
+
+
+class StateReader(object):
+    """
+    Reads the state record published by another process
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.retries = 0  # Reads repeated because the publisher was writing
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size < SIZE:
+            self._file.close()
+            raise RuntimeError("{0} is not a robot state file".format(path))
+        self._map = mmap.mmap(self._file.fileno(), SIZE, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise RuntimeError("{0} is not a version {1} robot state file".format(path, VERSION))
+
+    @property
+    def sequence(self):
+        """
+        The record's sequence counter, which changes with every publish.  Cheaper than read() for noticing updates.
+        """
+        return SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0]
+
+    def read(self):
+        """
+        :return: A consistent RobotState.  Values never published are NaN.  Raises RuntimeError if nothing has been
+                 published, or the record stays mid-update for READ_TIMEOUT
+        """
+        data = self._map
+        deadline = None
+        while True:
+            before = SEQUENCE.unpack_from(data, SEQUENCE_OFFSET)[0]
+            if before and not before & 1:
+                body = data[BODY_OFFSET:SIZE]
+                if SEQUENCE.unpack_from(data, SEQUENCE_OFFSET)[0] == before:
+                    values = BODY.unpack(body)
+                    return RobotState(before, *values[:8] + (bool(values[8]), bool(values[9])) + values[10:])
+            self.retries += 1
+            if deadline is None:
+                deadline = time.time() + READ_TIMEOUT
+            elif time.time() > deadline:
+                if not before:
+                    raise RuntimeError("Nothing has been published in {0}".format(self.path))
+                raise RuntimeError("The robot state in {0} stayed mid-update; its publisher may have died".format(
+                    self.path))
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
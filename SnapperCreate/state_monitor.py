@@ -0,0 +1,57 @@
+"""
+    The MIT License (MIT)
+    Copyright (c) 2016 Carl Hinkle <cghinkle427@gmail.com>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+    documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+    rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+    permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+    the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+    THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+    TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+import argparse
+import sys
+import time
+
+from state_bus import StateReader
+from state_bus.bus import DEFAULT_PATH
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Print the arm and Create state published by project_driver.py -p")
+    ap.add_argument("path", nargs="?", default=DEFAULT_PATH, help="the state file, {0} by default".format(DEFAULT_PATH))
+    ap.add_argument("-r", "--rate", type=float, default=10.0, help="lines printed per second")
+    args = vars(ap.parse_args())
+
+    try:
+        reader = StateReader(args["path"])
+    except (IOError, RuntimeError) as err:
+        print "Could not open the robot state: {0}".format(err)
+        return -1
+
+    last = None
+    try:
+        while True:
+            if reader.sequence != last:
+                state = reader.read()
+                last = state.sequence
+                print ("t={0:.2f} arm=({1:.0f}, {2:.0f}, {3:.0f}, {4:.0f}) gripper={5:.0f} wheels=({6}, {7}) "
+                       "pose=({8:.0f}, {9:.0f}, {10:.1f})").format(
+                    state.time, state.waist, state.shoulder, state.elbow, state.wrist, state.gripper,
+                    state.right_speed, state.left_speed, state.x, state.y, state.heading)
+            time.sleep(1.0 / args["rate"])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())